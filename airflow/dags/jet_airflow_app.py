@@ -2,6 +2,8 @@ from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
 from datetime import datetime, timedelta
+import json
+import os
 
 default_args = {
     'owner': 'airflow',
@@ -23,50 +25,100 @@ data_pipeline_dag = DAG(dag_id='amazon_reviews_data_pipeline',
 
 DBT_PROJECT_DIR = '/opt/dbt/dbt_etl'
 DBT_PROFILES_DIR = '/opt/airflow/config'
-
-def activate_and_run_dbt(command):
+SOURCE_FORMAT = os.getenv('ARDWH_SOURCE_FORMAT', 'csv')
+# Byte-range shards the reviews CSV is loaded in, one mapped task each (see utils/review_shards.py).
+REVIEW_SHARDS = int(os.getenv('ARDWH_REVIEW_SHARDS', '1'))
+
+def activate_and_run_dbt(command, run_name=None):
+    # dbt tasks that can run at the same time get their own target and log directories,
+    # so their manifests, run results and partial-parse files do not overwrite each other.
+    # Threads per dbt task: ARDWH_DBT_THREADS, read by profiles.yml.
+    separate_paths = f"--target-path target/{run_name} --log-path logs/{run_name} " if run_name else ""
     return (
         f"/opt/venv/bin/dbt {command} "
+        f"{separate_paths}"
         f"--project-dir {DBT_PROJECT_DIR} "
         f"--profiles-dir {DBT_PROFILES_DIR}"
     )
 
+def review_shard_load_commands(plan_summary):
+    # The plan step's run summary (its last line, pushed to XCom) lists the shards still to
+    # load; a resumed plan leaves out the shards that are already done.
+    shards = json.loads(plan_summary)['pending_shards']
+    return [f'/opt/venv/bin/python3 /opt/airflow/utils/review_shards.py load --shard {shard}' for shard in shards]
+
 # tasks
+# The loaders print a JSON run summary (stage timings, row and byte counts, peak RSS) as
+# their last line; do_xcom_push stores it as the task's return_value XCom.
 dbt_deps_task = BashOperator(task_id='dbt_install_dependencies',
                      bash_command=activate_and_run_dbt('deps'),
                      cwd=DBT_PROJECT_DIR, dag=data_pipeline_dag)
 
-process_review_data = BashOperator(task_id='process_review_data_for_staging',
-                     bash_command='/opt/venv/bin/python3 /opt/airflow/utils/process_and_load_reviews.py',
-                     dag=data_pipeline_dag)
+if SOURCE_FORMAT == 'csv' and REVIEW_SHARDS > 1:
+    plan_review_shards = BashOperator(task_id='plan_review_shards',
+                         bash_command=f'/opt/venv/bin/python3 /opt/airflow/utils/review_shards.py plan --shards {REVIEW_SHARDS}',
+                         do_xcom_push=True, dag=data_pipeline_dag)
+
+    list_review_shards = PythonOperator(task_id='list_review_shards',
+                         python_callable=review_shard_load_commands,
+                         op_args=[plan_review_shards.output], dag=data_pipeline_dag)
+
+    # One mapped task instance per pending shard, expanded at run time from the plan; a
+    # failed shard is retried on its own.
+    load_review_shards = BashOperator.partial(task_id='load_review_shard', do_xcom_push=True,
+                         dag=data_pipeline_dag).expand(bash_command=list_review_shards.output)
+
+    # With nothing left to load the mapped task is skipped; finalize still runs.
+    process_review_data = BashOperator(task_id='process_review_data_for_staging',
+                         bash_command='/opt/venv/bin/python3 /opt/airflow/utils/review_shards.py finalize',
+                         trigger_rule='none_failed', do_xcom_push=True, dag=data_pipeline_dag)
+
+    list_review_shards >> load_review_shards >> process_review_data
+else:
+    process_review_data = BashOperator(task_id='process_review_data_for_staging',
+                         bash_command='/opt/venv/bin/python3 /opt/airflow/utils/process_and_load_reviews.py',
+                         do_xcom_push=True, dag=data_pipeline_dag)
 
 process_metadata_category = BashOperator(task_id='process_metadata_category_for_staging',
                      bash_command='/opt/venv/bin/python3 /opt/airflow/utils/process_and_load_metadata.py',
-                     dag=data_pipeline_dag)
-
-dbt_run_staging_models = BashOperator(task_id='dbt_run_staging_models',
-                     bash_command=activate_and_run_dbt('run --models staging --full-refresh'),
+                     do_xcom_push=True, dag=data_pipeline_dag)
+
+# Each source is staged and snapshotted as soon as its loader finishes. `dbt build` runs
+# the selected models and snapshots with their tests, in dependency order, so every task
+# tests exactly what it built and a failing test stops that source's chain.
+dbt_build_metadata = BashOperator(task_id='dbt_build_metadata_staging_and_snapshot',
+                     bash_command=activate_and_run_dbt('build --select stg_metadata_category dim_product_scd2',
+                                                       run_name='metadata'),
                      cwd=DBT_PROJECT_DIR, dag=data_pipeline_dag)
 
-dbt_snapshot_task = BashOperator(task_id='dbt_run_snapshots',
-                     bash_command=activate_and_run_dbt('snapshot'),
+dbt_build_reviews = BashOperator(task_id='dbt_build_reviews_staging_and_snapshot',
+                     bash_command=activate_and_run_dbt('build --select stg_reviews_data dim_reviewer_scd2',
+                                                       run_name='reviews'),
                      cwd=DBT_PROJECT_DIR, dag=data_pipeline_dag)
 
-dbt_run_core_models = BashOperator(task_id='dbt_run_core_models',
-                     bash_command=activate_and_run_dbt('run --exclude staging'),
+dbt_build_core_models = BashOperator(task_id='dbt_build_core_models',
+                     bash_command=activate_and_run_dbt('build --select path:models/marts', run_name='core'),
                      cwd=DBT_PROJECT_DIR, dag=data_pipeline_dag)
 
-dbt_test_task = BashOperator(task_id='dbt_run_tests',
-                     bash_command=activate_and_run_dbt('test --select resource_type:model resource_type:snapshot'),
-                     cwd=DBT_PROJECT_DIR, dag=data_pipeline_dag)
+check_query_plans = BashOperator(task_id='check_query_plans',
+                     bash_command='/opt/venv/bin/python3 /opt/airflow/utils/check_query_plans.py',
+                     dag=data_pipeline_dag)
+
+# Parquet landing zone: convert the raw CSVs (a no-op when they are unchanged) before loading
+if SOURCE_FORMAT == 'parquet':
+    convert_raw_files_to_parquet = BashOperator(task_id='convert_raw_files_to_parquet',
+                         bash_command='/opt/venv/bin/python3 /opt/airflow/utils/parquet_landing.py',
+                         dag=data_pipeline_dag)
 
 # Task order
-[process_review_data, process_metadata_category] >> dbt_deps_task
+if SOURCE_FORMAT == 'parquet':
+    convert_raw_files_to_parquet >> [process_review_data, process_metadata_category]
 
-dbt_deps_task >> dbt_run_staging_models
+# dbt deps does not depend on the data, so it runs while the loaders do.
+[dbt_deps_task, process_metadata_category] >> dbt_build_metadata
 
-dbt_run_staging_models >> dbt_snapshot_task
+[dbt_deps_task, process_review_data] >> dbt_build_reviews
 
-dbt_snapshot_task >> dbt_run_core_models
+[dbt_build_metadata, dbt_build_reviews] >> dbt_build_core_models
 
-dbt_run_core_models >> dbt_test_task
\ No newline at end of file
+dbt_build_core_models >> check_query_plans
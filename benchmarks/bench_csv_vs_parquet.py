@@ -0,0 +1,91 @@
+"""
+End-to-end comparison of the reviews loader's read + transform stage on the raw
+CSV versus the Parquet landing zone (utils/parquet_landing.py): a full read, and
+re-processing a single month, which Parquet serves from one partition.
+
+Usage: python benchmarks/bench_csv_vs_parquet.py [--rows 500000] [--csv path]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'shared'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+
+from parquet_landing import (  # noqa: E402
+    convert_csv_to_parquet, read_parquet_chunks, review_time_filter, _reviews_batches,
+    REVIEWS_SCHEMA, REVIEWS_PARTITIONING
+)
+from process_and_load_reviews import REVIEWS_SOURCE_COLUMNS  # noqa: E402
+from reviews_transform import stream_review_batches  # noqa: E402
+
+CHUNK_SIZE = 10000
+
+
+def write_synthetic_reviews_csv(path, rows, seed=7):
+    rng = random.Random(seed)
+    start = int(datetime(2003, 1, 1, tzinfo=timezone.utc).timestamp())
+    end = int(datetime(2014, 7, 1, tzinfo=timezone.utc).timestamp())
+    summaries = ["Great", "Love it", "Five Stars", "Runs small", "Disappointed", "Nice shoes", "Okay"]
+    with open(path, 'w') as f:
+        f.write('reviewerid,asin,reviewername,helpful,reviewtext,overall,summary,unixreviewtime,reviewtime\n')
+        for _ in range(rows):
+            unix_time = rng.randrange(start, end) // 86400 * 86400
+            review_date = datetime.fromtimestamp(unix_time, tz=timezone.utc)
+            f.write(
+                f"A{rng.randrange(10 ** 8):013d},B{rng.randrange(10 ** 6):09d},Reviewer {rng.randrange(1000)},"
+                f"\"[0, 0]\",\"Some longer review text, with a comma.\",{rng.randint(1, 5)}.0,"
+                f"{rng.choice(summaries)},{unix_time},\"{review_date:%m %d, %Y}\"\n"
+            )
+
+
+def timed_transform(chunks, min_time=None, max_time=None):
+    start = time.perf_counter()
+    rows = sum(len(batch) for batch in stream_review_batches(chunks, min_time, max_time))
+    return rows, time.perf_counter() - start
+
+
+def report(name, rows, elapsed):
+    print(f"{name:>28}: {rows:>10,} rows in {elapsed:7.2f}s ({rows / elapsed if elapsed else 0:12,.0f} rows/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--csv', help="Use an existing reviews CSV instead of generating one.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = args.csv or os.path.join(work_dir, 'reviews.csv')
+        if not args.csv:
+            write_synthetic_reviews_csv(csv_path, args.rows)
+        dataset_dir = os.path.join(work_dir, 'reviews_parquet')
+
+        start = time.perf_counter()
+        convert_csv_to_parquet(csv_path, dataset_dir, _reviews_batches, REVIEWS_SCHEMA, REVIEWS_PARTITIONING)
+        print(f"One-off CSV -> Parquet conversion: {time.perf_counter() - start:.2f}s")
+        print(f"CSV size: {os.path.getsize(csv_path) / 1e6:.1f} MB, Parquet size: "
+              f"{sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(dataset_dir) for f in fs) / 1e6:.1f} MB")
+
+        report('CSV full read', *timed_transform(pd.read_csv(csv_path, chunksize=CHUNK_SIZE)))
+        report('Parquet full read', *timed_transform(
+            read_parquet_chunks(dataset_dir, REVIEWS_SOURCE_COLUMNS, chunksize=CHUNK_SIZE)))
+
+        month_start = int(datetime(2013, 6, 1, tzinfo=timezone.utc).timestamp())
+        month_end = int(datetime(2013, 7, 1, tzinfo=timezone.utc).timestamp()) - 1
+        report('CSV one month', *timed_transform(
+            pd.read_csv(csv_path, chunksize=CHUNK_SIZE), month_start, month_end))
+        report('Parquet one month', *timed_transform(
+            read_parquet_chunks(dataset_dir, REVIEWS_SOURCE_COLUMNS,
+                                review_time_filter(month_start, month_end), CHUNK_SIZE)))
+
+
+if __name__ == '__main__':
+    main()
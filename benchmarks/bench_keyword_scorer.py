@@ -0,0 +1,57 @@
+"""
+Texts/sec of the batch keyword scorer (sentiment_api/keyword_scorer.py) against the
+original per-text keyword function of sentiment_api/app.py, plus the cost of the
+weighted and negation modes. The label equivalence tests live in
+tests/test_keyword_scorer.py.
+
+Texts are review summaries from the synthetic dataset generator, half of them with a
+few extra review words, so keywords appear in varied positions and combinations.
+
+Usage: python benchmarks/bench_keyword_scorer.py [--texts 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'sentiment_api'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'tests'))
+
+from keyword_scorer import KeywordScorer  # noqa: E402
+from test_keyword_scorer import legacy_keyword_sentiment, make_summaries  # noqa: E402
+
+
+def best_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    texts = make_summaries(args.texts)
+    scorer = KeywordScorer()
+    runs = [
+        ('original, per text', lambda: [legacy_keyword_sentiment(text) for text in texts]),
+        ('count, per text', lambda: [scorer.score(text) for text in texts]),
+        ('count, one batch', lambda: scorer.score_batch(texts)),
+        ('weighted, one batch', lambda: KeywordScorer(mode='weighted').score_batch(texts)),
+        ('weighted + negation', lambda: KeywordScorer(mode='weighted', negation=True).score_batch(texts)),
+    ]
+    baseline = None
+    for name, run in runs:
+        seconds = best_seconds(run, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:>20}: {len(texts) / seconds:12,.0f} texts/sec  ({baseline / seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
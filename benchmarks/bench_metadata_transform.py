@@ -0,0 +1,55 @@
+"""
+Rows/sec benchmark for the vectorized metadata transform (utils/metadata_transform.py)
+against the original iterrows implementation of process_and_load_metadata. The
+reference implementation and the row-for-row equivalence tests live in
+tests/test_metadata_transform.py.
+
+Usage: python benchmarks/bench_metadata_transform.py [--rows 100000] [--csv path]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'tests'))
+
+from metadata_transform import transform_metadata_chunk, dataframe_to_records  # noqa: E402
+from test_metadata_transform import legacy_transform_chunk, synthetic_metadata_frame  # noqa: E402
+
+
+def rows_per_second(transform, chunk_df):
+    start = time.perf_counter()
+    transform(chunk_df)
+    elapsed = time.perf_counter() - start
+    return len(chunk_df) / elapsed if elapsed else float('inf'), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--csv', help="Benchmark against a real metadata CSV instead of synthetic rows.")
+    args = parser.parse_args()
+
+    if args.csv:
+        chunk_df = pd.read_csv(args.csv, nrows=args.rows)
+    else:
+        chunk_df = synthetic_metadata_frame(args.rows)
+
+    ingestion_timestamp = datetime.now()
+    chunks = [chunk_df.iloc[i:i + args.chunk_size] for i in range(0, len(chunk_df), args.chunk_size)]
+    for name, transform in [
+        ('legacy iterrows', lambda df: legacy_transform_chunk(df, ingestion_timestamp)),
+        ('vectorized', lambda df: dataframe_to_records(transform_metadata_chunk(df, ingestion_timestamp))),
+    ]:
+        total_elapsed = sum(rows_per_second(transform, chunk)[1] for chunk in chunks)
+        print(f"{name:>16}: {len(chunk_df) / total_elapsed:12,.0f} rows/sec ({total_elapsed:.2f}s for {len(chunk_df)} rows)")
+
+
+if __name__ == '__main__':
+    main()
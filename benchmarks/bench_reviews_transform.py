@@ -0,0 +1,64 @@
+"""
+Rows/sec and peak memory of the streaming reviews transform (utils/reviews_transform.py)
+against the original DataFrame transform of process_and_load_reviews
+(prepare_reviews_chunk + build_review_records). The reference implementation and the
+row-for-row equivalence tests live in tests/test_reviews_transform.py.
+
+Peak memory is the tracemalloc peak while transforming one chunk, so it shows how
+memory per chunk scales with the chunk size.
+
+Usage: python benchmarks/bench_reviews_transform.py [--rows 200000] [--chunk-sizes 10000 100000] [--csv path]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'tests'))
+
+from test_reviews_transform import legacy_transform, streaming_transform, synthetic_reviews_frame  # noqa: E402
+
+
+def measure(transform, chunks, ingestion_timestamp):
+    """Returns (rows/sec over all chunks, peak traced MB while transforming one chunk)."""
+    start = time.perf_counter()
+    for chunk in chunks:
+        transform(chunk, ingestion_timestamp)
+    elapsed = time.perf_counter() - start
+
+    # A separate pass, since tracing allocations slows the transform down.
+    peak = 0
+    for chunk in chunks:
+        tracemalloc.start()
+        transform(chunk, ingestion_timestamp)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    rows = sum(len(chunk) for chunk in chunks)
+    return rows / elapsed if elapsed else float('inf'), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--csv', help="Benchmark against a real reviews CSV instead of synthetic rows.")
+    args = parser.parse_args()
+
+    frame = pd.read_csv(args.csv, nrows=args.rows) if args.csv else synthetic_reviews_frame(args.rows)
+    ingestion_timestamp = datetime.now()
+
+    for chunk_size in args.chunk_sizes:
+        chunks = [frame.iloc[i:i + chunk_size].copy() for i in range(0, len(frame), chunk_size)]
+        for name, transform in [('legacy DataFrame', legacy_transform), ('streaming', streaming_transform)]:
+            rate, peak_mb = measure(transform, chunks, ingestion_timestamp)
+            print(f"chunk {chunk_size:>7,} {name:>16}: {rate:12,.0f} rows/sec, peak {peak_mb:8.1f} MB per chunk")
+
+
+if __name__ == '__main__':
+    main()
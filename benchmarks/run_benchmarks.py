@@ -0,0 +1,322 @@
+"""
+End-to-end benchmark suite. Generates (or reuses) a synthetic dataset
+(benchmarks/synthetic_data.py), then runs each stage against a local Postgres and
+a local sentiment API and writes throughput and latency to a results file:
+
+  metadata_load   utils/process_and_load_metadata.py --full-reload
+  reviews_load    utils/process_and_load_reviews.py --full-reload
+  sentiment_api   /sentiment latency and texts/sec (sentiment_api/load_test.py), and the
+                  locally started API's time to /ready and memory (measure_cold_start.py)
+  dbt_staging, dbt_snapshot, dbt_core
+                  dbt run --models staging, dbt snapshot, dbt run --exclude staging
+
+The loaders run as subprocesses and their JSON run summary (the last line they
+print, see shared/instrumentation.py) supplies rows, stage timings and peak RSS.
+Everything runs in a dedicated database (ARDWH_BENCH_DB, default
+amazon_reviews_bench) whose public schema is dropped at the start of each run.
+
+Usage: python benchmarks/run_benchmarks.py run --rows 1M [--duplicate-ratio 0.02] [--label main]
+                                               [--stages metadata_load reviews_load ...]
+                                               [--sentiment-url http://localhost:5001/sentiment]
+       python benchmarks/run_benchmarks.py compare results/base.json results/new.json [--threshold 10]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARKS_DIR)
+UTILS_DIR = os.path.join(PROJECT_ROOT, 'utils')
+SHARED_DIR = os.path.join(PROJECT_ROOT, 'shared')
+SENTIMENT_API_DIR = os.path.join(PROJECT_ROOT, 'sentiment_api')
+DBT_PROJECT_DIR = os.path.join(PROJECT_ROOT, 'dbt_etl')
+DBT_PROFILES_DIR = os.path.join(PROJECT_ROOT, 'airflow', 'config')
+DATA_DIR = os.path.join(BENCHMARKS_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+sys.path.insert(0, SENTIMENT_API_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from load_test import run as run_load_test  # noqa: E402
+from measure_cold_start import free_port, memory_summary, start_service  # noqa: E402
+from synthetic_data import generate_dataset, parse_count, REVIEWS_FILE_NAME, METADATA_FILE_NAME  # noqa: E402
+
+BENCH_DB = os.getenv('ARDWH_BENCH_DB', 'amazon_reviews_bench')
+STAGES = ['metadata_load', 'reviews_load', 'sentiment_api', 'dbt_staging', 'dbt_snapshot', 'dbt_core']
+DBT_STAGES = {
+    'dbt_staging': ('run --models staging', ['stg_reviews_data', 'stg_metadata_category']),
+    'dbt_snapshot': ('snapshot', ['dim_product_scd2', 'dim_reviewer_scd2']),
+    'dbt_core': ('run --exclude staging', ['fact_review', 'agg_review_monthly']),
+}
+# Metrics whose names end like this are better when higher; every other metric is a cost.
+HIGHER_IS_BETTER = ('_per_sec',)
+
+
+def bench_env(sentiment_url=None):
+    """Environment for the loaders and dbt: the local Postgres, the bench database and the API."""
+    env = dict(os.environ)
+    env.setdefault('ARDWH_HOST', 'localhost')
+    env['ARDWH_DB'] = BENCH_DB
+    env['PYTHONPATH'] = os.pathsep.join([UTILS_DIR, SHARED_DIR])
+    if sentiment_url:
+        env['SENTIMENT_API_URL'] = sentiment_url
+    return env
+
+
+def _connect(env, database):
+    import psycopg2
+    conn = psycopg2.connect(host=env['ARDWH_HOST'], database=database, user=env.get('ARDWH_USER', 'airflow'),
+                            password=env.get('ARDWH_PASSWORD', 'airflow'), port=env.get('ARDWH_PORT', '5432'))
+    conn.autocommit = True
+    return conn
+
+
+def reset_database(env):
+    """Creates the bench database if needed and empties its public schema."""
+    conn = _connect(env, 'postgres')
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (BENCH_DB,))
+        if cur.fetchone() is None:
+            cur.execute(f'CREATE DATABASE "{BENCH_DB}";')
+    conn.close()
+    conn = _connect(env, BENCH_DB)
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public;")
+    conn.close()
+
+
+def table_rows(env, table_names):
+    conn = _connect(env, BENCH_DB)
+    try:
+        with conn.cursor() as cur:
+            counts = {}
+            for table_name in table_names:
+                cur.execute(f"SELECT COUNT(*) FROM public.{table_name};")
+                counts[f'{table_name}_rows'] = cur.fetchone()[0]
+            return counts
+    finally:
+        conn.close()
+
+
+def run_command(args, env, cwd=None):
+    """Runs a command and returns (seconds, last output line); prints the output's tail if it fails."""
+    start = time.perf_counter()
+    process = subprocess.run(args, env=env, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    elapsed = time.perf_counter() - start
+    output = process.stdout.strip().splitlines()
+    if process.returncode != 0:
+        print('\n'.join(output[-40:]))
+        raise RuntimeError(f"{' '.join(args)} failed with exit code {process.returncode}")
+    return elapsed, output[-1] if output else ''
+
+
+def loader_metrics(seconds, summary):
+    """Flattens a loader's JSON run summary into benchmark metrics."""
+    counters = summary['counters']
+    rows_read = sum(value for name, value in counters.items() if name.startswith('rows_read'))
+    rows_written = sum(value for name, value in counters.items() if name.startswith('rows_written'))
+    metrics = {
+        'seconds': round(seconds, 3),
+        'rows_read': rows_read,
+        'rows_written': rows_written,
+        'rows_per_sec': round(rows_read / seconds, 1) if seconds else 0,
+        'peak_rss_mb': summary['peak_rss_mb'],
+    }
+    for name, timing in summary['timings'].items():
+        if name.startswith('stage_seconds'):
+            stage = name.split('"')[1]
+            metrics[f'{stage}_seconds'] = timing['total_seconds']
+        elif name == 'sentiment_request_seconds' and timing['count']:
+            metrics['sentiment_request_mean_ms'] = round(timing['total_seconds'] / timing['count'] * 1000, 2)
+    return metrics
+
+
+def bench_loader(script, env):
+    seconds, last_line = run_command([sys.executable, os.path.join(UTILS_DIR, script), '--full-reload'], env)
+    return loader_metrics(seconds, json.loads(last_line))
+
+
+def bench_sentiment_api(url, batch_sizes=(500, 5000), requests=20, concurrency=4):
+    metrics = {}
+    for batch_size in batch_sizes:
+        result = run_load_test(url, batch_size, requests, concurrency)
+        metrics[f'batch_{batch_size}_p50_ms'] = round(result['p50_ms'], 2)
+        metrics[f'batch_{batch_size}_p99_ms'] = round(result['p99_ms'], 2)
+        metrics[f'batch_{batch_size}_texts_per_sec'] = round(result['texts_per_sec'], 1)
+    return metrics
+
+
+def bench_dbt(stage, env, dbt_executable):
+    command, table_names = DBT_STAGES[stage]
+    seconds, _ = run_command([dbt_executable] + command.split() + [
+        '--project-dir', DBT_PROJECT_DIR, '--profiles-dir', DBT_PROFILES_DIR
+    ], env, cwd=DBT_PROJECT_DIR)
+    metrics = {'seconds': round(seconds, 3)}
+    metrics.update(table_rows(env, table_names))
+    return metrics
+
+
+def start_sentiment_api():
+    """
+    Starts sentiment_api/app.py, warmed as under gunicorn, on a free local port and
+    waits for /ready; returns (process, /sentiment URL, cold start and memory metrics).
+    """
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process, ready, seconds = start_service([
+        sys.executable, '-c',
+        f"from app import app, warm_up_service; warm_up_service(); app.run(host='127.0.0.1', port={port}, threaded=True)"
+    ], base_url)
+    startup = {'time_to_ready_seconds': round(seconds, 3)}
+    startup.update(memory_summary(ready))
+    return process, base_url + '/sentiment', startup
+
+
+def prepare_dataset(rows, duplicate_ratio, seed):
+    """Returns a directory with the dataset, generating it unless an identical one exists."""
+    data_dir = os.path.join(DATA_DIR, f'{rows}_dup{duplicate_ratio}_seed{seed}')
+    if not all(os.path.exists(os.path.join(data_dir, name)) for name in (REVIEWS_FILE_NAME, METADATA_FILE_NAME)):
+        print(f"Generating {rows:,} review rows into {data_dir}...")
+        generate_dataset(data_dir, rows, duplicate_ratio=duplicate_ratio, seed=seed)
+    return data_dir
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    data_dir = prepare_dataset(args.rows, args.duplicate_ratio, args.seed)
+    api_process = None
+    api_startup = {}
+    sentiment_url = args.sentiment_url
+    if sentiment_url is None and {'reviews_load', 'sentiment_api'} & set(args.stages):
+        api_process, sentiment_url, api_startup = start_sentiment_api()
+        print(f"Started a local sentiment API at {sentiment_url}")
+
+    env = bench_env(sentiment_url)
+    env['ARDWH_CSV_DIR'] = data_dir
+    results = {
+        'label': args.label,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'rows': args.rows,
+        'duplicate_ratio': args.duplicate_ratio,
+        'seed': args.seed,
+        'settings': {key: value for key, value in sorted(env.items())
+                     if key.startswith(('ARDWH_', 'SENTIMENT_', 'REVIEWS_')) and 'PASSWORD' not in key},
+        'stages': {},
+    }
+    try:
+        if set(args.stages) != {'sentiment_api'}:
+            reset_database(env)
+        if shutil.which(args.dbt) and set(DBT_STAGES) & set(args.stages):
+            run_command([args.dbt, 'deps', '--project-dir', DBT_PROJECT_DIR, '--profiles-dir', DBT_PROFILES_DIR],
+                        env, cwd=DBT_PROJECT_DIR)
+        for stage in args.stages:
+            print(f"Running {stage}...")
+            if stage == 'metadata_load':
+                metrics = bench_loader('process_and_load_metadata.py', env)
+            elif stage == 'reviews_load':
+                metrics = bench_loader('process_and_load_reviews.py', env)
+            elif stage == 'sentiment_api':
+                metrics = bench_sentiment_api(sentiment_url)
+                metrics.update(api_startup)
+            elif shutil.which(args.dbt):
+                metrics = bench_dbt(stage, env, args.dbt)
+            else:
+                print(f"  Skipping {stage}: '{args.dbt}' is not on PATH.")
+                continue
+            results['stages'][stage] = metrics
+            print(f"  {json.dumps(metrics, sort_keys=True)}")
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{args.label}_{args.rows}.json")
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {results_path}")
+
+
+def compare_results(base, candidate, threshold_pct):
+    """
+    Yields (stage, metric, base value, candidate value, change %, regressed) for every
+    metric both runs have. A metric regresses when it is threshold_pct worse.
+    """
+    for stage, base_metrics in sorted(base['stages'].items()):
+        candidate_metrics = candidate['stages'].get(stage, {})
+        for metric, base_value in sorted(base_metrics.items()):
+            candidate_value = candidate_metrics.get(metric)
+            if candidate_value is None or not base_value or metric.endswith('_rows') or metric.startswith('rows_'):
+                continue
+            change_pct = (candidate_value - base_value) / base_value * 100
+            worse_pct = -change_pct if metric.endswith(HIGHER_IS_BETTER) else change_pct
+            yield stage, metric, base_value, candidate_value, change_pct, worse_pct > threshold_pct
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if (base['rows'], base['duplicate_ratio']) != (candidate['rows'], candidate['duplicate_ratio']):
+        print(f"Warning: comparing runs on different datasets "
+              f"({base['rows']} rows/{base['duplicate_ratio']} dup vs {candidate['rows']} rows/"
+              f"{candidate['duplicate_ratio']} dup).")
+
+    regressions = 0
+    print(f"{'stage':<15} {'metric':<32} {'base':>14} {'candidate':>14} {'change':>9}")
+    for stage, metric, base_value, candidate_value, change_pct, regressed in compare_results(
+            base, candidate, args.threshold):
+        regressions += regressed
+        print(f"{stage:<15} {metric:<32} {base_value:>14,.2f} {candidate_value:>14,.2f} {change_pct:>+8.1f}%"
+              f"{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.threshold}%.")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold}%.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Run the benchmark stages and write a results file.")
+    run_parser.add_argument('--rows', type=parse_count, default=parse_count('10k'), help="Review rows: 10k, 1M, 10M...")
+    run_parser.add_argument('--duplicate-ratio', type=float, default=0.0)
+    run_parser.add_argument('--seed', type=int, default=7)
+    run_parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    run_parser.add_argument('--sentiment-url', help="Use a running sentiment service instead of starting one.")
+    run_parser.add_argument('--dbt', default='dbt', help="dbt executable for the dbt stages.")
+    run_parser.add_argument('--label', default='run', help="Name for this run in the results file name.")
+    run_parser.add_argument('--output', help="Results file (default: benchmarks/results/<time>_<label>_<rows>.json).")
+
+    compare_parser = commands.add_parser('compare', help="Compare two results files and flag regressions.")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help="Percent a metric may get worse before it counts as a regression.")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run_suite(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
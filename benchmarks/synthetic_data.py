@@ -0,0 +1,223 @@
+"""
+Synthetic Amazon reviews and metadata CSVs shaped like the files in csv_files/:
+the same columns and file names, salesrank dicts, nested category lists, prices
+such as '$1,234.00', review text with quotes, commas and line breaks, missing
+values, and a configurable share of duplicate rows (repeated review keys and
+re-listed products) to exercise the loaders' ON CONFLICT paths.
+
+Rows are written as they are generated, so 10M-row files need no more memory
+than 10k-row ones. The same seed always produces the same files.
+
+Usage: python benchmarks/synthetic_data.py --rows 1M [--metadata-rows 250k]
+                                           [--duplicate-ratio 0.02] [--out-dir benchmarks/data/1M]
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import datetime, timezone
+
+REVIEWS_FILE_NAME = 'reviews_Clothing_Shoes_and_Jewelry_5.csv'
+METADATA_FILE_NAME = 'metadata_category_clothing_shoes_and_jewelry_only.csv'
+
+REVIEWS_HEADER = ['reviewerid', 'asin', 'reviewername', 'helpful', 'reviewtext', 'overall',
+                  'summary', 'unixreviewtime', 'reviewtime']
+METADATA_HEADER = ['metadataid', 'asin', 'imurl', 'salesrank', 'categories', 'title',
+                   'description', 'price', 'related', 'brand']
+
+FIRST_REVIEW_TIME = int(datetime(2003, 1, 1, tzinfo=timezone.utc).timestamp())
+LAST_REVIEW_TIME = int(datetime(2014, 7, 23, tzinfo=timezone.utc).timestamp())
+
+# Star ratings are heavily skewed towards 5 in the real data.
+RATINGS = [5.0, 4.0, 3.0, 2.0, 1.0]
+RATING_WEIGHTS = [55, 21, 11, 6, 7]
+
+POSITIVE_WORDS = ['great', 'love', 'perfect', 'comfortable', 'nice', 'excellent', 'recommend', 'cute', 'happy']
+NEGATIVE_WORDS = ['bad', 'poor', 'disappointed', 'broken', 'cheap', 'awful', 'returned', 'terrible']
+NEUTRAL_WORDS = ['fit', 'size', 'color', 'shoes', 'dress', 'wear', 'ordered', 'material', 'the', 'it', 'was',
+                 'and', 'for', 'my', 'a', 'with', 'but', 'little', 'bit', 'runs', 'small', 'large', 'price']
+SUMMARIES = ['Five Stars', 'Great', 'Love it!', 'Perfect fit', 'Runs small', 'Four Stars', 'Not what I expected',
+             'Cheap material', 'Nice shoes for the price', 'Disappointed', 'Okay', 'Awful. Broken on arrival',
+             'Would recommend', 'Comfortable, "true to size"']
+REVIEWER_NAMES = ['Amazon Customer', 'J. Smith', 'Mary', 'Kindle Reader "bookworm"', 'S. Lee, NYC', 'Tom']
+
+TOP_CATEGORY = 'Clothing, Shoes & Jewelry'
+CATEGORY_PATHS = [
+    [TOP_CATEGORY, 'Women', 'Clothing', 'Dresses'],
+    [TOP_CATEGORY, 'Women', 'Shoes', 'Boots'],
+    [TOP_CATEGORY, 'Men', 'Clothing', 'Shirts'],
+    [TOP_CATEGORY, 'Men', 'Shoes', 'Athletic'],
+    [TOP_CATEGORY, 'Novelty, Costumes & More', 'Jewelry'],
+    [TOP_CATEGORY, 'Girls', 'Clothing'],
+    ['Sports & Outdoors', 'Clothing', 'Men'],
+]
+SALES_CATEGORIES = ['Clothing', 'Shoes', 'Jewelry', 'Sports &amp; Outdoors', 'Watches']
+BRANDS = ["Levi's", 'Nike', 'Carhartt', 'Dr. Martens', 'Hanes', 'Fossil', 'Crocs', 'Columbia']
+
+# How many recent rows duplicates are drawn from; keeps generation memory flat.
+DUPLICATE_POOL_SIZE = 10000
+
+
+def parse_count(value):
+    """Parses row counts such as 10000, 10k, 1M or 10M."""
+    value = str(value).strip().lower().replace('_', '')
+    multiplier = {'k': 10 ** 3, 'm': 10 ** 6}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def product_asin(index):
+    return f"B{index:09d}"
+
+
+def reviewer_id(index):
+    return f"A{index:013d}"
+
+
+def _review_text(rng, rating):
+    mood = POSITIVE_WORDS if rating >= 4 else NEGATIVE_WORDS if rating <= 2 else NEUTRAL_WORDS
+    words = [rng.choice(mood if rng.random() < 0.2 else NEUTRAL_WORDS)
+             for _ in range(max(3, int(rng.lognormvariate(3.3, 0.8))))]
+    text = ' '.join(words).capitalize() + '.'
+    if rng.random() < 0.1:
+        text += ' She said it was "perfect", but, honestly, it runs small.'
+    if rng.random() < 0.03:
+        text += '\nUpdate: still wearing them.'
+    return text
+
+
+def _review_date(unix_time):
+    """reviewtime as in the source data, e.g. '06 2, 2013'."""
+    moment = datetime.fromtimestamp(unix_time, tz=timezone.utc)
+    return f"{moment:%m} {moment.day}, {moment.year}"
+
+
+def _remember(rng, pool, row):
+    """Adds row to the bounded pool of earlier rows that duplicates are drawn from."""
+    if len(pool) < DUPLICATE_POOL_SIZE:
+        pool.append(row)
+    else:
+        pool[rng.randrange(DUPLICATE_POOL_SIZE)] = row
+
+
+def iter_review_rows(rows, num_products, duplicate_ratio=0.0, seed=7):
+    """Yields review rows in REVIEWS_HEADER order; duplicate_ratio of them repeat an earlier key."""
+    rng = random.Random(seed)
+    num_reviewers = max(1, rows // 5)
+    pool = []
+    span = LAST_REVIEW_TIME - FIRST_REVIEW_TIME
+    for _ in range(rows):
+        if pool and rng.random() < duplicate_ratio:
+            yield rng.choice(pool)
+            continue
+        rating = rng.choices(RATINGS, weights=RATING_WEIGHTS)[0]
+        # Review volume grows over time, and a few products get most of the reviews.
+        unix_time = FIRST_REVIEW_TIME + int(span * rng.random() ** 0.3) // 86400 * 86400
+        helpful_total = int(rng.expovariate(0.5))
+        row = [
+            reviewer_id(rng.randrange(num_reviewers)),
+            product_asin(int(num_products * rng.random() ** 2)),
+            None if rng.random() < 0.01 else rng.choice(REVIEWER_NAMES),
+            f"[{rng.randint(0, helpful_total)}, {helpful_total}]",
+            _review_text(rng, rating),
+            rating,
+            None if rng.random() < 0.001 else rng.choice(SUMMARIES),
+            unix_time,
+            _review_date(unix_time),
+        ]
+        _remember(rng, pool, row)
+        yield row
+
+
+def _price(rng):
+    roll = rng.random()
+    if roll < 0.25:
+        return None
+    if roll < 0.85:
+        return f"{rng.lognormvariate(3.0, 0.9):.2f}"
+    return f"${rng.randint(1000, 25000):,}.00"
+
+
+def iter_metadata_rows(rows, duplicate_ratio=0.0, seed=11):
+    """
+    Yields metadata rows in METADATA_HEADER order, one product per row, except that
+    duplicate_ratio of the rows re-list an earlier product with a new price and rank.
+    """
+    rng = random.Random(seed)
+    pool = []
+    product_index = 0
+    for metadata_id in range(rows):
+        if pool and rng.random() < duplicate_ratio:
+            row = list(rng.choice(pool))
+            row[0] = metadata_id
+            row[3] = f"{{'{rng.choice(SALES_CATEGORIES)}': {rng.randint(1, 5000000)}}}"
+            row[7] = _price(rng)
+            yield row
+            continue
+        asin = product_asin(product_index)
+        product_index += 1
+        roll = rng.random()
+        salesrank = (None if roll < 0.05 else '{}' if roll < 0.1
+                     else f"{{'{rng.choice(SALES_CATEGORIES)}': {rng.randint(1, 5000000)}}}")
+        categories = [rng.choice(CATEGORY_PATHS) for _ in range(rng.choice([1, 1, 1, 2, 3]))]
+        related = {key: [product_asin(rng.randrange(max(1, rows))) for _ in range(rng.randint(0, 6))]
+                   for key in ('also_bought', 'also_viewed', 'bought_together')}
+        row = [
+            metadata_id,
+            asin,
+            f"http://ecx.images-amazon.com/images/I/{rng.getrandbits(48):012x}.jpg",
+            salesrank,
+            str(categories),
+            None if rng.random() < 0.05 else f"{rng.choice(BRANDS)} {rng.choice(NEUTRAL_WORDS).title()} {metadata_id}",
+            None if rng.random() < 0.6 else _review_text(rng, 4.0),
+            _price(rng),
+            str({key: value for key, value in related.items() if value}),
+            None if rng.random() < 0.7 else rng.choice(BRANDS),
+        ]
+        _remember(rng, pool, row)
+        yield row
+
+
+def write_csv(path, header, rows):
+    """Writes rows to path with the CSV quoting pandas reads back; returns the row count."""
+    count = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def generate_dataset(out_dir, rows, metadata_rows=None, duplicate_ratio=0.0, seed=7):
+    """
+    Writes the reviews and metadata CSVs into out_dir under the names the loaders
+    expect and returns their paths. Reviews reference the generated products.
+    """
+    metadata_rows = metadata_rows if metadata_rows is not None else max(1, rows // 4)
+    os.makedirs(out_dir, exist_ok=True)
+    metadata_path = os.path.join(out_dir, METADATA_FILE_NAME)
+    reviews_path = os.path.join(out_dir, REVIEWS_FILE_NAME)
+    num_products = max(1, int(metadata_rows * (1 - duplicate_ratio)))
+    write_csv(metadata_path, METADATA_HEADER, iter_metadata_rows(metadata_rows, duplicate_ratio, seed + 1))
+    write_csv(reviews_path, REVIEWS_HEADER, iter_review_rows(rows, num_products, duplicate_ratio, seed))
+    return reviews_path, metadata_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_count, default=parse_count('10k'), help="Review rows, e.g. 10k, 1M, 10M.")
+    parser.add_argument('--metadata-rows', type=parse_count, help="Metadata rows (default: a quarter of --rows).")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help="Share of rows that repeat an earlier review key or product (0-1).")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out-dir', help="Output directory (default: benchmarks/data/<rows>).")
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', str(args.rows))
+    for path in generate_dataset(out_dir, args.rows, args.metadata_rows, args.duplicate_ratio, args.seed):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
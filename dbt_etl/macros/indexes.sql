@@ -0,0 +1,14 @@
+{#
+    CREATE INDEX IF NOT EXISTS for a model or snapshot, for use in post-hooks.
+    Wrap the hook in after_commit(): table rebuilds rename the old relation to a
+    backup that keeps its index names until it is dropped after the commit.
+#}
+{% macro create_index(relation, columns, method='btree', where=none, name=none, unique=false) %}
+    {%- set index_name = name or (relation.identifier ~ '_' ~ columns | join('_') ~ '_' ~ method ~ '_idx') -%}
+    {%- if index_name | length > 63 -%}
+        {%- set index_name = relation.identifier[:40] ~ '_' ~ local_md5(index_name)[:12] ~ '_idx' -%}
+    {%- endif -%}
+    CREATE {% if unique %}UNIQUE {% endif %}INDEX IF NOT EXISTS {{ adapter.quote(index_name) }}
+    ON {{ relation }} USING {{ method }} ({{ columns | join(', ') }})
+    {%- if where %} WHERE {{ where }}{% endif %}
+{% endmacro %}
@@ -0,0 +1,41 @@
+{#
+    Converts fact_review into a table range-partitioned by date_sk, one partition per
+    year plus a default partition for NULL and out-of-range dates. Run once with
+        dbt run-operation partition_fact_review --args '{start_year: 2000, end_year: 2030}'
+    and set the fact_review_partitioned var so dbt never replaces it with a plain
+    table on --full-refresh. Incremental runs insert into the parent as before, and
+    the model's post-hooks recreate its indexes on every partition.
+#}
+{% macro partition_fact_review(start_year=2000, end_year=2030) %}
+    {%- set relation = adapter.get_relation(database=target.database, schema=target.schema, identifier='fact_review') -%}
+    {%- if relation is none -%}
+        {{ exceptions.raise_compiler_error("fact_review does not exist yet; build it with dbt run first.") }}
+    {%- endif -%}
+
+    {%- set relkind = run_query("SELECT relkind FROM pg_class WHERE oid = '" ~ relation ~ "'::regclass").columns[0].values()[0] -%}
+    {%- if relkind == 'p' -%}
+        {{ log("fact_review is already partitioned.", info=True) }}
+        {{ return(none) }}
+    {%- endif -%}
+
+    {%- set unpartitioned = relation.incorporate(path={"identifier": "fact_review__unpartitioned"}) -%}
+    {%- set statements = [
+        "ALTER TABLE " ~ relation ~ " RENAME TO " ~ unpartitioned.identifier,
+        "CREATE TABLE " ~ relation ~ " (LIKE " ~ unpartitioned ~ " INCLUDING DEFAULTS) PARTITION BY RANGE (date_sk)",
+    ] -%}
+    {%- for year in range(start_year, end_year + 1) -%}
+        {%- do statements.append(
+            "CREATE TABLE " ~ relation.incorporate(path={"identifier": "fact_review_p" ~ year}) ~
+            " PARTITION OF " ~ relation ~ " FOR VALUES FROM ('" ~ year ~ "-01-01') TO ('" ~ (year + 1) ~ "-01-01')"
+        ) -%}
+    {%- endfor -%}
+    {%- do statements.append("CREATE TABLE " ~ relation.incorporate(path={"identifier": "fact_review_pdefault"}) ~ " PARTITION OF " ~ relation ~ " DEFAULT") -%}
+    {%- do statements.append("INSERT INTO " ~ relation ~ " SELECT * FROM " ~ unpartitioned) -%}
+    {#- Drops the old table together with its indexes, so the post-hooks' names are free again. -#}
+    {%- do statements.append("DROP TABLE " ~ unpartitioned) -%}
+    {%- do statements.append("ANALYZE " ~ relation) -%}
+
+    {%- do statements.append("COMMIT") -%}
+    {%- do run_query(statements | join(";\n")) -%}
+    {{ log("Partitioned fact_review by date_sk into years " ~ start_year ~ "-" ~ end_year ~ ". Run dbt run --select fact_review to recreate its indexes.", info=True) }}
+{% endmacro %}
@@ -0,0 +1,11 @@
+{#
+    Restricts a snapshot's source query to rows ingested after the newest row the
+    snapshot has already seen, so each run only compares the day's delta. Renders
+    nothing on the first run, when the snapshot table does not exist yet.
+#}
+{% macro snapshot_watermark_filter(column_name='ingestion_timestamp') %}
+    {%- set existing = adapter.get_relation(database=this.database, schema=this.schema, identifier=this.identifier) -%}
+    {%- if existing is not none %}
+    AND {{ column_name }} > (SELECT COALESCE(MAX({{ column_name }}), '1900-01-01'::TIMESTAMP) FROM {{ this }})
+    {%- endif %}
+{% endmacro %}
@@ -1 +1,71 @@
-{{ dbt_date.get_date_dimension('2000-01-01', '2030-12-31') }}
\ No newline at end of file
+{{ config(
+    materialized='incremental',
+    unique_key='date_day',
+    incremental_strategy='delete+insert',
+    on_schema_change='fail',
+    post_hook=[
+        after_commit("{{ create_index(this, ['date_day'], unique=true) }}"),
+        after_commit("{{ create_index(this, ['year_month']) }}"),
+        after_commit("ANALYZE {{ this }}")
+    ]
+) }}
+
+-- depends_on: {{ ref('stg_reviews_data') }}
+
+-- Persistent calendar: covers at least [dim_date_start, dim_date_end) and is extended by
+-- whole years when reviews fall outside it (MIN/MAX review_timestamp, served by the
+-- staging index). An incremental run only generates the missing dates, so the table,
+-- its indexes and statistics are kept; when the range has not grown it inserts nothing.
+-- year_month (YYYYMM) is the month key the rollups and dashboards group on.
+
+{%- set needed_start = var('dim_date_start', '2000-01-01') -%}
+{%- set needed_end = var('dim_date_end', '2031-01-01') -%}
+{%- set ranges = [] -%}
+
+{%- if execute -%}
+    {%- set needed = run_query(
+        "SELECT LEAST('" ~ needed_start ~ "'::DATE, DATE_TRUNC('year', MIN(review_timestamp))::DATE)::TEXT, "
+        ~ "GREATEST('" ~ needed_end ~ "'::DATE, (DATE_TRUNC('year', MAX(review_timestamp)) + INTERVAL '1 year')::DATE)::TEXT "
+        ~ "FROM " ~ ref('stg_reviews_data')
+    ) -%}
+    {%- set needed_start = needed.columns[0].values()[0] -%}
+    {%- set needed_end = needed.columns[1].values()[0] -%}
+
+    {%- if is_incremental() -%}
+        {%- set existing = run_query(
+            "SELECT MIN(date_day)::TEXT, (MAX(date_day) + 1)::TEXT FROM " ~ this
+        ) -%}
+        {%- set existing_start = existing.columns[0].values()[0] -%}
+        {%- set existing_end = existing.columns[1].values()[0] -%}
+        {%- if existing_start is none -%}
+            {%- do ranges.append((needed_start, needed_end)) -%}
+        {%- else -%}
+            {%- if needed_start < existing_start -%}
+                {%- do ranges.append((needed_start, existing_start)) -%}
+            {%- endif -%}
+            {%- if needed_end > existing_end -%}
+                {%- do ranges.append((existing_end, needed_end)) -%}
+            {%- endif -%}
+        {%- endif -%}
+    {%- else -%}
+        {%- do ranges.append((needed_start, needed_end)) -%}
+    {%- endif -%}
+{%- else -%}
+    {%- do ranges.append((needed_start, needed_end)) -%}
+{%- endif %}
+
+{% if ranges %}
+SELECT
+    dates.*,
+    (dates.year_number * 100 + dates.month_of_year)::INTEGER AS year_month
+FROM (
+    {%- for range_start, range_end in ranges %}
+    SELECT * FROM ({{ dbt_date.get_date_dimension(range_start, range_end) }}) generated_dates
+    {%- if not loop.last %}
+    UNION ALL
+    {%- endif %}
+    {%- endfor %}
+) dates
+{% else %}
+SELECT * FROM {{ this }} WHERE FALSE
+{% endif %}
@@ -0,0 +1,22 @@
+{{ config(
+    materialized='table',
+    post_hook=[
+        after_commit("{{ create_index(this, ['product_id'], name=this.identifier ~ '_product_id_key', unique=true) }}")
+    ]
+) }}
+
+-- One row per product: its current dim_product_scd2 version. Join on product_id for
+-- current attributes, or on fact_review.product_sk = product_sk for the same version.
+SELECT
+    dbt_scd_id AS product_sk,
+    product_id,
+    product_title,
+    category,
+    brand,
+    product_price,
+    dbt_valid_from AS valid_from,
+    dbt_updated_at
+FROM
+    {{ ref('dim_product_scd2') }}
+WHERE
+    dbt_valid_to IS NULL
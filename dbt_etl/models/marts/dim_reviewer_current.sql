@@ -0,0 +1,18 @@
+{{ config(
+    materialized='table',
+    post_hook=[
+        after_commit("{{ create_index(this, ['reviewer_id'], name=this.identifier ~ '_reviewer_id_key', unique=true) }}")
+    ]
+) }}
+
+-- One row per reviewer: their current dim_reviewer_scd2 version.
+SELECT
+    dbt_scd_id AS reviewer_sk,
+    reviewer_id,
+    reviewer_name,
+    dbt_valid_from AS valid_from,
+    dbt_updated_at
+FROM
+    {{ ref('dim_reviewer_scd2') }}
+WHERE
+    dbt_valid_to IS NULL
@@ -2,9 +2,59 @@
     materialized='incremental',
     unique_key='review_sk',
     on_schema_change='fail',
-    incremental_strategy='delete+insert'
+    incremental_strategy='delete+insert',
+    full_refresh=(false if var('fact_review_partitioned', false) else none),
+    post_hook=[
+        after_commit("{{ create_index(this, ['review_sk']) }}"),
+        after_commit("{{ create_index(this, ['ingestion_timestamp']) }}"),
+        after_commit("{{ create_index(this, ['date_sk'], method='brin') }}"),
+        after_commit("{{ create_index(this, ['product_id']) }}"),
+        after_commit("{{ create_index(this, ['reviewer_id']) }}"),
+        after_commit("{{ create_index(this, ['product_sk']) }}"),
+        after_commit("{{ create_index(this, ['reviewer_sk']) }}"),
+        after_commit("ANALYZE {{ this }}")
+    ]
 ) }}
 
+-- product_sk/reviewer_sk are the dbt_scd_id of the snapshot version in effect on the
+-- review date, so downstream models join a single version with an equi-join. Versions
+-- are half-open [valid_from, valid_to); a key's first version also covers all earlier
+-- dates, as the snapshots only start when the warehouse was first loaded.
+
+WITH reviews AS (
+    SELECT *
+    FROM {{ ref('stg_reviews_data') }}
+    {% if is_incremental() %}
+        WHERE ingestion_timestamp > (SELECT MAX(ingestion_timestamp) FROM {{ this }})
+    {% endif %}
+),
+
+product_versions AS (
+    SELECT
+        dbt_scd_id,
+        product_id,
+        CASE
+            WHEN ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY dbt_valid_from) = 1 THEN '-infinity'::TIMESTAMP
+            ELSE dbt_valid_from
+        END AS valid_from,
+        COALESCE(dbt_valid_to, 'infinity'::TIMESTAMP) AS valid_to
+    FROM {{ ref('dim_product_scd2') }}
+    WHERE product_id IN (SELECT product_id FROM reviews)
+),
+
+reviewer_versions AS (
+    SELECT
+        dbt_scd_id,
+        reviewer_id,
+        CASE
+            WHEN ROW_NUMBER() OVER (PARTITION BY reviewer_id ORDER BY dbt_valid_from) = 1 THEN '-infinity'::TIMESTAMP
+            ELSE dbt_valid_from
+        END AS valid_from,
+        COALESCE(dbt_valid_to, 'infinity'::TIMESTAMP) AS valid_to
+    FROM {{ ref('dim_reviewer_scd2') }}
+    WHERE reviewer_id IN (SELECT reviewer_id FROM reviews)
+)
+
 SELECT
     {{ dbt_utils.generate_surrogate_key([
         'reviews.reviewer_id',
@@ -14,6 +64,8 @@ SELECT
 
     reviews.reviewer_id::TEXT AS reviewer_id,
     reviews.product_id::TEXT AS product_id,
+    products_scd.dbt_scd_id::TEXT AS product_sk,
+    reviewers_scd.dbt_scd_id::TEXT AS reviewer_sk,
     dates.date_day AS date_sk,
 
     reviews.review_summary::TEXT AS review_summary,
@@ -21,19 +73,17 @@ SELECT
     COALESCE(reviews.sentiment, 'None')::TEXT AS sentiment,
     reviews.ingestion_timestamp
 
-FROM {{ ref('stg_reviews_data') }} reviews 
+FROM reviews
 
-LEFT JOIN {{ ref('dim_product_scd2') }} products_scd
+LEFT JOIN product_versions products_scd
     ON reviews.product_id::TEXT = products_scd.product_id::TEXT
-    AND reviews.review_timestamp BETWEEN products_scd.dbt_valid_from AND COALESCE(products_scd.dbt_valid_to, '9999-12-31'::TIMESTAMP)
+    AND reviews.review_timestamp >= products_scd.valid_from
+    AND reviews.review_timestamp < products_scd.valid_to
 
-LEFT JOIN {{ ref('dim_reviewer_scd2') }} reviewers_scd
+LEFT JOIN reviewer_versions reviewers_scd
     ON reviews.reviewer_id::TEXT = reviewers_scd.reviewer_id::TEXT
-    AND reviews.review_timestamp BETWEEN reviewers_scd.dbt_valid_from AND COALESCE(reviewers_scd.dbt_valid_to, '9999-12-31'::TIMESTAMP)
+    AND reviews.review_timestamp >= reviewers_scd.valid_from
+    AND reviews.review_timestamp < reviewers_scd.valid_to
 
 LEFT JOIN {{ ref('dim_date') }} dates
     ON reviews.review_timestamp::DATE = dates.date_day
-
-{% if is_incremental() %}
-    WHERE reviews.ingestion_timestamp > (SELECT MAX(ingestion_timestamp) FROM {{ this }})
-{% endif %}
\ No newline at end of file
@@ -0,0 +1,69 @@
+{{ config(
+    materialized='incremental',
+    unique_key='month_start',
+    incremental_strategy='delete+insert',
+    on_schema_change='fail',
+    post_hook=[
+        after_commit("{{ create_index(this, ['month_start']) }}"),
+        after_commit("ANALYZE {{ this }}")
+    ]
+) }}
+
+-- Monthly rollup of fact_review at grain (month, category, brand, sentiment) for the
+-- dashboard queries in queries.sql. Products are attributed by their current version
+-- (dim_product_current); months come from dim_date's precomputed
+-- month_start_date and year_month. An incremental run rebuilds only whole months: those with newly
+-- ingested reviews, and those with reviews of products whose current version changed.
+
+{% if is_incremental() %}
+WITH touched_months AS (
+    SELECT DATE_TRUNC('month', date_sk)::DATE AS month_start
+    FROM {{ ref('fact_review') }}
+    WHERE ingestion_timestamp > (SELECT MAX(max_ingestion_timestamp) FROM {{ this }})
+
+    UNION
+
+    SELECT DATE_TRUNC('month', reviews.date_sk)::DATE AS month_start
+    FROM {{ ref('fact_review') }} reviews
+    JOIN {{ ref('dim_product_current') }} products
+        ON reviews.product_id = products.product_id
+    WHERE products.dbt_updated_at > (SELECT MAX(rolled_up_at) FROM {{ this }})
+)
+{% endif %}
+
+SELECT
+    dates.month_start_date::DATE AS month_start,
+    dates.year_month,
+    dates.year_number,
+    dates.month_of_year,
+    dates.month_name,
+    products.category,
+    products.brand,
+    reviews.sentiment,
+    SUM(reviews.rating) AS rating_sum,
+    COUNT(reviews.rating) AS rating_count,
+    COUNT(*) AS review_count,
+    MAX(reviews.ingestion_timestamp) AS max_ingestion_timestamp,
+    CURRENT_TIMESTAMP::TIMESTAMP AS rolled_up_at
+
+FROM {{ ref('fact_review') }} reviews
+
+JOIN {{ ref('dim_date') }} dates
+    ON reviews.date_sk = dates.date_day
+
+JOIN {{ ref('dim_product_current') }} products
+    ON reviews.product_id = products.product_id
+
+{% if is_incremental() %}
+    WHERE DATE_TRUNC('month', reviews.date_sk)::DATE IN (SELECT month_start FROM touched_months)
+{% endif %}
+
+GROUP BY
+    dates.month_start_date,
+    dates.year_month,
+    dates.year_number,
+    dates.month_of_year,
+    dates.month_name,
+    products.category,
+    products.brand,
+    reviews.sentiment
@@ -1,5 +1,12 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    unique_key='product_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='fail',
+    post_hook=[
+        after_commit("{{ create_index(this, ['product_id']) }}"),
+        after_commit("{{ create_index(this, ['ingestion_timestamp']) }}")
+    ]
 ) }}
 
 SELECT
@@ -15,4 +22,8 @@ SELECT
     product_brand,
     ingestion_timestamp
 FROM
-    public.processed_metadata_category
\ No newline at end of file
+    public.processed_metadata_category
+
+{% if is_incremental() %}
+    WHERE ingestion_timestamp > (SELECT COALESCE(MAX(ingestion_timestamp), '1900-01-01'::TIMESTAMP) FROM {{ this }})
+{% endif %}
@@ -1,5 +1,13 @@
 {{ config(
-    materialized='table'
+    materialized='incremental',
+    unique_key=['reviewer_id', 'product_id', 'unix_review_timestamp'],
+    incremental_strategy='delete+insert',
+    on_schema_change='fail',
+    post_hook=[
+        after_commit("{{ create_index(this, ['reviewer_id', 'product_id', 'unix_review_timestamp']) }}"),
+        after_commit("{{ create_index(this, ['ingestion_timestamp']) }}"),
+        after_commit("{{ create_index(this, ['review_timestamp']) }}")
+    ]
 ) }}
 
 SELECT
@@ -13,4 +21,8 @@ SELECT
     review_timestamp,
     ingestion_timestamp
 FROM
-    public.processed_reviews_data
\ No newline at end of file
+    public.processed_reviews_data
+
+{% if is_incremental() %}
+    WHERE ingestion_timestamp > (SELECT COALESCE(MAX(ingestion_timestamp), '1900-01-01'::TIMESTAMP) FROM {{ this }})
+{% endif %}
@@ -6,19 +6,28 @@
         unique_key='product_id',
         strategy='check',
         check_cols=['product_title', 'category', 'brand'],
-        invalidate_hard_deletes=True
+        post_hook=[
+            after_commit("{{ create_index(this, ['product_id', 'dbt_valid_from', 'dbt_valid_to']) }}"),
+            after_commit("{{ create_index(this, ['product_id'], where='dbt_valid_to IS NULL', name=this.identifier ~ '_current_idx') }}"),
+            after_commit("{{ create_index(this, ['dbt_scd_id']) }}"),
+            after_commit("{{ create_index(this, ['ingestion_timestamp']) }}"),
+            after_commit("ANALYZE {{ this }}")
+        ]
     )
 }}
 
+-- Only products ingested since the last snapshot are compared; the rest are unchanged.
 SELECT
     product_id,
     product_title,
     COALESCE(first_category, 'Uncategorized') AS category,
     product_brand AS brand,
-    product_price
+    product_price,
+    ingestion_timestamp
 FROM
     {{ ref('stg_metadata_category') }}
 WHERE
     product_id IS NOT NULL
+    {{ snapshot_watermark_filter() }}
 
-{% endsnapshot %}
\ No newline at end of file
+{% endsnapshot %}
@@ -6,16 +6,27 @@
         unique_key='reviewer_id',
         strategy='check',
         check_cols=['reviewer_name'],
-        invalidate_hard_deletes=True 
+        post_hook=[
+            after_commit("{{ create_index(this, ['reviewer_id', 'dbt_valid_from', 'dbt_valid_to']) }}"),
+            after_commit("{{ create_index(this, ['reviewer_id'], where='dbt_valid_to IS NULL', name=this.identifier ~ '_current_idx') }}"),
+            after_commit("{{ create_index(this, ['dbt_scd_id']) }}"),
+            after_commit("{{ create_index(this, ['ingestion_timestamp']) }}"),
+            after_commit("ANALYZE {{ this }}")
+        ]
     )
 }}
 
-SELECT
+-- One row per reviewer (their latest review) among the reviews ingested since the last snapshot.
+SELECT DISTINCT ON (reviewer_id)
     reviewer_id,
-    reviewer_name
+    reviewer_name,
+    ingestion_timestamp
 FROM
     {{ ref('stg_reviews_data') }}
 WHERE
     reviewer_id IS NOT NULL
+    {{ snapshot_watermark_filter() }}
+ORDER BY
+    reviewer_id, ingestion_timestamp DESC, unix_review_timestamp DESC
 
-{% endsnapshot %}
\ No newline at end of file
+{% endsnapshot %}
@@ -1,71 +1,64 @@
+-- These queries read the monthly rollup agg_review_monthly (dbt_etl/models/marts/rollups/),
+-- which holds rating sums/counts and review counts per (month, category, brand, sentiment),
+-- instead of joining all of fact_review to dim_date and dim_product_scd2. Months are grouped
+-- and ordered on the precomputed year_month key (YYYYMM) from dim_date.
+
 -- Average review rating per category per month:
 SELECT
-    DD.year_number,
-    DD.month_name,
-    DP.category,
-    AVG(FR.rating) AS avg_rating
+    AR.year_number,
+    AR.month_name,
+    AR.category,
+    SUM(AR.rating_sum) / NULLIF(SUM(AR.rating_count), 0) AS avg_rating
 FROM
-    fact_review FR
-JOIN
-    dim_date DD ON FR.date_sk = DD.date_day
-JOIN
-    dim_product_scd2 DP ON FR.product_id = DP.product_id
+    agg_review_monthly AR
 GROUP BY
-    DD.year_number,
-    DD.month_name,
-    DP.category
+    AR.year_month,
+    AR.year_number,
+    AR.month_name,
+    AR.category
 ORDER BY
-    DD.year_number,
-    DD.month_name,
-    DP.category;
+    AR.year_month,
+    AR.category;
 
 -- Analysis of review rating per brand per month
 SELECT
-    DD.year_number,
-    DD.month_name,
-    DP.brand,
-    AVG(FR.rating) AS avg_rating
+    AR.year_number,
+    AR.month_name,
+    AR.brand,
+    SUM(AR.rating_sum) / NULLIF(SUM(AR.rating_count), 0) AS avg_rating
 FROM
-    fact_review FR
-JOIN
-    dim_date DD ON FR.date_sk = DD.date_day
-JOIN
-    dim_product_scd2 DP ON FR.product_id = DP.product_id
+    agg_review_monthly AR
 WHERE
-	brand IS NOT NULL
+	AR.brand IS NOT NULL
 GROUP BY
-    DD.year_number,
-    DD.month_name,
-    DP.brand
+    AR.year_month,
+    AR.year_number,
+    AR.month_name,
+    AR.brand
 ORDER BY
-    DD.year_number,
-    DD.month_name,
-    DP.brand;
+    AR.year_month,
+    AR.brand;
 
 -- Total count for each brand with its sentiment count
-SELECT DP.brand,
-    SUM(CASE WHEN FR.sentiment = 'Positive' THEN 1 ELSE 0 END) AS positive_count,
-	SUM(CASE WHEN FR.sentiment = 'Negative' THEN 1 ELSE 0 END) AS negative_count
-FROM fact_review FR
-JOIN dim_date DD ON FR.date_sk = DD.date_day
-JOIN dim_product_scd2 DP ON FR.product_id = DP.product_id
-WHERE DP.brand IS NOT NULL
-	-- DP.brand = 'Sloggers'
-GROUP BY DP.brand
-ORDER BY DP.brand;
+SELECT AR.brand,
+    SUM(CASE WHEN AR.sentiment = 'Positive' THEN AR.review_count ELSE 0 END) AS positive_count,
+	SUM(CASE WHEN AR.sentiment = 'Negative' THEN AR.review_count ELSE 0 END) AS negative_count
+FROM agg_review_monthly AR
+WHERE AR.brand IS NOT NULL
+	-- AR.brand = 'Sloggers'
+GROUP BY AR.brand
+ORDER BY AR.brand;
 
 
 -- Brand with maximum positive and negative sentiment counts
 WITH temp_table AS (SELECT
-    DP.brand,
-    SUM(CASE WHEN FR.sentiment = 'Positive' THEN 1 ELSE 0 END) AS positive_count,
-	SUM(CASE WHEN FR.sentiment = 'Negative' THEN 1 ELSE 0 END) AS negative_count
-FROM fact_review FR
-JOIN dim_date DD ON FR.date_sk = DD.date_day
-JOIN dim_product_scd2 DP ON FR.product_id = DP.product_id
-WHERE DP.brand IS NOT NULL
-GROUP BY DP.brand
-ORDER BY DP.brand),
+    AR.brand,
+    SUM(CASE WHEN AR.sentiment = 'Positive' THEN AR.review_count ELSE 0 END) AS positive_count,
+	SUM(CASE WHEN AR.sentiment = 'Negative' THEN AR.review_count ELSE 0 END) AS negative_count
+FROM agg_review_monthly AR
+WHERE AR.brand IS NOT NULL
+GROUP BY AR.brand
+ORDER BY AR.brand),
 
 ranked_brands AS (SELECT
         brand,
@@ -74,7 +67,7 @@ ranked_brands AS (SELECT
         ROW_NUMBER() OVER (ORDER BY positive_count DESC) AS rn_positive,
         ROW_NUMBER() OVER (ORDER BY negative_count DESC) AS rn_negative
     FROM temp_table)
-	
+
 SELECT brand, positive_count AS count_value, 'Max Positive' AS count_type
 FROM ranked_brands
 WHERE rn_positive = 1
@@ -83,4 +76,4 @@ UNION ALL
 
 SELECT brand, negative_count AS count_value, 'Max Negative' AS count_type
 FROM ranked_brands
-WHERE rn_negative = 1;
\ No newline at end of file
+WHERE rn_negative = 1;
@@ -1,60 +1,206 @@
-from flask import Flask, request, jsonify
+import gc
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+from instrumentation import metrics, process_age_seconds, process_memory
+from keyword_scorer import KeywordScorer
+from polarity_lexicon import LEXICON_PATH, PolarityLexicon
+from sentiment_cache import SentimentCache, score_with_cache
 
 app = Flask(__name__)
 
+# Number of pre-forked scoring processes a /sentiment request is spread across.
+SCORING_PROCESSES = int(os.getenv('SENTIMENT_SCORING_PROCESSES', str(os.cpu_count() or 1)))
+# Requests smaller than this are scored inline; splitting them costs more than it saves.
+MIN_TEXTS_PER_PROCESS = int(os.getenv('SENTIMENT_MIN_TEXTS_PER_PROCESS', '100'))
+CACHE_ENABLED = os.getenv('SENTIMENT_CACHE_ENABLED', 'true').lower() == 'true'
+# /sentiment/stream scores records in batches of this many as they arrive.
+STREAM_BATCH_SIZE = int(os.getenv('SENTIMENT_STREAM_BATCH_SIZE', '2000'))
+STREAM_READ_SIZE = 256 * 1024
+
+# auto: the compact lexicon when polarity_lexicon.json exists, else TextBlob, else keywords.
+SCORER = os.getenv('SENTIMENT_SCORER', 'auto').lower()
+
 _get_sentiment_logic = None
+# Scores a whole list at once, for scorers that can do better than one text at a time.
+_get_batch_sentiment_logic = None
+_warm_up = None
+SCORER_VERSION = None
+SCORER_BACKEND = None
 
-try:
-    from textblob import TextBlob
 
-    def _textblob_sentiment(text):
-        """Sentiment analysis using TextBlob."""
-        if not text or not isinstance(text, str) or text.strip() == '':
-            return None
-        try:
-            analysis = TextBlob(text)
-            polarity_score = analysis.sentiment.polarity
+def _polarity_label(polarity_score):
+    if polarity_score > 0.6:
+        return 'Positive'
+    elif polarity_score < -0.6:
+        return 'Negative'
+    else:
+        return 'Neutral'
 
-            if polarity_score > 0.6:
-                return 'Positive'
-            elif polarity_score < -0.6:
-                return 'Negative'
-            else:
-                return 'Neutral'
-            
-        except Exception as e:
-            print(f"Error calculating sentiment in service (TextBlob) for text: '{text[:50]}...'. Error: {e}")
-            return None
-    
-    _get_sentiment_logic = _textblob_sentiment
-    print("TextBlob sentiment logic loaded.")
-
-except ImportError:
-    print("TextBlob not found. Falling back to simple keyword-based sentiment in service.")
+
+if SCORER in ('auto', 'lexicon'):
+    if os.path.exists(LEXICON_PATH):
+        # Loaded at import, i.e. before the scoring processes are forked, so they share it.
+        _lexicon = PolarityLexicon.load(LEXICON_PATH)
+
+        def _lexicon_sentiment(text):
+            """Sentiment analysis using the compact TextBlob polarity lexicon."""
+            if not text or not isinstance(text, str) or text.strip() == '':
+                return None
+            try:
+                return _polarity_label(_lexicon.polarity(text))
+            except Exception as e:
+                print(f"Error calculating sentiment in service (lexicon) for text: '{text[:50]}...'. Error: {e}")
+                return None
+
+        def _lexicon_warm_up():
+            """Compiles the tokenizer's regexes on a first text."""
+            _lexicon.polarity('warm up :)')
+
+        _get_sentiment_logic = _lexicon_sentiment
+        _warm_up = _lexicon_warm_up
+        # Same labels as TextBlob's, so cached labels stay valid.
+        SCORER_VERSION = _lexicon.scorer_version
+        SCORER_BACKEND = 'lexicon'
+        print(f"Polarity lexicon loaded ({len(_lexicon.words)} words, {SCORER_VERSION}).")
+    elif SCORER == 'lexicon':
+        raise RuntimeError(f"SENTIMENT_SCORER=lexicon but {LEXICON_PATH} does not exist; "
+                           "build it with 'python polarity_lexicon.py build'.")
+
+if _get_sentiment_logic is None and SCORER in ('auto', 'textblob'):
+    try:
+        import textblob
+        from textblob.en.sentiments import PatternAnalyzer
+
+        # TextBlob(text).sentiment delegates to a PatternAnalyzer; sharing one instance
+        # per process avoids building a TextBlob (and re-tokenizing) for every text.
+        _analyzer = PatternAnalyzer()
+
+        def _textblob_sentiment(text):
+            """Sentiment analysis using TextBlob."""
+            if not text or not isinstance(text, str) or text.strip() == '':
+                return None
+            try:
+                return _polarity_label(_analyzer.analyze(text)[0])
+            except Exception as e:
+                print(f"Error calculating sentiment in service (TextBlob) for text: '{text[:50]}...'. Error: {e}")
+                return None
+
+        def _textblob_warm_up():
+            """Loads the pattern lexicon, which TextBlob otherwise reads lazily on the first text."""
+            _analyzer.analyze('warm up')
+
+        _get_sentiment_logic = _textblob_sentiment
+        _warm_up = _textblob_warm_up
+        SCORER_VERSION = f"textblob-{textblob.__version__}"
+        SCORER_BACKEND = 'textblob'
+        print("TextBlob sentiment logic loaded.")
+
+    except ImportError:
+        print("TextBlob not found. Falling back to simple keyword-based sentiment in service.")
+
+if _get_sentiment_logic is None:
+    _keyword_scorer = KeywordScorer.from_env()
 
     def _keyword_sentiment(text):
         """Sentiment analysis using simple keywords."""
-        if not text or not isinstance(text, str) or text.strip() == '':
-            return None
-        text_lower = text.lower()
-        positive_keywords = ['great', 'excellent', 'amazing', 'love', 'good', 'happy', 'perfect', 'nice', 'best', 'awesome', 'recommend', '👍']
-        negative_keywords = ['bad', 'terrible', 'horrible', 'poor', 'disappointed', 'waste', 'broken', 'not good', 'awful', 'unhappy', '👎']
-        
-        positive_score = sum(1 for keyword in positive_keywords if keyword in text_lower)
-        negative_score = sum(1 for keyword in negative_keywords if keyword in text_lower)
-
-        if positive_score > negative_score:
-            return 'Positive'
-        elif negative_score > positive_score:
-            return 'Negative'
-        else:
-            return 'Neutral'
-            
+        return _keyword_scorer.score(text)
+
+    def _keyword_warm_up():
+        """The keyword lexicon is prepared on import and scoring is plain str.find; there is nothing to preload."""
+
     _get_sentiment_logic = _keyword_sentiment
+    _get_batch_sentiment_logic = _keyword_scorer.score_batch
+    _warm_up = _keyword_warm_up
+    SCORER_VERSION = _keyword_scorer.version
+    SCORER_BACKEND = 'keyword'
 
 if _get_sentiment_logic is None:
     raise RuntimeError("No sentiment logic could be loaded!")
 
+_sentiment_cache = SentimentCache(SCORER_VERSION) if CACHE_ENABLED else None
+
+
+def score_batch(texts):
+    """Scores a list of texts in the current process."""
+    if _get_batch_sentiment_logic is not None:
+        return _get_batch_sentiment_logic(texts)
+    return [_get_sentiment_logic(text) for text in texts]
+
+
+_scoring_pool = None
+_scoring_pool_size = 1
+# Seconds from this process starting (gunicorn: the worker being forked) until warm.
+_cold_start_seconds = None
+
+
+def start_scoring_pool(processes=SCORING_PROCESSES):
+    """
+    Forks the scoring processes up front and warms each one, so the lexicon is loaded
+    once per process before the first request. Called from warm_up_service before any
+    request threads exist.
+    """
+    global _scoring_pool, _scoring_pool_size
+    if _scoring_pool is None and processes > 1:
+        # Move everything loaded so far (the lexicon above all) out of the collector's
+        # reach, so garbage collection in the forked processes does not write to, and
+        # so un-share, those pages.
+        gc.collect()
+        gc.freeze()
+        _scoring_pool = ProcessPoolExecutor(max_workers=processes, initializer=_warm_up)
+        _scoring_pool_size = processes
+        # The executor forks its processes on the first submit; do that now, not mid-request.
+        for future in [_scoring_pool.submit(_warm_up) for _ in range(processes)]:
+            future.result()
+        print(f"Started {processes} sentiment scoring processes.")
+    return _scoring_pool
+
+
+def warm_up_service(processes=SCORING_PROCESSES):
+    """
+    Warms the scorer, starts the scoring pool and only then marks the service ready
+    (/ready). Called from the gunicorn post_worker_init hook (see gunicorn.conf.py).
+    """
+    global _cold_start_seconds
+    _warm_up()
+    start_scoring_pool(processes)
+    _cold_start_seconds = process_age_seconds()
+    if _cold_start_seconds is not None:
+        metrics.set_gauge('cold_start_seconds', _cold_start_seconds)
+    print(f"Sentiment service ready after {_cold_start_seconds}s ({SCORER_BACKEND} scorer, {SCORER_VERSION}).")
+
+
+def process_memory_report():
+    """RSS, shared and PSS bytes of this process and of each scoring process."""
+    report = [dict(process='http', pid=os.getpid(), **process_memory())]
+    children = sorted(multiprocessing.active_children(), key=lambda child: child.pid)
+    for index, child in enumerate(children, 1):
+        report.append(dict(process=f'scoring-{index}', pid=child.pid, **process_memory(child.pid)))
+    return report
+
+
+def score_texts(texts):
+    """Scores texts, spreading large lists evenly across the scoring processes."""
+    if _scoring_pool is None or len(texts) < 2 * MIN_TEXTS_PER_PROCESS:
+        return score_batch(texts)
+    slices = min(_scoring_pool_size, len(texts) // MIN_TEXTS_PER_PROCESS)
+    slice_size = -(-len(texts) // slices)
+    results = []
+    for batch in _scoring_pool.map(score_batch, [texts[i:i + slice_size] for i in range(0, len(texts), slice_size)]):
+        results.extend(batch)
+    return results
+
+
+def score_with_service_cache(texts):
+    """Scores texts through the service's sentiment cache, when enabled."""
+    if _sentiment_cache is not None:
+        return score_with_cache(texts, _sentiment_cache, score_texts)
+    return score_texts(texts)
+
 
 @app.route('/sentiment', methods=['POST'])
 def analyze_sentiment():
@@ -62,17 +208,136 @@ def analyze_sentiment():
     if not data or 'texts' not in data or not isinstance(data['texts'], list):
         return jsonify({"error": "Missing or invalid 'texts' (must be a list) in request body"}), 400
 
-    texts = data['texts']
-    results = []
-    for text in texts:
-        sentiment = _get_sentiment_logic(text)
-        results.append(sentiment)
+    with metrics.timer('request_seconds', route='/sentiment'):
+        results = score_with_service_cache(data['texts'])
+    metrics.inc('texts_scored', len(results))
 
     return jsonify({"sentiments": results})
 
+
+def _parse_stream_record(line, record_number):
+    """(id, text, error) for one line of a /sentiment/stream body."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None, f"invalid JSON in record {record_number}"
+    if not isinstance(record, dict) or 'id' not in record:
+        return None, None, f"record {record_number} has no 'id'"
+    if record.get('text') is not None and not isinstance(record['text'], str):
+        return record['id'], None, "'text' must be a string"
+    return record['id'], record.get('text'), None
+
+
+def _read_stream_records(stream, read_size=STREAM_READ_SIZE):
+    """
+    Yields (id, text, error) per line of a newline-delimited JSON body of {"id", "text"}
+    records. The body is read in blocks and each block's lines are decoded in one call;
+    lines are only parsed one by one when that does not give one record per line.
+    """
+    pending = b''
+    record_number = 0
+    while True:
+        block = stream.read(read_size)
+        if block:
+            lines, _, pending = (pending + block).rpartition(b'\n')
+        else:
+            lines, pending = pending, b''
+        lines = [line for line in lines.split(b'\n') if line.strip()]
+        try:
+            records = json.loads(b'[' + b','.join(lines) + b']')
+        except ValueError:
+            records = None
+        # A line holding several comma-separated objects still decodes inside the array.
+        if not isinstance(records, list) or len(records) != len(lines):
+            records = None
+        for offset, line in enumerate(lines):
+            record = records[offset] if records is not None else None
+            if isinstance(record, dict) and 'id' in record and isinstance(record.get('text'), (str, type(None))):
+                yield record['id'], record.get('text'), None
+            else:
+                yield _parse_stream_record(line, record_number + offset + 1)
+        record_number += len(lines)
+        if not block:
+            return
+
+
+_LABELS_JSON = {label: json.dumps(label) for label in (None, 'Positive', 'Negative', 'Neutral')}
+
+
+def _json_label(sentiment):
+    return _LABELS_JSON.get(sentiment) or json.dumps(sentiment)
+
+
+def _stream_results(records):
+    """Scores records STREAM_BATCH_SIZE at a time and yields one NDJSON result line per record."""
+    batch = []
+
+    def flush():
+        with metrics.timer('request_seconds', route='/sentiment/stream'):
+            sentiments = score_with_service_cache([text for _, text in batch])
+        metrics.inc('texts_scored', len(batch))
+        lines = ''.join('{"id": %s, "sentiment": %s}\n' % (json.dumps(record_id), _json_label(sentiment))
+                        for (record_id, _), sentiment in zip(batch, sentiments))
+        batch.clear()
+        return lines
+
+    for record_id, text, error in records:
+        if error is not None:
+            yield json.dumps({"id": record_id, "sentiment": None, "error": error}) + '\n'
+            continue
+        batch.append((record_id, text))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield flush()
+    if batch:
+        yield flush()
+
+
+@app.route('/sentiment/stream', methods=['POST'])
+def stream_sentiment():
+    """
+    Newline-delimited JSON in ({"id": ..., "text": ...} per line, usually sent with
+    chunked transfer encoding) and out ({"id": ..., "sentiment": ...} per line). Results
+    are written as each batch is scored, so neither side holds the whole request and
+    the client can read results while it is still sending texts.
+    """
+    return Response(stream_with_context(_stream_results(_read_stream_records(request.stream))),
+                    mimetype='application/x-ndjson')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "sentiment-api"}), 200
+    return jsonify({
+        "status": "healthy",
+        "service": "sentiment-api",
+        "scorer": SCORER_VERSION,
+        "cache": _sentiment_cache.stats() if _sentiment_cache is not None else None,
+    }), 200
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """503 until the scorer and the scoring processes are warm, so traffic only arrives afterwards."""
+    if _cold_start_seconds is None:
+        return jsonify({"status": "warming up", "scorer": SCORER_VERSION}), 503
+    return jsonify({
+        "status": "ready",
+        "scorer": SCORER_VERSION,
+        "scorer_backend": SCORER_BACKEND,
+        "cold_start_seconds": _cold_start_seconds,
+        "processes": process_memory_report(),
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape target. With several gunicorn workers each one reports its own series."""
+    if _sentiment_cache is not None:
+        cache_stats = _sentiment_cache.stats()
+        for key in ('entries', 'hits', 'disk_hits', 'misses', 'evictions'):
+            metrics.set_gauge(f'sentiment_cache_{key}', cache_stats[key])
+    for process in process_memory_report():
+        for key in ('rss_bytes', 'shared_bytes', 'pss_bytes'):
+            if key in process:
+                metrics.set_gauge(f'process_{key}', process[key], process=process['process'])
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    warm_up_service()
+    app.run(host='0.0.0.0', port=5001)
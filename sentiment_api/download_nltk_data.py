@@ -1,13 +0,0 @@
-import nltk
-import ssl
-
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
-
-nltk.download('punkt')
-nltk.download('wordnet')
-print("NLTK data downloaded successfully.")
\ No newline at end of file
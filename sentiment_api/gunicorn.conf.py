@@ -0,0 +1,19 @@
+import os
+
+bind = '0.0.0.0:5001'
+
+# One HTTP worker serving requests on threads; the CPU-bound scoring happens in the
+# pool of SENTIMENT_SCORING_PROCESSES processes (default: one per core) that each
+# HTTP worker forks in post_worker_init, after loading the scorer, so they share the
+# lexicon's pages copy-on-write. Raising SENTIMENT_HTTP_WORKERS multiplies the number
+# of scoring processes accordingly. /ready answers 503 until the worker is warm.
+workers = int(os.getenv('SENTIMENT_HTTP_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('SENTIMENT_HTTP_THREADS', '8'))
+timeout = int(os.getenv('SENTIMENT_WORKER_TIMEOUT', '120'))
+keepalive = 30
+
+
+def post_worker_init(worker):
+    from app import warm_up_service
+    warm_up_service()
@@ -0,0 +1,143 @@
+"""
+Keyword sentiment scorer, the service's fallback when TextBlob is not installed.
+The lexicon is prepared once, and a whole list of texts is scored by searching their
+concatenation once per keyword instead of every text once per keyword.
+
+Modes (SENTIMENT_KEYWORD_MODE):
+  count     a text is Positive/Negative when more distinct positive/negative keywords
+            occur in it than the other kind, the service's original keyword rule (default);
+            with negation, a keyword votes with the sign of its first occurrence
+  weighted  sums the weights of every keyword occurrence (SENTIMENT_KEYWORD_LEXICON,
+            a JSON object of keyword -> weight; default: the built-in keywords at +1/-1)
+SENTIMENT_KEYWORD_NEGATION=true flips the sign of an occurrence preceded, within
+SENTIMENT_KEYWORD_NEGATION_WINDOW words, by a negation such as "not" or "n't".
+Standard library only.
+"""
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+POSITIVE_KEYWORDS = ['great', 'excellent', 'amazing', 'love', 'good', 'happy', 'perfect', 'nice', 'best', 'awesome', 'recommend', '👍']
+NEGATIVE_KEYWORDS = ['bad', 'terrible', 'horrible', 'poor', 'disappointed', 'waste', 'broken', 'not good', 'awful', 'unhappy', '👎']
+NEGATIONS = ['not', 'no', 'never', 'hardly', 'without', "n't", 'nothing', 'neither', 'nor']
+
+MODE = os.getenv('SENTIMENT_KEYWORD_MODE', 'count').lower()
+LEXICON_PATH = os.getenv('SENTIMENT_KEYWORD_LEXICON')
+NEGATION = os.getenv('SENTIMENT_KEYWORD_NEGATION', 'false').lower() == 'true'
+NEGATION_WINDOW = int(os.getenv('SENTIMENT_KEYWORD_NEGATION_WINDOW', '3'))
+
+# Joins the texts of a batch; no keyword contains it, so no match spans two texts.
+SEPARATOR = '\x00'
+
+_WORD = re.compile(r"\w+(?:'\w+)?|n't")
+
+
+def default_lexicon():
+    lexicon = {keyword: 1.0 for keyword in POSITIVE_KEYWORDS}
+    lexicon.update({keyword: -1.0 for keyword in NEGATIVE_KEYWORDS})
+    return lexicon
+
+
+class KeywordScorer:
+    """
+    Scores texts against a keyword -> weight lexicon (weight > 0: positive, < 0: negative).
+    Keywords match as lowercase substrings, like `keyword in text.lower()`, overlapping
+    ones included ("not good" also contains "good").
+    """
+
+    def __init__(self, lexicon=None, mode='count', negation=False, negation_window=NEGATION_WINDOW):
+        if mode not in ('count', 'weighted'):
+            raise ValueError(f"Unknown keyword scoring mode: {mode!r}")
+        lexicon = default_lexicon() if lexicon is None else lexicon
+        self.weights = {keyword.lower(): float(weight) for keyword, weight in lexicon.items() if weight}
+        if not self.weights or any(not keyword or SEPARATOR in keyword for keyword in self.weights):
+            raise ValueError("Keywords must be non-empty and must not contain NUL characters")
+        self.mode = mode
+        self.negation = negation
+        self.negation_window = negation_window
+        self.negations = frozenset(NEGATIONS)
+        # (keyword, weight, vote) with vote the keyword's +1/-1 in count mode.
+        self.keywords = [(keyword, weight, 1 if weight > 0 else -1) for keyword, weight in self.weights.items()]
+
+    @classmethod
+    def from_env(cls):
+        lexicon = None
+        if LEXICON_PATH:
+            with open(LEXICON_PATH, encoding='utf-8') as f:
+                lexicon = json.load(f)
+        return cls(lexicon, mode=MODE, negation=NEGATION)
+
+    @property
+    def version(self):
+        """Scorer version for the sentiment cache; 'keyword-v1' is the original rule."""
+        if self.mode == 'count' and not self.negation and self.weights == default_lexicon():
+            return 'keyword-v1'
+        lexicon_hash = hashlib.sha1(json.dumps(self.weights, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+        return f"keyword-v1-{self.mode}{'-negation' if self.negation else ''}-{lexicon_hash}"
+
+    def _negated(self, text, start, text_start):
+        """Whether one of the negation_window words between text_start and start is a negation."""
+        window_start = max(text_start, start - 20 * self.negation_window)
+        words = _WORD.findall(text, window_start, start)[-self.negation_window:]
+        return any(word in self.negations or word.endswith("n't") for word in words)
+
+    @staticmethod
+    def _label(score):
+        if score > 0:
+            return 'Positive'
+        elif score < 0:
+            return 'Negative'
+        else:
+            return 'Neutral'
+
+    def _scores(self, text, starts):
+        """
+        Scores of the texts joined in text, beginning at the offsets in starts. Each
+        keyword is searched for across the whole batch with str.find, the same C
+        substring search as `keyword in text`; in count mode a hit skips straight to
+        the next text, since a keyword votes once per text.
+        """
+        scores = [0.0] * len(starts)
+        find = text.find
+        count_mode = self.mode == 'count'
+        negation = self.negation
+        last = len(starts) - 1
+        for keyword, weight, vote in self.keywords:
+            start = find(keyword)
+            while start != -1:
+                index = bisect_right(starts, start) - 1
+                sign = -1 if negation and self._negated(text, start, starts[index]) else 1
+                if count_mode:
+                    scores[index] += sign * vote
+                    start = find(keyword, starts[index + 1]) if index < last else -1
+                else:
+                    scores[index] += sign * weight
+                    start = find(keyword, start + len(keyword))
+        return scores
+
+    def score_batch(self, texts):
+        """Labels for a list of texts; None for empty or non-string texts."""
+        positions = [position for position, text in enumerate(texts)
+                     if text and isinstance(text, str) and text.strip() != '']
+        labels = [None] * len(texts)
+        if not positions:
+            return labels
+        lowered = [texts[position].lower() for position in positions]
+        starts = list(accumulate([0] + [len(text) + len(SEPARATOR) for text in lowered[:-1]]))
+        for position, score in zip(positions, self._scores(SEPARATOR.join(lowered), starts)):
+            labels[position] = self._label(score)
+        return labels
+
+    def score(self, text):
+        """Label for one text; None for an empty or non-string text."""
+        if not text or not isinstance(text, str) or text.strip() == '':
+            return None
+        if self.negation:
+            return self.score_batch([text])[0]
+        text = text.lower()
+        if self.mode == 'count':
+            return self._label(sum([vote for keyword, _, vote in self.keywords if keyword in text]))
+        return self._label(sum([weight * text.count(keyword) for keyword, weight, _ in self.keywords]))
@@ -0,0 +1,77 @@
+"""
+Local load test for the sentiment service. Posts /sentiment requests of a given
+batch size from concurrent clients and reports p50/p99 latency and texts/sec.
+
+Usage: python load_test.py [--url http://localhost:5001/sentiment] [--batch-sizes 500 5000]
+                           [--requests 20] [--concurrency 4]
+"""
+import argparse
+import json
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_SUMMARIES = [
+    "Great", "Love it", "Five Stars", "Not what I expected", "Terrible quality, fell apart",
+    "Perfect fit and very comfortable", "Runs small", "Disappointed with this item",
+    "Nice shoes for the price", "Awful. Broken on arrival", "Would recommend", "Okay",
+]
+
+
+def make_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [f"{rng.choice(SAMPLE_SUMMARIES)} {rng.randint(0, 10000)}" for _ in range(count)]
+
+
+def post_texts(url, texts):
+    body = json.dumps({'texts': texts}).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as response:
+        sentiments = json.loads(response.read())['sentiments']
+    elapsed = time.perf_counter() - start
+    if len(sentiments) != len(texts):
+        raise RuntimeError(f"Expected {len(texts)} sentiments, got {len(sentiments)}")
+    return elapsed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(url, batch_size, total_requests, concurrency):
+    payloads = [make_texts(batch_size, seed) for seed in range(total_requests)]
+    post_texts(url, payloads[0])  # warm-up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda texts: post_texts(url, texts), payloads))
+    wall = time.perf_counter() - start
+    return {
+        'batch_size': batch_size,
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'texts_per_sec': batch_size * total_requests / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001/sentiment')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[500, 5000])
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'batch':>7} {'reqs':>5} {'conc':>5} {'p50 ms':>10} {'p99 ms':>10} {'texts/sec':>12}")
+    for batch_size in args.batch_sizes:
+        result = run(args.url, batch_size, args.requests, args.concurrency)
+        print(f"{result['batch_size']:>7} {result['requests']:>5} {result['concurrency']:>5} "
+              f"{result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['texts_per_sec']:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Cold start and memory of the sentiment service per scorer. Starts the service under
+gunicorn once per scorer, waits for /ready, then reports the time to ready, the
+worker's own cold start, the first /sentiment request's latency and RSS/PSS of the
+HTTP worker and each scoring process. PSS splits pages shared copy-on-write between
+the processes sharing them, so its total is the service's real footprint.
+
+Usage: python measure_cold_start.py [--scorers lexicon textblob keyword] [--processes 4]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from load_test import make_texts, post_texts
+
+SENTIMENT_API_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARED_DIR = os.path.join(os.path.dirname(SENTIMENT_API_DIR), 'shared')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_service(command, base_url, env=None, timeout=120):
+    """Runs command and polls base_url/ready; returns (process, /ready body, seconds to ready)."""
+    env = dict(os.environ if env is None else env)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SHARED_DIR, env.get('PYTHONPATH')]))
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=SENTIMENT_API_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while time.perf_counter() - start < timeout and process.poll() is None:
+        try:
+            with urllib.request.urlopen(base_url + '/ready', timeout=1) as response:
+                return process, json.loads(response.read()), time.perf_counter() - start
+        except (OSError, urllib.error.HTTPError):
+            time.sleep(0.05)
+    process.terminate()
+    process.wait()
+    raise RuntimeError(f"The sentiment service at {base_url} did not become ready")
+
+
+def memory_summary(ready):
+    """Flattens a /ready body into MB figures for the HTTP worker and the scoring processes."""
+    processes = ready.get('processes', [])
+    scoring = [p for p in processes if p['process'] != 'http']
+    http = next((p for p in processes if p['process'] == 'http'), {})
+    summary = {
+        'cold_start_seconds': ready.get('cold_start_seconds'),
+        'scoring_processes': len(scoring),
+        'http_rss_mb': round(http.get('rss_bytes', 0) / 2 ** 20, 1),
+        'total_pss_mb': round(sum(p.get('pss_bytes', 0) for p in processes) / 2 ** 20, 1),
+    }
+    if scoring:
+        summary['scoring_rss_mb'] = round(max(p.get('rss_bytes', 0) for p in scoring) / 2 ** 20, 1)
+        summary['scoring_pss_mb'] = round(max(p.get('pss_bytes', 0) for p in scoring) / 2 ** 20, 1)
+    return summary
+
+
+def measure(scorer, processes, batch_size=500):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, SENTIMENT_SCORER=scorer, SENTIMENT_SCORING_PROCESSES=str(processes),
+               SENTIMENT_CACHE_ENABLED='false')
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'app:app']
+    process, ready, seconds = start_service(command, base_url, env)
+    try:
+        result = {'scorer': scorer, 'scorer_backend': ready.get('scorer_backend'),
+                  'time_to_ready_seconds': round(seconds, 3)}
+        result.update(memory_summary(ready))
+        result['first_request_ms'] = round(post_texts(base_url + '/sentiment', make_texts(batch_size)) * 1000, 1)
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scorers', nargs='+', default=['lexicon', 'textblob', 'keyword'])
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="Scoring processes.")
+    parser.add_argument('--json', action='store_true', help="Print one JSON line per scorer.")
+    args = parser.parse_args()
+
+    for scorer in args.scorers:
+        result = measure(scorer, args.processes)
+        if args.json:
+            print(json.dumps(result, sort_keys=True))
+            continue
+        print(f"{scorer:>9}: ready in {result['time_to_ready_seconds']:.2f}s "
+              f"(worker cold start {result['cold_start_seconds']}s), first request {result['first_request_ms']} ms, "
+              f"HTTP worker RSS {result['http_rss_mb']} MB, "
+              f"per scoring process RSS {result.get('scoring_rss_mb', '-')} MB / PSS {result.get('scoring_pss_mb', '-')} MB, "
+              f"total PSS {result['total_pss_mb']} MB")
+
+
+if __name__ == '__main__':
+    main()
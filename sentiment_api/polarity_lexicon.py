@@ -0,0 +1,255 @@
+"""
+Compact polarity scorer: TextBlob's PatternAnalyzer polarity computed from a
+precomputed lexicon file, without importing TextBlob or NLTK at runtime.
+
+The lexicon (polarity_lexicon.json) is extracted from TextBlob's pattern lexicon in
+the image's build stage, the only place TextBlob and NLTK are installed: per word
+only the polarity, intensity and whether it is an adverb (a modifier of the next
+word), plus the negations and emoticons. A copy is committed for local runs.
+The tokenizer and the scoring below follow textblob._text (find_tokens and
+Sentiment.assessments) for plain-string input, so labels match TextBlob's and
+the sentiment cache stays valid. Standard library only.
+
+Usage: python polarity_lexicon.py build [--output polarity_lexicon.json]   (needs textblob)
+       python polarity_lexicon.py check [--texts 20000]                    (compares with textblob)
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+LEXICON_PATH = os.getenv('SENTIMENT_LEXICON_PATH',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'polarity_lexicon.json'))
+
+# --- Tokenizer (textblob._text.find_tokens) ---
+
+PUNCTUATION = ".,;:!?()[]{}`''\"@#$^&*+-|=~_"
+ABBREVIATIONS = {
+    "a.", "adj.", "adv.", "al.", "a.m.", "c.", "cf.", "comp.", "conf.", "def.",
+    "ed.", "e.g.", "esp.", "etc.", "ex.", "f.", "fig.", "gen.", "id.", "i.e.",
+    "int.", "l.", "m.", "Med.", "Mil.", "Mr.", "n.", "n.q.", "orig.", "pl.",
+    "pred.", "pres.", "p.m.", "ref.", "v.", "vs.", "w/"
+}
+CONTRACTIONS = {"'d": " 'd", "'m": " 'm", "'s": " 's", "'ll": " 'll", "'re": " 're", "'ve": " 've", "n't": " n't"}
+EOS = "END-OF-SENTENCE"
+SENTENCE_END = ("...", ".", "!", "?", EOS)
+SENTENCE_TAIL = ("'", "\"", "”", "’", "...", ".", "!", "?", ")", EOS)
+
+_TOKEN = re.compile(r"(\S+)\s")
+_ABBR1 = re.compile(r"^[A-Za-z]\.$")
+_ABBR2 = re.compile(r"^([A-Za-z]\.)+$")
+_ABBR3 = re.compile("^[A-Z][" + "|".join("bcdfghjklmnpqrstvwxz") + "]+.$")
+_SARCASM = re.compile(r"\( ?\! ?\)")
+_CONTRACTIONS = [(re.compile(pattern), replacement) for pattern, replacement in CONTRACTIONS.items()]
+_LEADING = tuple(PUNCTUATION.replace(".", ""))
+_TRAILING = _LEADING + (".",)
+
+
+def _split_punctuation(token, tokens):
+    tail = []
+    while token.startswith(_LEADING) and token not in CONTRACTIONS:
+        tokens.append(token[0])
+        token = token[1:]
+    while token.endswith(_TRAILING) and token not in CONTRACTIONS:
+        if token.endswith(_LEADING):
+            tail.append(token[-1])
+            token = token[:-1]
+        if token.endswith("..."):
+            tail.append("...")
+            token = token[:-3].rstrip(".")
+        if token.endswith("."):
+            if (token in ABBREVIATIONS or _ABBR1.match(token) or _ABBR2.match(token)
+                    or _ABBR3.match(token)):
+                break
+            tail.append(token[-1])
+            token = token[:-1]
+    if token != "":
+        tokens.append(token)
+    tokens.extend(reversed(tail))
+
+
+def find_sentences(text, emoticons_pattern):
+    """Sentences of space-separated tokens, as textblob's parser.find_tokens returns them."""
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    text = (text.replace("“", " “ ").replace("”", " ” ").replace("‘", " ‘ ")
+            .replace("’", " ’ ").replace("'", " ' ").replace('"', ' " '))
+    text = re.sub("\r\n", "\n", text)
+    text = re.sub(r"\n{2,}", " %s " % EOS, text)
+    text = re.sub(r"\s+", " ", text)
+
+    tokens = []
+    for token in _TOKEN.findall(text + " "):
+        if token:
+            _split_punctuation(token, tokens)
+
+    sentences, i, j = [[]], 0, 0
+    while j < len(tokens):
+        if tokens[j] in SENTENCE_END:
+            while j < len(tokens) and tokens[j] in SENTENCE_TAIL:
+                if tokens[j] in ("'", "\"") and sentences[-1].count(tokens[j]) % 2 == 0:
+                    break
+                j += 1
+            sentences[-1].extend(t for t in tokens[i:j] if t != EOS)
+            sentences.append([])
+            i = j
+        j += 1
+    sentences[-1].extend(tokens[i:j])
+    sentences = (_SARCASM.sub("(!)", " ".join(s)) for s in sentences if s)
+    return [emoticons_pattern.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), s) for s in sentences]
+
+
+# --- Scorer (textblob._text.Sentiment.assessments, polarity only) ---
+
+class PolarityLexicon:
+    """
+    Read-only lexicon loaded once per process, before the scoring processes are
+    forked, so they share its pages copy-on-write. word -> (polarity, intensity, is_modifier).
+    """
+
+    def __init__(self, words, negations, emoticons, scorer_version):
+        self.words = words
+        self.negations = frozenset(negations)
+        self.scorer_version = scorer_version
+        # A token is an emoticon if it matches one case-insensitively; the first mood listed wins.
+        self.emoticons = {}
+        for emoticon, polarity in emoticons:
+            self.emoticons.setdefault(emoticon.lower(), polarity)
+        alternatives = sorted((emoticon for emoticon, _ in emoticons), key=len, reverse=True)
+        self.emoticons_pattern = re.compile(r"(%s)($|\s)" % "|".join(
+            r" ?".join(re.escape(char) for char in emoticon) for emoticon in alternatives))
+
+    @classmethod
+    def load(cls, path=LEXICON_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        words = {word: (float(polarity), float(intensity), bool(modifier))
+                 for word, (polarity, intensity, modifier) in data['words'].items()}
+        return cls(words, data['negations'], [tuple(pair) for pair in data['emoticons']], data['scorer_version'])
+
+    def tokens(self, text):
+        return [token.lower() for token in " ".join(find_sentences(text, self.emoticons_pattern)).split()]
+
+    def polarity(self, text):
+        """Average polarity of the known words, negations, boosts and emoticons in text."""
+        words, negations = self.words, self.negations
+        assessments = []  # [polarity, intensity, negated]
+        modifier = None
+        negation = None
+        for token in self.tokens(text):
+            entry = words.get(token)
+            if entry is not None:
+                polarity, intensity, is_modifier = entry
+                if modifier is None:
+                    assessments.append([polarity, intensity, False])
+                else:
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(polarity * last[1], 1.0))
+                    last[1] = intensity
+                if negation is not None:
+                    assessments[-1][1] = 1.0 / assessments[-1][1]
+                    assessments[-1][2] = True
+                modifier = token if is_modifier else None
+                negation = token if token in negations else None
+                continue
+
+            if token in negations:
+                negation = token
+            elif negation and len(token.strip("'")) > 1:
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                assessments[-1][2] = True
+                negation = None
+            elif modifier and len(token) > 2:
+                modifier = None
+            if token == "!" and assessments:
+                assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, 1.0))
+            if token == "(!)":
+                assessments.append([0.0, 1.0, False])
+            if not token.isalpha() and len(token) <= 5 and token not in PUNCTUATION:
+                polarity = self.emoticons.get(token)
+                if polarity is not None:
+                    assessments.append([polarity, 1.0, False])
+        if not assessments:
+            return 0.0
+        return sum(polarity * -0.5 if negated else polarity
+                   for polarity, _, negated in assessments) / float(len(assessments))
+
+
+def build_lexicon():
+    """Extracts the compact lexicon from TextBlob's pattern lexicon (textblob.en.sentiment)."""
+    import textblob
+    from textblob._text import EMOTICONS
+    from textblob.en import sentiment
+
+    if dict.__len__(sentiment) == 0:
+        sentiment.load()
+    words = {}
+    for word, by_pos in dict.items(sentiment):
+        polarity, _, intensity = by_pos[None]
+        words[word] = [polarity, intensity, int(any(pos in by_pos for pos in sentiment.modifiers))]
+    return {
+        'scorer_version': f"textblob-{textblob.__version__}",
+        'negations': list(sentiment.negations),
+        'emoticons': [[emoticon, polarity] for (_, polarity), emoticons in EMOTICONS.items()
+                      for emoticon in sorted(emoticons)],
+        'words': words,
+    }
+
+
+def sample_texts(count, seed=3):
+    """Review-like texts with negations, intensifiers, punctuation and emoticons."""
+    rng = random.Random(seed)
+    vocabulary = ['great', 'good', 'not', 'very', 'really', 'bad', 'never', 'fit', 'size', 'comfortable',
+                  'terribly', 'cheap', 'nice', 'love', "don't", "isn't", 'perfect', 'a', 'the', 'is', 'it',
+                  'extremely', 'small', 'disappointed', '!', '(!)', ':)', ':-(', ':D', '<3', 'xD', '...', '.',
+                  'Mr.', 'e.g.', '"quoted"', "it's", 'U.S.', '?', 'no', 'wonderful', 'awful', 'best']
+    texts = ['', '   ', 'Five Stars', 'not good', 'not bad', 'really not good', 'very very good!!',
+             'Great :)', 'Awful :( ( ! )', 'Love it\n\nNot what I expected', 'Good... not great.']
+    while len(texts) < count:
+        texts.append(' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 25))))
+    return texts
+
+
+def check_against_textblob(count):
+    from textblob.en.sentiments import PatternAnalyzer
+
+    analyzer = PatternAnalyzer()
+    lexicon = PolarityLexicon.load()
+    texts = sample_texts(count)
+    mismatches = 0
+    for text in texts:
+        expected, actual = analyzer.analyze(text)[0], lexicon.polarity(text)
+        if abs(expected - actual) > 1e-9:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"Mismatch for {text!r}: textblob={expected} lexicon={actual}")
+    for name, score in [('textblob', lambda t: analyzer.analyze(t)[0]), ('lexicon', lexicon.polarity)]:
+        start = time.perf_counter()
+        for text in texts:
+            score(text)
+        print(f"{name:>8}: {len(texts) / (time.perf_counter() - start):10,.0f} texts/sec")
+    print(f"{len(texts) - mismatches}/{len(texts)} polarities match TextBlob.")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'check'])
+    parser.add_argument('--output', default=LEXICON_PATH)
+    parser.add_argument('--texts', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        lexicon = build_lexicon()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(lexicon, f, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        print(f"Wrote {len(lexicon['words'])} words to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+    elif check_against_textblob(args.texts):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
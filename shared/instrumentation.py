@@ -0,0 +1,212 @@
+"""
+Process-wide metrics shared by the loaders in utils/ and the sentiment API, which both
+have shared/ on their PYTHONPATH: counters, gauges and timing histograms, rendered as
+Prometheus text (the API's /metrics) or as a JSON run summary (the loaders' last line
+of output, which Airflow's BashOperator pushes to XCom). Standard library only, like
+sentiment_cache.
+"""
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident set size (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory(pid='self'):
+    """
+    Current RSS, its file-backed shared part and PSS, in bytes, from /proc. PSS divides
+    each page among the processes sharing it, including pages inherited copy-on-write
+    from a parent, so summing it over processes gives their real footprint. Empty off Linux.
+    """
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            _, resident, shared = f.read().split()[:3]
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        memory['rss_bytes'] = int(resident) * page_size
+        memory['shared_bytes'] = int(shared) * page_size
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    memory['pss_bytes'] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+def process_age_seconds(pid='self'):
+    """Seconds since the process started (or was forked), from /proc; None off Linux."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+    return round(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 3)
+
+
+def _series_name(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and timings. Series are identified by a
+    name plus keyword labels, e.g. metrics.observe('stage_seconds', 0.2, stage='read').
+    """
+
+    def __init__(self, prefix, buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        # (name, labels) -> [count, sum, max, per-bucket counts]
+        self._timings = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = [0, 0.0, 0.0, [0] * len(self.buckets)]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timing[3][i] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed_iter(self, iterable, name, **labels):
+        """Yields from iterable, timing each step; for readers whose work happens in next()."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - start, **labels)
+            yield item
+
+    def snapshot(self):
+        """Picklable copy of the recorded series, e.g. to send from a worker process to its parent."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timings': {key: [count, total, longest, list(bucket_counts)]
+                            for key, (count, total, longest, bucket_counts) in self._timings.items()},
+            }
+
+    def merge(self, snapshot):
+        """Adds a snapshot's counters and timings to this registry; its gauges replace ours."""
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(snapshot['gauges'])
+            for key, (count, total, longest, bucket_counts) in snapshot['timings'].items():
+                timing = self._timings.get(key)
+                if timing is None:
+                    self._timings[key] = [count, total, longest, list(bucket_counts)]
+                    continue
+                timing[0] += count
+                timing[1] += total
+                timing[2] = max(timing[2], longest)
+                timing[3] = [ours + theirs for ours, theirs in zip(timing[3], bucket_counts)]
+
+    def reset(self):
+        """Forgets everything recorded, e.g. in a forked worker that inherited its parent's series."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+        self.started = time.time()
+
+    def summary(self, job, **extra):
+        """JSON-serializable summary of everything recorded so far."""
+        with self._lock:
+            counters = {_series_name(name, labels): value for (name, labels), value in self._counters.items()}
+            gauges = {_series_name(name, labels): value for (name, labels), value in self._gauges.items()}
+            timings = {
+                _series_name(name, labels): {
+                    'count': count, 'total_seconds': round(total, 4), 'max_seconds': round(longest, 4)
+                }
+                for (name, labels), (count, total, longest, _) in self._timings.items()
+            }
+        summary = {
+            'job': job,
+            'elapsed_seconds': round(time.time() - self.started, 3),
+            'peak_rss_mb': round(peak_rss_bytes() / 2 ** 20, 1),
+            'counters': counters,
+            'gauges': gauges,
+            'timings': timings,
+        }
+        summary.update(extra)
+        return summary
+
+    def print_summary(self, job, **extra):
+        """Prints the run summary as one JSON line; keep it the last line a task prints."""
+        print(json.dumps(self.summary(job, **extra), default=str, sort_keys=True))
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+
+        def declare(full_name, metric_type):
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f"# TYPE {full_name} {metric_type}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                declare(f'{self.prefix}_{name}_total', 'counter')
+                lines.append(f"{_series_name(f'{self.prefix}_{name}_total', labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                declare(f'{self.prefix}_{name}', 'gauge')
+                lines.append(f"{_series_name(f'{self.prefix}_{name}', labels)} {value}")
+            for (name, labels), (count, total, _, bucket_counts) in sorted(self._timings.items()):
+                full_name = f'{self.prefix}_{name}'
+                declare(full_name, 'histogram')
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{_series_name(full_name + '_bucket', labels + (('le', bound),))} {bucket_count}")
+                lines.append(f"{_series_name(full_name + '_bucket', labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{_series_name(full_name + '_sum', labels)} {total}")
+                lines.append(f"{_series_name(full_name + '_count', labels)} {count}")
+        declare(f'{self.prefix}_process_peak_rss_bytes', 'gauge')
+        lines.append(f"{self.prefix}_process_peak_rss_bytes {peak_rss_bytes()}")
+        return '\n'.join(lines) + '\n'
+
+
+# Default registry for the current process.
+metrics = Metrics('ardwh')
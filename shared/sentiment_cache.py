@@ -0,0 +1,156 @@
+"""
+Content-addressed cache of sentiment labels, shared by the sentiment API and the
+reviews loader. Standard library only, so the loader can import it without the
+service's dependencies.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = int(os.getenv('SENTIMENT_CACHE_MAX_ENTRIES', '200000'))
+# Optional persistent tier; unset keeps the cache in memory only.
+CACHE_DB_PATH = os.getenv('SENTIMENT_CACHE_DB') or None
+
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text):
+    """Normalizes text for cache lookups without changing what either scorer sees."""
+    return text.strip()
+
+
+def cache_key(text, scorer_version):
+    """Hash of the normalized text and the scorer that produced the label."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(scorer_version.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SentimentCache:
+    """
+    In-process LRU of cache_key -> label with an optional SQLite tier behind it.
+    Thread-safe; None labels (scoring errors, empty texts) are never cached.
+    """
+
+    def __init__(self, scorer_version, max_entries=CACHE_MAX_ENTRIES, db_path=CACHE_DB_PATH):
+        self.scorer_version = scorer_version
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS sentiment_cache (key TEXT PRIMARY KEY, sentiment TEXT NOT NULL)")
+
+    def _remember(self, key, sentiment):
+        self._entries[key] = sentiment
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, keys):
+        found = {}
+        for i in range(0, len(keys), _SQLITE_BATCH):
+            batch = keys[i:i + _SQLITE_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            found.update(self._db.execute(
+                f"SELECT key, sentiment FROM sentiment_cache WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def get_many(self, keys):
+        """Returns {key: label} for the keys that are cached; counts hits and misses per key."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            missing = [key for key in keys if key not in found]
+            if self._db is not None and missing:
+                on_disk = self._read_disk(list(dict.fromkeys(missing)))
+                for key, sentiment in on_disk.items():
+                    self._remember(key, sentiment)
+                found.update(on_disk)
+                self.disk_hits += sum(1 for key in missing if key in on_disk)
+            self.hits += len(keys) - len(missing)
+            self.misses += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, labels):
+        """Stores {key: label}, skipping None labels."""
+        labels = {key: sentiment for key, sentiment in labels.items() if sentiment is not None}
+        if not labels:
+            return
+        with self._lock:
+            for key, sentiment in labels.items():
+                self._remember(key, sentiment)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sentiment_cache (key, sentiment) VALUES (?, ?)", labels.items()
+                )
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scorer_version': self.scorer_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'persistent': self._db is not None,
+            }
+
+
+def split_cached(texts, cache):
+    """
+    Looks texts up in the cache. Returns (sentiments, misses) where sentiments has the
+    cached label (or None) per text and misses maps each uncached text to the key and
+    the positions it fills. Empty texts are left as None and never counted.
+    """
+    sentiments = [None] * len(texts)
+    keyed = [(i, cache_key(text, cache.scorer_version)) for i, text in enumerate(texts)
+             if text and isinstance(text, str) and text.strip()]
+    cached = cache.get_many([key for _, key in keyed])
+
+    misses = OrderedDict()
+    for i, key in keyed:
+        if key in cached:
+            sentiments[i] = cached[key]
+        else:
+            misses.setdefault(texts[i], (key, []))[1].append(i)
+    return sentiments, misses
+
+
+def merge_scored(sentiments, misses, scored, cache):
+    """Fills the positions of each missed text with its score and stores the new labels."""
+    new_labels = {}
+    for (key, positions), sentiment in zip(misses.values(), scored):
+        for i in positions:
+            sentiments[i] = sentiment
+        new_labels[key] = sentiment
+    cache.put_many(new_labels)
+    return sentiments
+
+
+def score_with_cache(texts, cache, score_fn):
+    """Scores texts through the cache; score_fn is only called for distinct uncached texts."""
+    sentiments, misses = split_cached(texts, cache)
+    if misses:
+        merge_scored(sentiments, misses, score_fn(list(misses)), cache)
+    return sentiments
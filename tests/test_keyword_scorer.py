@@ -0,0 +1,108 @@
+import os
+import random
+import re
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'sentiment_api'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from keyword_scorer import NEGATIONS, SEPARATOR, KeywordScorer, default_lexicon  # noqa: E402
+from synthetic_data import NEGATIVE_WORDS, NEUTRAL_WORDS, POSITIVE_WORDS, SUMMARIES  # noqa: E402
+
+EDGE_CASES = ['', '   ', None, 'NOT GOOD', 'not good at all', 'good, not good', 'unhappy but happy', '👍👍', '👎 meh',
+              'goodgood', 'the best!', 'Nothing bad', "isn't great", 'broken\nbut recommend', 'a\x00good',
+              'not\x00good', 'good\x00\x00bad', '\x00', "don't\x00love\x00it", 'bad\x00' * 3 + 'great']
+
+
+def legacy_keyword_sentiment(text):
+    """The original _keyword_sentiment, verbatim."""
+    if not text or not isinstance(text, str) or text.strip() == '':
+        return None
+    text_lower = text.lower()
+    positive_keywords = ['great', 'excellent', 'amazing', 'love', 'good', 'happy', 'perfect', 'nice', 'best', 'awesome', 'recommend', '👍']
+    negative_keywords = ['bad', 'terrible', 'horrible', 'poor', 'disappointed', 'waste', 'broken', 'not good', 'awful', 'unhappy', '👎']
+
+    positive_score = sum(1 for keyword in positive_keywords if keyword in text_lower)
+    negative_score = sum(1 for keyword in negative_keywords if keyword in text_lower)
+
+    if positive_score > negative_score:
+        return 'Positive'
+    elif negative_score > positive_score:
+        return 'Negative'
+    else:
+        return 'Neutral'
+
+
+def make_summaries(count, seed=5):
+    rng = random.Random(seed)
+    words = POSITIVE_WORDS + NEGATIVE_WORDS + NEUTRAL_WORDS * 3 + ['not', 'good', "don't", 'never', 'unhappy']
+    texts = []
+    for _ in range(count):
+        summary = rng.choice(SUMMARIES)
+        if rng.random() < 0.5:
+            summary += ' ' + ' '.join(rng.choice(words) for _ in range(rng.randint(1, 8)))
+        texts.append(summary)
+    return texts
+
+
+NUL_TEXTS = ['not\x00good', 'good\x00\x00bad', '\x00', "don't\x00love\x00it", 'never' + SEPARATOR, SEPARATOR + 'good']
+WEIGHTED_LEXICON = {'good': 1.0, 'not good': -2.5, 'love': 2.0, 'cheap': -0.5, 'Runs Small': -1.0, 'ok': 0}
+WORD = re.compile(r"\w+(?:'\w+)?|n't")
+
+
+def reference_label(text, lexicon=None, mode='count', negation=False, window=3):
+    """One text at a time, straight from the rules in the keyword_scorer docstring."""
+    if not text or not isinstance(text, str) or text.strip() == '':
+        return None
+    text = text.lower()
+    score = 0.0
+    for keyword, weight in (default_lexicon() if lexicon is None else lexicon).items():
+        if not weight:
+            continue
+        keyword = keyword.lower()
+        signs = []
+        start = text.find(keyword)
+        while start != -1:
+            words = WORD.findall(text[:start])[-window:]
+            negated = negation and any(word in NEGATIONS or word.endswith("n't") for word in words)
+            signs.append(-1 if negated else 1)
+            start = text.find(keyword, start + len(keyword))
+        if signs:
+            score += signs[0] * (1 if weight > 0 else -1) if mode == 'count' else weight * sum(signs)
+    return 'Positive' if score > 0 else 'Negative' if score < 0 else 'Neutral'
+
+
+TEXTS = make_summaries(3000) + EDGE_CASES + NUL_TEXTS
+
+
+def test_count_mode_matches_original_labels():
+    scorer = KeywordScorer()
+    expected = [legacy_keyword_sentiment(text) for text in TEXTS]
+    assert scorer.score_batch(TEXTS) == expected
+    assert [scorer.score(text) for text in TEXTS] == expected
+
+
+@pytest.mark.parametrize('lexicon', [None, WEIGHTED_LEXICON])
+@pytest.mark.parametrize('mode', ['count', 'weighted'])
+@pytest.mark.parametrize('negation', [False, True])
+def test_modes_match_per_text_reference(lexicon, mode, negation):
+    scorer = KeywordScorer(lexicon, mode=mode, negation=negation)
+    expected = [reference_label(text, lexicon, mode, negation) for text in TEXTS]
+    assert scorer.score_batch(TEXTS) == expected
+    assert [scorer.score(text) for text in TEXTS] == expected
+
+
+@pytest.mark.parametrize('negation', [False, True])
+def test_nul_inside_a_text_does_not_split_it(negation):
+    scorer = KeywordScorer(negation=negation)
+    for text in NUL_TEXTS:
+        assert scorer.score_batch(['good', text, 'bad']) == ['Positive', scorer.score(text), 'Negative']
+    assert scorer.score('not' + SEPARATOR + 'good') == ('Negative' if negation else 'Positive')
+
+
+def test_keywords_with_nul_are_rejected():
+    with pytest.raises(ValueError):
+        KeywordScorer({'go' + SEPARATOR + 'od': 1.0})
@@ -0,0 +1,164 @@
+import ast
+import io
+import math
+import os
+import random
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+
+from metadata_transform import (  # noqa: E402
+    transform_metadata_chunk, dataframe_to_records, METADATA_TARGET_COLS, METADATA_COLUMN_RENAMES, RAW_TEXT_COLUMNS
+)
+
+INGESTION_TIMESTAMP = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def legacy_transform_chunk(chunk_df, ingestion_timestamp):
+    """The original per-row transform, kept as the reference output (non-finite prices now map to None)."""
+    chunk_df = chunk_df.copy()
+    for col in RAW_TEXT_COLUMNS:
+        if col in chunk_df.columns:
+            chunk_df[col] = chunk_df[col].astype(str).replace({'nan': None})
+
+    chunk_df.dropna(subset=['asin'], inplace=True)
+
+    if 'sales_category' not in chunk_df.columns:
+        chunk_df['sales_category'] = None
+    if 'sales_rank' not in chunk_df.columns:
+        chunk_df['sales_rank'] = None
+
+    for index, row in chunk_df.iterrows():
+        salesrank_str = row['salesrank']
+        if pd.notna(salesrank_str) and salesrank_str.strip() != '{}':
+            try:
+                salesrank_dict = ast.literal_eval(salesrank_str)
+                if isinstance(salesrank_dict, dict) and salesrank_dict:
+                    key, value = next(iter(salesrank_dict.items()))
+                    chunk_df.at[index, 'sales_category'] = key
+                    try:
+                        chunk_df.at[index, 'sales_rank'] = int(value)
+                    except (ValueError, TypeError):
+                        chunk_df.at[index, 'sales_rank'] = None
+            except (ValueError, SyntaxError):
+                pass
+        elif salesrank_str == '{}':
+            chunk_df.at[index, 'sales_category'] = None
+            chunk_df.at[index, 'sales_rank'] = None
+
+    if 'first_category' not in chunk_df.columns:
+        chunk_df['first_category'] = None
+    for index, row in chunk_df.iterrows():
+        categories_str = row['categories']
+        if pd.notna(categories_str):
+            try:
+                categories_list = ast.literal_eval(categories_str)
+                if isinstance(categories_list, list) and categories_list:
+                    if categories_list[0] and isinstance(categories_list[0], list):
+                        chunk_df.at[index, 'first_category'] = categories_list[0][0]
+                    elif categories_list[0] and isinstance(categories_list[0], str):
+                        chunk_df.at[index, 'first_category'] = categories_list[0]
+            except (ValueError, SyntaxError):
+                pass
+
+    chunk_df['ingestion_timestamp'] = ingestion_timestamp
+
+    processed_chunk_df = chunk_df[list(METADATA_COLUMN_RENAMES) + [
+        'sales_category', 'sales_rank', 'first_category', 'ingestion_timestamp'
+    ]].copy()
+    processed_chunk_df.rename(columns=METADATA_COLUMN_RENAMES, inplace=True)
+
+    data_to_insert = []
+    for index, row in processed_chunk_df.iterrows():
+        row_values = [row[col] for col in METADATA_TARGET_COLS]
+        price_index = METADATA_TARGET_COLS.index('product_price')
+        original_price = row_values[price_index]
+        if pd.isna(original_price) or original_price is None:
+            row_values[price_index] = None
+        else:
+            try:
+                price_str = str(original_price).strip().replace('$', '').replace(',', '')
+                row_values[price_index] = float(price_str)
+            except (ValueError, TypeError):
+                row_values[price_index] = None
+            # Non-finite prices are stored as NULL so every load mode accepts the row.
+            if row_values[price_index] is not None and not math.isfinite(row_values[price_index]):
+                row_values[price_index] = None
+        cleaned_row = [None if pd.isna(x) or pd.isnull(x) else x for x in row_values]
+        data_to_insert.append(tuple(cleaned_row))
+    return data_to_insert
+
+
+def synthetic_metadata_frame(rows, seed=42):
+    """Builds a metadata chunk covering the fast-path shapes and the fallback edge cases."""
+    rng = random.Random(seed)
+    categories = ['Clothing', 'Shoes', 'Jewelry', 'Watches', "Men's Fashion", 'Luggage']
+    salesranks = [
+        lambda: f"{{'{rng.choice(categories[:4])}': {rng.randint(1, 5000000)}}}",
+        lambda: f"{{\"{categories[4]}\": {rng.randint(1, 500)}}}",
+        lambda: f"{{'Clothing': {rng.randint(1, 99)}, 'Shoes': 3}}",
+        lambda: '{}',
+        lambda: "{'Clothing': 'n/a'}",
+        lambda: '{broken',
+        lambda: None,
+    ]
+    category_lists = [
+        lambda: str([rng.sample(categories[:4], 2), [rng.choice(categories[:4])]]),
+        lambda: str([[categories[4], 'Shirts']]),
+        lambda: str([[]]),
+        lambda: str(['Clothing']),
+        lambda: '[[unterminated',
+        lambda: None,
+    ]
+    prices = [
+        lambda: f"{rng.uniform(1, 500):.2f}",
+        lambda: f"${rng.randint(1000, 9999):,}.00",
+        lambda: ' 12.5 ',
+        lambda: 'inf',
+        lambda: 'free',
+        lambda: None,
+    ]
+    weights_fast = [20] + [1] * 10
+
+    def pick(options):
+        return rng.choices(options, weights=weights_fast[:len(options)])[0]()
+
+    frame = pd.DataFrame({
+        'metadataid': range(rows),
+        'asin': [None if rng.random() < 0.01 else f"B{rng.randint(0, 999999999):09d}" for _ in range(rows)],
+        'imurl': [f"http://ecx.images-amazon.com/images/I/{i}.jpg" for i in range(rows)],
+        'salesrank': [pick(salesranks) for _ in range(rows)],
+        'categories': [pick(category_lists) for _ in range(rows)],
+        'title': [f"Product {i}" for i in range(rows)],
+        'description': [None if i % 3 else f"Description {i}" for i in range(rows)],
+        'price': [pick(prices) for _ in range(rows)],
+        'related': ["{'also_bought': ['B000000001']}"] * rows,
+        'brand': [rng.choice(['Levi', 'Nike', None]) for _ in range(rows)],
+    })
+    # Round-trip through CSV so dtypes and missing values look like pd.read_csv output.
+    return pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+
+
+def test_vectorized_transform_matches_legacy_rows():
+    chunk_df = synthetic_metadata_frame(2000)
+    expected = legacy_transform_chunk(chunk_df, INGESTION_TIMESTAMP)
+    actual = dataframe_to_records(transform_metadata_chunk(chunk_df, INGESTION_TIMESTAMP))
+    assert len(actual) == len(expected)
+    for row_number, (legacy_row, vectorized_row) in enumerate(zip(expected, actual)):
+        assert vectorized_row == legacy_row, f"row {row_number} differs"
+
+
+def test_later_chunk_matches_legacy_rows():
+    chunk_df = synthetic_metadata_frame(2000, seed=7).iloc[1000:1500]
+    assert (dataframe_to_records(transform_metadata_chunk(chunk_df, INGESTION_TIMESTAMP))
+            == legacy_transform_chunk(chunk_df, INGESTION_TIMESTAMP))
+
+
+def test_non_finite_prices_are_stored_as_none():
+    chunk_df = pd.DataFrame({'asin': ['B1', 'B2', 'B3', 'B4'], 'price': ['inf', '-Infinity', 'nan', '$1,234.50']})
+    prices = transform_metadata_chunk(chunk_df, INGESTION_TIMESTAMP)['product_price'].tolist()
+    assert prices == [None, None, None, 1234.5]
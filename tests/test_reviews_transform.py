@@ -0,0 +1,125 @@
+import io
+import os
+import random
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'shared'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+
+from reviews_transform import REVIEWS_TARGET_COLS, transform_reviews_chunk  # noqa: E402
+
+INGESTION_TIMESTAMP = datetime(2024, 1, 1, 12, 0, 0)
+SENTIMENTS = ['Positive', 'Negative', 'Neutral', None, 'None', float('nan')]
+
+
+def legacy_prepare_reviews_chunk(chunk_df, ingestion_timestamp):
+    """The original prepare_reviews_chunk, verbatim apart from the passed-in timestamp."""
+    chunk_df['overall'] = pd.to_numeric(chunk_df['overall'], errors='coerce').fillna(0).round(1)
+    chunk_df['unixreviewtime'] = pd.to_numeric(chunk_df['unixreviewtime'], errors='coerce').fillna(0).astype(int)
+
+    chunk_df.dropna(subset=['reviewerid', 'asin', 'unixreviewtime'], inplace=True)
+
+    for col in ['reviewername', 'helpful', 'reviewtext', 'summary', 'reviewtime']:
+        if col in chunk_df.columns:
+            chunk_df[col] = chunk_df[col].astype(str).replace({'nan': None})
+
+    try:
+        chunk_df['unix_review_timestamp'] = pd.to_datetime(chunk_df['unixreviewtime'], unit='s', errors='coerce')
+    except Exception as e:
+        print(f"Warning: Could not convert 'unixreviewtime' in chunk. Error: {e}")
+        chunk_df['unix_review_timestamp'] = pd.NaT
+
+    try:
+        chunk_df['review_timestamp'] = pd.to_datetime(chunk_df['reviewtime'], format='%m %d, %Y', errors='coerce').dt.date
+    except Exception as e:
+        print(f"Warning: Could not convert 'reviewtime' in chunk. Error: {e}")
+        chunk_df['review_timestamp'] = None
+
+    chunk_df['rating'] = pd.to_numeric(chunk_df['overall'], errors='coerce').round(1)
+
+    chunk_df['ingestion_timestamp'] = ingestion_timestamp
+
+    if 'summary' not in chunk_df.columns:
+        chunk_df['summary'] = chunk_df['reviewtext']
+    chunk_df['summary'] = chunk_df['summary'].astype(str).replace({'nan': None})
+    return chunk_df
+
+
+def legacy_build_review_records(chunk_df, sentiments):
+    """The original build_review_records, verbatim."""
+    chunk_df['sentiment'] = sentiments
+    chunk_df['sentiment'] = chunk_df['sentiment'].apply(lambda x: None if (pd.isna(x) or pd.isnull(x) or str(x).lower() == 'none') else x)
+
+    processed_chunk_df = chunk_df[[
+        'reviewerid', 'asin', 'reviewername', 'overall',
+        'summary', 'sentiment', 'unix_review_timestamp',
+        'review_timestamp', 'ingestion_timestamp'
+    ]].copy()
+
+    processed_chunk_df.rename(columns={
+        'reviewerid': 'reviewer_id',
+        'asin': 'product_id',
+        'reviewername': 'reviewer_name',
+        'overall': 'rating',
+        'summary': 'review_summary'
+    }, inplace=True)
+
+    data_to_insert = []
+    for index, row in processed_chunk_df.iterrows():
+        row_values = [row[col] for col in REVIEWS_TARGET_COLS]
+        cleaned_row = [None if pd.isna(x) or pd.isnull(x) else x for x in row_values]
+        data_to_insert.append(tuple(cleaned_row))
+    return data_to_insert
+
+
+def legacy_transform(chunk_df, ingestion_timestamp):
+    chunk_df = legacy_prepare_reviews_chunk(chunk_df.copy(), ingestion_timestamp)
+    return legacy_build_review_records(chunk_df, [SENTIMENTS[i % len(SENTIMENTS)] for i in range(len(chunk_df))])
+
+
+def streaming_transform(chunk_df, ingestion_timestamp):
+    batch = transform_reviews_chunk(chunk_df, ingestion_timestamp)
+    return batch.to_records([SENTIMENTS[i % len(SENTIMENTS)] for i in range(len(batch))])
+
+
+def synthetic_reviews_frame(rows, seed=11):
+    """Builds a reviews chunk covering the normal shapes and the missing/unparseable edge cases."""
+    rng = random.Random(seed)
+    summaries = ['Great', 'Love it', 'Five Stars', 'Runs small', 'nan', None, 42]
+    frame = pd.DataFrame({
+        'reviewerid': [None if rng.random() < 0.01 else f"A{rng.randrange(10 ** 8):013d}" for _ in range(rows)],
+        'asin': [None if rng.random() < 0.01 else f"B{rng.randrange(10 ** 6):09d}" for _ in range(rows)],
+        'reviewername': [rng.choice(['Ann', 'Bob', None, 'nan', 'J. "Jo" Smith']) for _ in range(rows)],
+        'helpful': ['[0, 0]'] * rows,
+        'reviewtext': [f"Review text {i}, with a comma." for i in range(rows)],
+        'overall': [rng.choice(['5.0', '4.0', '3.0', '1.0', 'bad', None]) for _ in range(rows)],
+        'summary': [rng.choice(summaries) for _ in range(rows)],
+        'unixreviewtime': [rng.choice([rng.randrange(1041379200, 1404172800), None, 'x']) for _ in range(rows)],
+        'reviewtime': [rng.choice(['06 1, 2013', '12 31, 2009', 'not a date', None]) for _ in range(rows)],
+    })
+    # Round-trip through CSV so dtypes and missing values look like pd.read_csv output.
+    return pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+
+
+def assert_same_rows(chunk_df):
+    expected = legacy_transform(chunk_df, INGESTION_TIMESTAMP)
+    actual = streaming_transform(chunk_df, INGESTION_TIMESTAMP)
+    assert len(actual) == len(expected)
+    for row_number, (legacy_row, streaming_row) in enumerate(zip(expected, actual)):
+        assert streaming_row == legacy_row, f"row {row_number} differs"
+
+
+def test_streaming_transform_matches_legacy_rows():
+    assert_same_rows(synthetic_reviews_frame(2000))
+
+
+def test_later_chunk_matches_legacy_rows():
+    assert_same_rows(synthetic_reviews_frame(2000, seed=3).iloc[1000:1500].copy())
+
+
+def test_missing_summary_column_falls_back_to_review_text():
+    assert_same_rows(synthetic_reviews_frame(200).drop(columns=['summary']))
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'shared'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'utils'))
+
+import sentiment_client  # noqa: E402
+from sentiment_client import SentimentClient, stream_with_retry  # noqa: E402
+
+
+def test_https_url_falls_back_to_batch_mode(monkeypatch):
+    posted = []
+    monkeypatch.setattr(sentiment_client, 'post_batch_with_retry',
+                        lambda session, texts, url: posted.append((texts, url)) or [0.5] * len(texts))
+    with SentimentClient(url='https://sentiment.example/sentiment', batch_size=2,
+                         use_cache=False, mode='stream') as client:
+        assert client.mode == 'batch'
+        assert client.submit(['a', 'b', None]).result() == [0.5, 0.5, 0.5]
+    assert posted == [(['a', 'b'], 'https://sentiment.example/sentiment'),
+                      ([''], 'https://sentiment.example/sentiment')]
+
+
+def test_stream_rejects_https_url_without_connecting():
+    with pytest.raises(ValueError, match='http://'):
+        stream_with_retry(['a'], 'https://sentiment.example/sentiment/stream')
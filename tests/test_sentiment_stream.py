@@ -0,0 +1,30 @@
+import io
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'shared'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'sentiment_api'))
+
+from app import _read_stream_records  # noqa: E402
+
+
+def read_records(body, read_size=1 << 18):
+    return list(_read_stream_records(io.BytesIO(body), read_size=read_size))
+
+
+def test_valid_lines_are_decoded_in_bulk():
+    body = b'{"id": 1, "text": "a"}\n\n{"id": 2, "text": null}\n{"id": 3, "text": "c"}'
+    assert read_records(body) == [(1, 'a', None), (2, None, None), (3, 'c', None)]
+    assert read_records(body, read_size=7) == [(1, 'a', None), (2, None, None), (3, 'c', None)]
+
+
+def test_line_with_several_objects_does_not_shift_later_records():
+    body = b'{"id":1,"text":"a"},{"id":2,"text":"b"}\n{"id":3,"text":"c"}\n'
+    assert read_records(body) == [(None, None, 'invalid JSON in record 1'), (3, 'c', None)]
+
+
+def test_invalid_records_are_reported_per_line():
+    body = b'{"id": 1, "text": "a"}\nnot json\n{"text": "b"}\n{"id": 4, "text": 5}\n'
+    assert read_records(body) == [(1, 'a', None), (None, None, 'invalid JSON in record 2'),
+                                  (None, None, "record 3 has no 'id'"), (4, None, "'text' must be a string")]
@@ -0,0 +1,221 @@
+import io
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+
+from psycopg2 import sql, extras
+
+from db_conn import LOAD_MODE, COPY_FORMAT
+
+PG_EPOCH_DATETIME = datetime(2000, 1, 1)
+PG_EPOCH_DATE = date(2000, 1, 1)
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('>h', -1)
+
+# Postgres type OIDs of the columns used by the processed_* tables.
+INT8_OID, INT4_OID, TEXT_OID, FLOAT8_OID = 20, 23, 25, 701
+VARCHAR_OID, DATE_OID, TIMESTAMP_OID, NUMERIC_OID = 1043, 1082, 1114, 1700
+
+_stage_column_types = {}
+
+
+def _encode_numeric(value):
+    """Encodes a number in the Postgres binary NUMERIC format (base-10000 digits)."""
+    value = Decimal(str(value))
+    if value.is_nan():
+        return struct.pack('>hhHh', 0, 0, 0xC000, 0)
+    if not value.is_finite():
+        raise ValueError(f"Cannot store {value} in a NUMERIC column")
+
+    sign, digits, exponent = value.as_tuple()
+    digits = list(digits)
+    if exponent > 0:
+        digits += [0] * exponent
+        exponent = 0
+    dscale = -exponent
+    frac_len = dscale
+    int_len = len(digits) - frac_len
+
+    digits += [0] * ((-frac_len) % 4)
+    if int_len < 0:
+        digits = [0] * (-int_len) + digits
+        int_len = 0
+    pad_left = (-int_len) % 4
+    digits = [0] * pad_left + digits
+    int_len += pad_left
+
+    groups = [
+        digits[i] * 1000 + digits[i + 1] * 100 + digits[i + 2] * 10 + digits[i + 3]
+        for i in range(0, len(digits), 4)
+    ]
+    weight = int_len // 4 - 1
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    header = struct.pack('>hhHh', len(groups), weight, 0x4000 if sign else 0, dscale)
+    return header + struct.pack(f'>{len(groups)}h', *groups)
+
+
+def _encode_timestamp(value):
+    return struct.pack('>q', (value - PG_EPOCH_DATETIME) // (datetime.resolution))
+
+
+def _encode_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return struct.pack('>i', (value - PG_EPOCH_DATE).days)
+
+
+BINARY_ENCODERS = {
+    TEXT_OID: lambda value: str(value).encode('utf-8'),
+    VARCHAR_OID: lambda value: str(value).encode('utf-8'),
+    INT4_OID: lambda value: struct.pack('>i', int(value)),
+    INT8_OID: lambda value: struct.pack('>q', int(value)),
+    FLOAT8_OID: lambda value: struct.pack('>d', float(value)),
+    NUMERIC_OID: _encode_numeric,
+    TIMESTAMP_OID: _encode_timestamp,
+    DATE_OID: _encode_date,
+}
+
+
+def _text_copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def records_to_text_copy(records):
+    """Serializes records in the COPY text format (tab separated, \\N for NULL)."""
+    buffer = io.StringIO()
+    for record in records:
+        buffer.write('\t'.join(_text_copy_value(value) for value in record))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def records_to_binary_copy(records, column_type_oids):
+    """Serializes records in the COPY binary format for the given column type OIDs."""
+    encoders = [BINARY_ENCODERS[oid] for oid in column_type_oids]
+    field_count = struct.pack('>h', len(encoders))
+    null_field = struct.pack('>i', -1)
+
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    for record in records:
+        buffer.write(field_count)
+        for encode, value in zip(encoders, record):
+            if value is None:
+                buffer.write(null_field)
+            else:
+                encoded = encode(value)
+                buffer.write(struct.pack('>i', len(encoded)))
+                buffer.write(encoded)
+    buffer.write(PGCOPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def create_staging_table(cur, table_name, target_cols, stage_table_name=None):
+    """
+    Creates a temporary staging table with the target's column types (no constraints
+    or indexes), dropped when the transaction commits, and returns its name together
+    with the column type OIDs.
+    """
+    stage_table_name = stage_table_name or f"{table_name}_stage"
+    cur.execute(sql.SQL("""
+        CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DROP AS
+        SELECT {} FROM public.{} WITH NO DATA;
+    """).format(
+        sql.Identifier(stage_table_name),
+        sql.SQL(', ').join(map(sql.Identifier, target_cols)),
+        sql.Identifier(table_name)
+    ))
+
+    cache_key = (stage_table_name, tuple(target_cols))
+    if cache_key not in _stage_column_types:
+        cur.execute(sql.SQL("SELECT {} FROM pg_temp.{} LIMIT 0;").format(
+            sql.SQL(', ').join(map(sql.Identifier, target_cols)),
+            sql.Identifier(stage_table_name)
+        ))
+        _stage_column_types[cache_key] = [column.type_code for column in cur.description]
+    return stage_table_name, _stage_column_types[cache_key]
+
+
+def insert_records(cur, table_name, target_cols, records, conflict_cols, page_size=10000):
+    """
+    Inserts records with a multi-row INSERT ... ON CONFLICT DO NOTHING.
+    Returns the number of rows actually inserted into the target.
+    """
+    insert_sql = sql.SQL("""
+        INSERT INTO public.{} ({}) VALUES %s
+        ON CONFLICT ({}) DO NOTHING
+        RETURNING 1;
+    """).format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, target_cols)),
+        sql.SQL(', ').join(map(sql.Identifier, conflict_cols))
+    )
+    return len(extras.execute_values(cur, insert_sql, records, page_size=page_size, fetch=True))
+
+
+def copy_merge_records(cur, table_name, target_cols, records, conflict_cols, copy_format='text', stage_table_name=None):
+    """
+    Streams records into a temporary staging table with COPY ... FROM STDIN and merges
+    them into the target with one set-based INSERT ... ON CONFLICT DO NOTHING.
+    Returns the number of rows actually inserted into the target.
+    """
+    stage_table_name, column_type_oids = create_staging_table(cur, table_name, target_cols, stage_table_name)
+    columns = sql.SQL(', ').join(map(sql.Identifier, target_cols))
+
+    cur.execute(sql.SQL("TRUNCATE pg_temp.{};").format(sql.Identifier(stage_table_name)))
+
+    if copy_format == 'binary':
+        buffer = records_to_binary_copy(records, column_type_oids)
+        copy_options = sql.SQL("(FORMAT binary)")
+    elif copy_format == 'text':
+        buffer = records_to_text_copy(records)
+        copy_options = sql.SQL("(FORMAT text)")
+    else:
+        raise ValueError(f"Unknown COPY format '{copy_format}', expected 'text' or 'binary'")
+
+    cur.copy_expert(sql.SQL("COPY pg_temp.{} ({}) FROM STDIN WITH {}").format(
+        sql.Identifier(stage_table_name), columns, copy_options
+    ).as_string(cur), buffer)
+
+    cur.execute(sql.SQL("""
+        INSERT INTO public.{} ({})
+        SELECT {} FROM pg_temp.{}
+        ON CONFLICT ({}) DO NOTHING;
+    """).format(
+        sql.Identifier(table_name),
+        columns,
+        columns,
+        sql.Identifier(stage_table_name),
+        sql.SQL(', ').join(map(sql.Identifier, conflict_cols))
+    ))
+    return cur.rowcount
+
+
+def load_records(cur, table_name, target_cols, records, conflict_cols, page_size=10000,
+                 load_mode=None, copy_format=None, stage_table_name=None):
+    """
+    Writes records to the target table using the configured ARDWH_LOAD_MODE and
+    returns the number of rows inserted; rows whose key already exists are not counted.
+    """
+    load_mode = load_mode or LOAD_MODE
+    if load_mode == 'copy':
+        return copy_merge_records(cur, table_name, target_cols, records, conflict_cols,
+                                  copy_format=copy_format or COPY_FORMAT, stage_table_name=stage_table_name)
+    elif load_mode == 'insert':
+        return insert_records(cur, table_name, target_cols, records, conflict_cols, page_size=page_size)
+    raise ValueError(f"Unknown load mode '{load_mode}', expected 'insert' or 'copy'")
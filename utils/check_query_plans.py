@@ -0,0 +1,129 @@
+"""
+EXPLAIN-based regression checks for the warehouse's key queries: fails if a query
+that should be served by an index (see dbt_etl/macros/indexes.sql) falls back to a
+sequential scan of a large table, or if a date-bounded fact_review query is not
+pruned to one partition when fact_review is partitioned.
+
+Usage: python check_query_plans.py
+"""
+import os
+import sys
+from datetime import date
+
+from db_conn import db_connection
+
+# Below this many (estimated) rows a sequential scan is the right plan; such checks are skipped.
+MIN_ROWS = int(os.getenv('ARDWH_PLAN_CHECK_MIN_ROWS', '50000'))
+
+
+def explain(cur, query, params=None):
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    return cur.fetchone()[0][0]['Plan']
+
+
+def scanned_relations(plan):
+    """Yields (node type, relation name) for every scan node in the plan tree."""
+    if 'Relation Name' in plan:
+        yield plan['Node Type'], plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from scanned_relations(child)
+
+
+def estimated_rows(cur, table_name):
+    """Estimated rows of a table, summed over its partitions; None if it does not exist."""
+    cur.execute("""
+        SELECT COALESCE(SUM(c.reltuples), 0)::BIGINT, MAX(p.relkind)
+        FROM pg_class p
+        LEFT JOIN pg_inherits i ON i.inhparent = p.oid
+        JOIN pg_class c ON c.oid = COALESCE(i.inhrelid, p.oid)
+        WHERE p.oid = to_regclass(%s);
+    """, (f"public.{table_name}",))
+    rows, relkind = cur.fetchone()
+    return None if relkind is None else rows
+
+
+def is_partitioned(cur, table_name):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s);", (f"public.{table_name}",))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def first_value(cur, query):
+    cur.execute(query)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def no_seq_scan(table_name):
+    """Passes if the plan has no sequential scan of table_name or of any of its partitions."""
+    def check(plan):
+        scans = [relation for node, relation in scanned_relations(plan)
+                 if node == 'Seq Scan' and relation.startswith(table_name)]
+        return not scans, f"Seq Scan on {', '.join(scans)}" if scans else "index access"
+    return check
+
+
+def at_most_one_partition(table_name):
+    def check(plan):
+        partitions = sorted({relation for _, relation in scanned_relations(plan) if relation.startswith(table_name)})
+        return len(partitions) <= 1, f"scans {', '.join(partitions) or 'no partition'}"
+    return check
+
+
+def key_query_checks(cur):
+    """Returns (name, table, query, params, check) for each key query that can be planned on this database."""
+    checks = []
+    for table_name in ['fact_review', 'stg_reviews_data', 'stg_metadata_category']:
+        checks.append((f"{table_name} incremental watermark", table_name,
+                       f"SELECT MAX(ingestion_timestamp) FROM public.{table_name}", None, no_seq_scan(table_name)))
+    checks.append(("stg_reviews_data review date range for dim_date", 'stg_reviews_data',
+                   "SELECT MIN(review_timestamp), MAX(review_timestamp) FROM public.stg_reviews_data",
+                   None, no_seq_scan('stg_reviews_data')))
+
+    for table_name in ['processed_reviews_data', 'processed_metadata_category']:
+        if estimated_rows(cur, table_name) is None:
+            continue
+        watermark = first_value(cur, f"SELECT MAX(ingestion_timestamp) FROM public.{table_name}")
+        checks.append((f"{table_name} rows after the watermark", table_name,
+                       f"SELECT COUNT(*) FROM public.{table_name} WHERE ingestion_timestamp > %s",
+                       (watermark,), no_seq_scan(table_name)))
+
+    for table_name, key_column in [('dim_product_scd2', 'product_id'), ('dim_reviewer_scd2', 'reviewer_id')]:
+        if estimated_rows(cur, table_name) is None:
+            continue
+        key = first_value(cur, f"SELECT {key_column} FROM public.{table_name} LIMIT 1")
+        checks.append((f"{table_name} current row lookup", table_name,
+                       f"SELECT * FROM public.{table_name} WHERE {key_column} = %s AND dbt_valid_to IS NULL",
+                       (key,), no_seq_scan(table_name)))
+        checks.append((f"{table_name} point-in-time lookup", table_name,
+                       f"SELECT * FROM public.{table_name} WHERE {key_column} = %s "
+                       f"AND %s BETWEEN dbt_valid_from AND COALESCE(dbt_valid_to, '9999-12-31'::TIMESTAMP)",
+                       (key, date.today()), no_seq_scan(table_name)))
+
+    if is_partitioned(cur, 'fact_review'):
+        checks.append(("fact_review one month", 'fact_review',
+                       "SELECT COUNT(*) FROM public.fact_review WHERE date_sk >= %s AND date_sk < %s",
+                       (date(2013, 6, 1), date(2013, 7, 1)), at_most_one_partition('fact_review')))
+    return checks
+
+
+def check_query_plans():
+    failures = 0
+    with db_connection() as conn, conn.cursor() as cur:
+        for name, table_name, query, params, check in key_query_checks(cur):
+            rows = estimated_rows(cur, table_name)
+            if rows is None or rows < MIN_ROWS:
+                print(f"SKIP {name}: {table_name} has ~{rows or 0} rows (< {MIN_ROWS})")
+                continue
+            passed, detail = check(explain(cur, query, params))
+            print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+            failures += not passed
+    return failures
+
+
+if __name__ == "__main__":
+    failed = check_query_plans()
+    if failed:
+        print(f"{failed} query plan check(s) failed.")
+        sys.exit(1)
+    print("All query plan checks passed.")
@@ -1,6 +1,12 @@
 import psycopg2
 import os
+import threading
+import time
+from contextlib import contextmanager
 from psycopg2 import sql
+from psycopg2 import extensions
+
+from instrumentation import metrics
 
 DB_HOST = os.getenv('ARDWH_HOST', 'postgres')
 DB_NAME = os.getenv('ARDWH_DB', 'amazon_reviews_dwh')
@@ -8,24 +14,259 @@ DB_USER = os.getenv('ARDWH_USER', 'airflow')
 DB_PASSWORD = os.getenv('ARDWH_PASSWORD', 'airflow')
 DB_PORT = os.getenv('ARDWH_PORT', '5432')
 
+# How the loaders write transformed chunks: 'insert' (execute_values) or
+# 'copy' (COPY into a temporary staging table, then one INSERT ... ON CONFLICT).
+LOAD_MODE = os.getenv('ARDWH_LOAD_MODE', 'insert')
+# COPY wire format used when LOAD_MODE is 'copy': 'text' or 'binary'.
+COPY_FORMAT = os.getenv('ARDWH_COPY_FORMAT', 'text')
+# Where the loaders read raw rows from: 'csv' (csv_files/) or 'parquet' (see parquet_landing.py).
+SOURCE_FORMAT = os.getenv('ARDWH_SOURCE_FORMAT', 'csv')
+
+# Connection pool (see ConnectionPool): connections kept open, the most open at once,
+# how long a checkout waits for a free one, and how long a connection may sit idle
+# before it is pinged on checkout.
+POOL_MIN_SIZE = int(os.getenv('ARDWH_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('ARDWH_POOL_MAX_SIZE', '4'))
+POOL_TIMEOUT = float(os.getenv('ARDWH_POOL_TIMEOUT', '30'))
+POOL_HEALTH_CHECK_SECONDS = float(os.getenv('ARDWH_POOL_HEALTH_CHECK_SECONDS', '30'))
+
+# Session settings applied when a connection is checked out for a role.
+# bulk_load: the loaders commit their data and ingestion_state in one transaction, so
+# an asynchronous commit lost in a server crash loses both and the next run reloads
+# those rows; it never leaves the state ahead of the data.
+SESSION_PROFILES = {
+    'default': {},
+    'bulk_load': {
+        'synchronous_commit': 'off',
+        'work_mem': os.getenv('ARDWH_BULK_WORK_MEM', '256MB'),
+        'maintenance_work_mem': os.getenv('ARDWH_BULK_MAINTENANCE_WORK_MEM', '512MB'),
+    },
+}
+
 def get_db_connection():
     """Establishes and returns a PostgreSQL database connection."""
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            port=DB_PORT
-        )
+        with metrics.timer('db_connect_seconds'):
+            conn = psycopg2.connect(
+                host=DB_HOST,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                port=DB_PORT
+            )
+        metrics.inc('db_connections')
         conn.autocommit = False
         print(f"Attempting to connect to DB at host: {DB_HOST}, port: {DB_PORT}, db: {DB_NAME}")
         print("Successfully connected to the database.")
         return conn
     except Exception as e:
+        metrics.inc('db_connect_errors')
         print(f"Error connecting to the database at host {DB_HOST}: {e}")
         raise
 
+class ConnectionPool:
+    """
+    Thread-safe pool of connections from get_db_connection. Checkouts apply a session
+    profile from SESSION_PROFILES and ping connections that have been idle for a while;
+    returned connections are rolled back if a transaction was left open, and dropped
+    if they are broken. Connections inherited across a fork are never reused.
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_seconds=POOL_HEALTH_CHECK_SECONDS):
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.health_check_seconds = health_check_seconds
+        self._available = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = []  # (connection, returned at)
+        self._profiles = {}
+        self._size = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # A forked child must not touch the parent's sockets, nor close them on
+            # garbage collection, so it keeps the inherited connections referenced.
+            self._inherited = getattr(self, '_inherited', []) + [conn for conn, _ in self._idle]
+            self._reset()
+
+    def _healthy(self, conn, idle_seconds):
+        if conn.closed:
+            return False
+        if idle_seconds < self.health_check_seconds:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _apply_profile(self, conn, profile):
+        if self._profiles.get(conn, 'default') == profile:
+            return
+        # SET outside a transaction, so a later rollback does not undo it.
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("RESET ALL;")
+            for name, value in SESSION_PROFILES[profile].items():
+                cur.execute("SELECT set_config(%s, %s, false);", (name, value))
+        conn.autocommit = False
+        self._profiles[conn] = profile
+
+    def _discard(self, conn):
+        self._profiles.pop(conn, None)
+        self._size -= 1
+        self._available.notify()
+        if not conn.closed:
+            conn.close()
+        metrics.inc('db_pool_discarded')
+
+    def getconn(self, profile='default'):
+        """Checks out a healthy connection with the profile's session settings applied."""
+        if profile not in SESSION_PROFILES:
+            raise ValueError(f"Unknown session profile '{profile}'; expected one of {sorted(SESSION_PROFILES)}")
+        deadline = time.monotonic() + self.timeout
+        with metrics.timer('db_pool_wait_seconds'), self._available:
+            self._check_pid()
+            while True:
+                while self._idle:
+                    conn, returned_at = self._idle.pop()
+                    if self._healthy(conn, time.monotonic() - returned_at):
+                        break
+                    self._discard(conn)
+                else:
+                    conn = None
+                if conn is None and self._size < self.max_size:
+                    self._size += 1
+                    try:
+                        conn = get_db_connection()
+                    except Exception:
+                        self._size -= 1
+                        raise
+                if conn is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No database connection free within {self.timeout}s "
+                                       f"(ARDWH_POOL_MAX_SIZE={self.max_size})")
+                self._available.wait(remaining)
+            try:
+                self._apply_profile(conn, profile)
+            except psycopg2.Error:
+                self._discard(conn)
+                raise
+        metrics.inc('db_pool_checkouts', profile=profile)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Returns a connection; an open transaction is rolled back, a broken connection dropped."""
+        with self._available:
+            if self._pid != os.getpid():
+                return
+            if not discard and not conn.closed:
+                try:
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            if discard or conn.closed or len(self._idle) >= self.max_size:
+                self._discard(conn)
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, profile='default'):
+        """Context manager around getconn/putconn; work not committed when it exits is rolled back."""
+        conn = self.getconn(profile)
+        try:
+            yield conn
+        except psycopg2.InterfaceError:
+            self.putconn(conn, discard=True)
+            raise
+        except BaseException:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def prefill(self):
+        """Opens connections up to min_size."""
+        conns = [self.getconn() for _ in range(max(self.min_size - len(self._idle), 0))]
+        for conn in conns:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._available:
+            self._check_pid()
+            for conn, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            self._profiles = {}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide connection pool, created (and filled to POOL_MIN_SIZE) on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            _pool.prefill()
+        return _pool
+
+
+@contextmanager
+def db_connection(profile='default'):
+    """
+    Pooled connection for one unit of work:
+
+        with db_connection('bulk_load') as conn:
+            ...
+            conn.commit()
+    """
+    with get_pool().connection(profile) as conn:
+        yield conn
+
+
+def close_pool():
+    """Closes the idle pooled connections, e.g. before forking worker processes."""
+    if _pool is not None:
+        _pool.closeall()
+
+
+def summarize_bulk_load(conn, table_name):
+    """
+    Deferred index maintenance after a bulk load. The raw tables' BRIN indexes are not
+    maintained row by row (new page ranges stay unsummarized until VACUUM), so they
+    are summarized once here, and the table is analyzed for the dbt runs that follow.
+    The primary keys cannot be deferred: ON CONFLICT needs them during the load.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT i.indexrelid::regclass::text
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE i.indrelid = to_regclass(%s) AND am.amname = 'brin';
+        """, (f"public.{table_name}",))
+        for (index_name,) in cur.fetchall():
+            cur.execute("SELECT brin_summarize_new_values(%s::regclass);", (index_name,))
+            print(f"Summarized {cur.fetchone()[0]} new page ranges of {index_name}.")
+        cur.execute(sql.SQL("ANALYZE public.{};").format(sql.Identifier(table_name)))
+    conn.commit()
+
+
 def create_processed_metadata_table(conn, table_name="processed_metadata_category"):
     PROCESSED_TABLE_NAME = table_name
 
@@ -46,9 +287,15 @@ def create_processed_metadata_table(conn, table_name="processed_metadata_categor
             ingestion_timestamp TIMESTAMP WITHOUT TIME ZONE
         );
     """).format(sql.Identifier(PROCESSED_TABLE_NAME))
+    # Rows are appended in ingestion order, so a BRIN index serves the dbt staging
+    # models' ingestion_timestamp watermark at a fraction of a btree's size.
+    create_index_query = sql.SQL("""
+        CREATE INDEX IF NOT EXISTS {} ON public.{} USING brin (ingestion_timestamp);
+    """).format(sql.Identifier(f"{PROCESSED_TABLE_NAME}_ingestion_timestamp_brin_idx"), sql.Identifier(PROCESSED_TABLE_NAME))
 
     with conn.cursor() as cur:
         cur.execute(create_table_query)
+        cur.execute(create_index_query)
     conn.commit()
     print(f"Table '{PROCESSED_TABLE_NAME}' created or already exists.")
 
@@ -70,8 +317,62 @@ def create_processed_reviews_table(conn, table_name="processed_reviews_data"):
             PRIMARY KEY (reviewer_id, product_id, unix_review_timestamp)
         );
     """).format(sql.Identifier(PROCESSED_TABLE_NAME))
+    create_index_query = sql.SQL("""
+        CREATE INDEX IF NOT EXISTS {} ON public.{} USING brin (ingestion_timestamp);
+    """).format(sql.Identifier(f"{PROCESSED_TABLE_NAME}_ingestion_timestamp_brin_idx"), sql.Identifier(PROCESSED_TABLE_NAME))
+
+    with conn.cursor() as cur:
+        cur.execute(create_table_query)
+        cur.execute(create_index_query)
+    conn.commit()
+    print(f"Table '{PROCESSED_TABLE_NAME}' created or already exists.")
+
+def create_ingestion_state_table(conn, table_name="ingestion_state"):
+    PROCESSED_TABLE_NAME = table_name
+
+    print(f"Creating table '{PROCESSED_TABLE_NAME}' if it does not exist...")
+    create_table_query = sql.SQL("""
+        CREATE TABLE IF NOT EXISTS public.{} (
+            file_path TEXT PRIMARY KEY,
+            byte_offset BIGINT NOT NULL,
+            row_count BIGINT NOT NULL,
+            file_mtime DOUBLE PRECISION NOT NULL,
+            content_hash TEXT NOT NULL,
+            max_unixreviewtime BIGINT,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        );
+    """).format(sql.Identifier(PROCESSED_TABLE_NAME))
 
     with conn.cursor() as cur:
         cur.execute(create_table_query)
     conn.commit()
-    print(f"Table '{PROCESSED_TABLE_NAME}' created or already exists.")
\ No newline at end of file
+    print(f"Table '{PROCESSED_TABLE_NAME}' created or already exists.")
+
+def create_ingestion_shard_state_table(conn, table_name="ingestion_shard_state"):
+    PROCESSED_TABLE_NAME = table_name
+
+    print(f"Creating table '{PROCESSED_TABLE_NAME}' if it does not exist...")
+    create_table_query = sql.SQL("""
+        CREATE TABLE IF NOT EXISTS public.{} (
+            file_path TEXT NOT NULL,
+            shard_index INTEGER NOT NULL,
+            shard_count INTEGER NOT NULL,
+            start_offset BIGINT NOT NULL,
+            end_offset BIGINT NOT NULL,
+            plan_mode TEXT NOT NULL,
+            file_size BIGINT NOT NULL,
+            file_mtime DOUBLE PRECISION NOT NULL,
+            content_hash TEXT NOT NULL,
+            status TEXT NOT NULL,
+            rows_read BIGINT,
+            rows_inserted BIGINT,
+            max_unixreviewtime BIGINT,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (file_path, shard_index)
+        );
+    """).format(sql.Identifier(PROCESSED_TABLE_NAME))
+
+    with conn.cursor() as cur:
+        cur.execute(create_table_query)
+    conn.commit()
+    print(f"Table '{PROCESSED_TABLE_NAME}' created or already exists.")
@@ -0,0 +1,216 @@
+import hashlib
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+from psycopg2 import sql
+
+INGESTION_STATE_TABLE_NAME = "ingestion_state"
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class ReadPlan:
+    """
+    What a loader has to read from a CSV given its recorded ingestion state.
+
+    mode is one of:
+      'skip'   - size and mtime match the last load; nothing to do.
+      'append' - the file grew and its old prefix is unchanged; read from start_offset.
+                 Assumes the file is only appended to in whole CSV rows.
+      'full'   - first load, file rewritten, or --full-reload; read everything. Rows
+                 already loaded are dropped by the loaders' key checks.
+
+    Reads stop at end_offset, the end of the last complete line when the file was
+    planned, which is what ingestion_state records as consumed; content_hash covers
+    the bytes before it.
+    """
+
+    def __init__(self, file_path, mode, start_offset=0, previous_state=None,
+                 file_size=0, file_mtime=0.0, content_hash=None, end_offset=None):
+        self.file_path = file_path
+        self.mode = mode
+        self.start_offset = start_offset
+        self.previous_state = previous_state
+        self.file_size = file_size
+        self.file_mtime = file_mtime
+        self.content_hash = content_hash
+        self.end_offset = file_size if end_offset is None else end_offset
+
+    @property
+    def previous_row_count(self):
+        return self.previous_state['row_count'] if self.previous_state and self.mode in ('append', 'skip') else 0
+
+    def __repr__(self):
+        return f"ReadPlan(mode={self.mode!r}, start_offset={self.start_offset}, end_offset={self.end_offset})"
+
+
+class ByteRangeReader(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+
+    def __init__(self, file_path, start, end):
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def complete_lines_end(file_path, size):
+    """Offset just past the last newline in the first size bytes of the file (0 if there is none)."""
+    with open(file_path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - HASH_BLOCK_SIZE)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def hash_file(file_path, prefix_length=None, length=None):
+    """
+    Returns (full_hash, prefix_hash) of the file's first length bytes (all of it if
+    None) in one sequential pass, where prefix_hash covers the first prefix_length
+    bytes (None if not requested).
+    """
+    full_hash = hashlib.sha256()
+    prefix_hash = None
+    remaining_prefix = prefix_length
+    remaining = length
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE if remaining is None else min(HASH_BLOCK_SIZE, remaining))
+            if remaining is not None:
+                remaining -= len(block)
+            if not block:
+                break
+            if remaining_prefix is not None and prefix_hash is None and remaining_prefix <= len(block):
+                full_hash.update(block[:remaining_prefix])
+                prefix_hash = full_hash.copy().hexdigest()
+                full_hash.update(block[remaining_prefix:])
+            else:
+                full_hash.update(block)
+                if remaining_prefix is not None and prefix_hash is None:
+                    remaining_prefix -= len(block)
+    return full_hash.hexdigest(), prefix_hash
+
+
+def get_ingestion_state(cur, file_path):
+    cur.execute(sql.SQL("""
+        SELECT byte_offset, row_count, file_mtime, content_hash, max_unixreviewtime
+        FROM public.{} WHERE file_path = %s;
+    """).format(sql.Identifier(INGESTION_STATE_TABLE_NAME)), (file_path,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(['byte_offset', 'row_count', 'file_mtime', 'content_hash', 'max_unixreviewtime'], row))
+
+
+def plan_read(cur, file_path, full_reload=False):
+    """
+    Compares the file on disk with its recorded ingestion state and returns a ReadPlan.
+    A last line without a newline may still be being appended; it is left for the next
+    run, and only read then if the file has not been modified since.
+    """
+    stat = os.stat(file_path)
+    previous_state = None if full_reload else get_ingestion_state(cur, file_path)
+
+    if previous_state and stat.st_size == previous_state['byte_offset'] and stat.st_mtime == previous_state['file_mtime']:
+        return ReadPlan(file_path, 'skip', stat.st_size, previous_state, stat.st_size, stat.st_mtime,
+                        previous_state['content_hash'])
+
+    settled = previous_state is not None and stat.st_mtime == previous_state['file_mtime']
+    end_offset = stat.st_size if settled else complete_lines_end(file_path, stat.st_size)
+
+    if previous_state and end_offset >= previous_state['byte_offset']:
+        content_hash, prefix_hash = hash_file(file_path, previous_state['byte_offset'], end_offset)
+        if content_hash == previous_state['content_hash']:
+            # Touched but not modified, or only a partial line was added.
+            return ReadPlan(file_path, 'skip', end_offset, previous_state, stat.st_size, stat.st_mtime,
+                            content_hash, end_offset)
+        if prefix_hash == previous_state['content_hash']:
+            return ReadPlan(file_path, 'append', previous_state['byte_offset'], previous_state, stat.st_size,
+                            stat.st_mtime, content_hash, end_offset)
+    else:
+        content_hash, _ = hash_file(file_path, length=end_offset)
+
+    return ReadPlan(file_path, 'full', 0, previous_state, stat.st_size, stat.st_mtime, content_hash, end_offset)
+
+
+def plan_dataset_read(cur, dataset_dir, full_reload=False):
+    """
+    ReadPlan for a Parquet dataset directory. The content hash covers the listing of
+    data files (path, size, mtime), so an unchanged dataset is skipped without reading
+    it; a changed one is read in full and rows already loaded are dropped by key.
+    """
+    listing = hashlib.sha256()
+    total_size, latest_mtime = 0, 0.0
+    for root, dirs, files in os.walk(dataset_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith(('.', '_')):
+                continue
+            stat = os.stat(os.path.join(root, name))
+            listing.update(f"{os.path.relpath(os.path.join(root, name), dataset_dir)}|{stat.st_size}|{stat.st_mtime}\n".encode())
+            total_size += stat.st_size
+            latest_mtime = max(latest_mtime, stat.st_mtime)
+    if not total_size:
+        raise FileNotFoundError(f"No Parquet files found in {dataset_dir}")
+    content_hash = listing.hexdigest()
+
+    previous_state = None if full_reload else get_ingestion_state(cur, dataset_dir)
+    if previous_state and previous_state['content_hash'] == content_hash:
+        return ReadPlan(dataset_dir, 'skip', total_size, previous_state, total_size, latest_mtime, content_hash)
+    return ReadPlan(dataset_dir, 'full', 0, previous_state, total_size, latest_mtime, content_hash)
+
+
+def read_csv_chunks(plan, chunksize):
+    """Yields DataFrame chunks of the rows the plan says are new, up to its end_offset."""
+    if plan.mode == 'skip' or plan.end_offset <= plan.start_offset:
+        return
+    with io.BufferedReader(ByteRangeReader(plan.file_path, plan.start_offset, plan.end_offset)) as f:
+        if plan.mode == 'full':
+            yield from pd.read_csv(f, chunksize=chunksize)
+            return
+        columns = pd.read_csv(plan.file_path, nrows=0).columns
+        yield from pd.read_csv(f, header=None, names=columns, chunksize=chunksize)
+
+
+def save_ingestion_state(cur, plan, rows_read, max_unixreviewtime=None):
+    """Records what has been loaded; runs in the loader's transaction so it commits with the data."""
+    row_count = plan.previous_row_count + rows_read
+    if plan.previous_state and plan.previous_state['max_unixreviewtime'] is not None:
+        if max_unixreviewtime is None or plan.previous_state['max_unixreviewtime'] > max_unixreviewtime:
+            max_unixreviewtime = plan.previous_state['max_unixreviewtime']
+
+    cur.execute(sql.SQL("""
+        INSERT INTO public.{} (file_path, byte_offset, row_count, file_mtime, content_hash, max_unixreviewtime, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (file_path) DO UPDATE SET
+            byte_offset = EXCLUDED.byte_offset,
+            row_count = EXCLUDED.row_count,
+            file_mtime = EXCLUDED.file_mtime,
+            content_hash = EXCLUDED.content_hash,
+            max_unixreviewtime = EXCLUDED.max_unixreviewtime,
+            updated_at = EXCLUDED.updated_at;
+    """).format(sql.Identifier(INGESTION_STATE_TABLE_NAME)), (
+        plan.file_path, plan.end_offset, row_count, plan.file_mtime, plan.content_hash,
+        None if max_unixreviewtime is None else int(max_unixreviewtime), datetime.now()
+    ))
@@ -0,0 +1,174 @@
+import ast
+import math
+from datetime import datetime
+
+import pandas as pd
+
+RAW_TEXT_COLUMNS = ['salesrank', 'imurl', 'categories', 'title', 'description', 'price', 'related', 'brand']
+
+METADATA_TARGET_COLS = [
+    'metadata_id', 'product_id', 'image_url', 'sales_category', 'sales_rank',
+    'first_category', 'product_title', 'product_description', 'product_price',
+    'related_products', 'product_brand', 'ingestion_timestamp'
+]
+
+METADATA_COLUMN_RENAMES = {
+    'metadataid': 'metadata_id',
+    'asin': 'product_id',
+    'imurl': 'image_url',
+    'title': 'product_title',
+    'description': 'product_description',
+    'price': 'product_price',
+    'related': 'related_products',
+    'brand': 'product_brand',
+}
+
+# Fast paths only accept strings that are guaranteed to be valid Python literals
+# with the same meaning under ast.literal_eval; anything else falls back to it.
+_QUOTED = r"'[^'\\\n]*'"
+SALESRANK_FAST_PATTERN = r"^\{'(?P<category>[^'\\\n]*)': (?P<rank>0|[1-9][0-9]*)\}$"
+CATEGORIES_FAST_PATTERN = (
+    r"^\[\['(?P<first>[^'\\\n]*)'(?:, " + _QUOTED + r")*\]"
+    r"(?:, \[(?:" + _QUOTED + r"(?:, " + _QUOTED + r")*)?\])*\]$"
+)
+PRICE_FAST_PATTERN = r"^-?[0-9]+(?:\.[0-9]+)?$"
+
+
+def _object_series(index):
+    return pd.Series([None] * len(index), index=index, dtype=object)
+
+
+def _eval_salesrank(salesrank_str, index):
+    """Slow path: returns (sales_category, sales_rank) for one salesrank literal."""
+    try:
+        salesrank_dict = ast.literal_eval(salesrank_str)
+    except (ValueError, SyntaxError) as e:
+        print(f"Warning: Could not parse salesrank '{salesrank_str}' at index {index} for chunk. Error: {e}")
+        return None, None
+    if isinstance(salesrank_dict, dict) and salesrank_dict:
+        key, value = next(iter(salesrank_dict.items()))
+        try:
+            return key, int(value)
+        except (ValueError, TypeError):
+            return key, None
+    return None, None
+
+
+def _eval_first_category(categories_str, index):
+    """Slow path: returns the first category of one categories literal."""
+    try:
+        categories_list = ast.literal_eval(categories_str)
+    except (ValueError, SyntaxError) as e:
+        print(f"Warning: Could not parse categories '{categories_str}' at index {index} for chunk. Error: {e}")
+        return None
+    if isinstance(categories_list, list) and categories_list:
+        if categories_list[0] and isinstance(categories_list[0], list):
+            return categories_list[0][0]
+        elif categories_list[0] and isinstance(categories_list[0], str):
+            return categories_list[0]
+    return None
+
+
+def _eval_price(original_price, index):
+    """Slow path: returns the float value of one price string, or None if unparseable or not finite."""
+    try:
+        value = float(str(original_price).strip().replace('$', '').replace(',', ''))
+    except (ValueError, TypeError):
+        print(f"Warning: Could not convert price '{original_price}' to float for row {index}. Setting to None.")
+        return None
+    if not math.isfinite(value):
+        # inf/nan cannot be stored in product_price (NUMERIC) by every load mode.
+        print(f"Warning: Price '{original_price}' for row {index} is not finite. Setting to None.")
+        return None
+    return value
+
+
+def parse_salesrank(salesrank):
+    """Splits a salesrank column like "{'Clothing': 1234}" into (sales_category, sales_rank)."""
+    sales_category = _object_series(salesrank.index)
+    sales_rank = _object_series(salesrank.index)
+
+    present = salesrank.notna()
+    extracted = salesrank[present].str.extract(SALESRANK_FAST_PATTERN)
+    fast = extracted['category'].notna()
+    fast_index = extracted.index[fast]
+    sales_category.loc[fast_index] = extracted.loc[fast, 'category']
+    sales_rank.loc[fast_index] = [int(rank) for rank in extracted.loc[fast, 'rank']]
+
+    remaining = salesrank[present].loc[~fast]
+    remaining = remaining[remaining.str.strip() != '{}']
+    for index, salesrank_str in remaining.items():
+        sales_category.at[index], sales_rank.at[index] = _eval_salesrank(salesrank_str, index)
+
+    return sales_category, sales_rank
+
+
+def parse_first_category(categories):
+    """Returns the first category of a categories column like "[['Clothing', 'Women']]"."""
+    first_category = _object_series(categories.index)
+
+    present = categories.notna()
+    extracted = categories[present].str.extract(CATEGORIES_FAST_PATTERN)['first']
+    fast = extracted.notna()
+    first_category.loc[extracted.index[fast]] = extracted[fast]
+
+    for index, categories_str in categories[present].loc[~fast].items():
+        first_category.at[index] = _eval_first_category(categories_str, index)
+
+    return first_category
+
+
+def parse_price(price):
+    """Converts a price column like '$1,234.00' to floats, None where unparseable or not finite."""
+    parsed = _object_series(price.index)
+
+    present = price.notna()
+    cleaned = price[present].str.strip().str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+    fast = cleaned.str.match(PRICE_FAST_PATTERN)
+    parsed.loc[cleaned.index[fast]] = [float(value) for value in cleaned[fast]]
+
+    for index, original_price in price[present].loc[~fast].items():
+        parsed.at[index] = _eval_price(original_price, index)
+
+    return parsed
+
+
+def transform_metadata_chunk(chunk_df, ingestion_timestamp=None):
+    """
+    Vectorized transform of a raw metadata CSV chunk into the
+    processed_metadata_category layout (METADATA_TARGET_COLS).
+    """
+    chunk_df = chunk_df.copy()
+    for col in RAW_TEXT_COLUMNS:
+        if col in chunk_df.columns:
+            chunk_df[col] = chunk_df[col].astype(str).replace({'nan': None})
+
+    chunk_df.dropna(subset=['asin'], inplace=True)
+
+    if 'salesrank' in chunk_df.columns:
+        chunk_df['sales_category'], chunk_df['sales_rank'] = parse_salesrank(chunk_df['salesrank'])
+    else:
+        chunk_df['sales_category'] = None
+        chunk_df['sales_rank'] = None
+
+    if 'categories' in chunk_df.columns:
+        chunk_df['first_category'] = parse_first_category(chunk_df['categories'])
+    else:
+        chunk_df['first_category'] = None
+
+    if 'price' in chunk_df.columns:
+        chunk_df['price'] = parse_price(chunk_df['price'])
+
+    chunk_df['ingestion_timestamp'] = ingestion_timestamp or datetime.now()
+
+    processed_chunk_df = chunk_df.rename(columns=METADATA_COLUMN_RENAMES)
+    for col in METADATA_TARGET_COLS:
+        if col not in processed_chunk_df.columns:
+            processed_chunk_df[col] = None
+    return processed_chunk_df[METADATA_TARGET_COLS]
+
+
+def dataframe_to_records(df):
+    """Converts a DataFrame to a list of tuples with NaN/NaT replaced by None."""
+    df = df.astype(object)
+    return list(df.where(df.notna(), None).itertuples(index=False, name=None))
@@ -0,0 +1,206 @@
+"""
+Columnar landing zone for the raw CSVs. Converts csv_files/ into typed Parquet
+datasets (reviews partitioned by review_year/review_month of unixreviewtime) and
+reads them back with column projection, partition pruning and row-group filtering.
+
+Usage: python parquet_landing.py [--force]
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+current_script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_script_dir)
+CSV_FILES_DIR = os.getenv('ARDWH_CSV_DIR', os.path.join(project_root, 'csv_files'))
+PARQUET_FILES_DIR = os.getenv('ARDWH_PARQUET_DIR', os.path.join(project_root, 'parquet_files'))
+
+REVIEWS_CSV_PATH = os.path.join(CSV_FILES_DIR, 'reviews_Clothing_Shoes_and_Jewelry_5.csv')
+METADATA_CSV_PATH = os.path.join(CSV_FILES_DIR, 'metadata_category_clothing_shoes_and_jewelry_only.csv')
+REVIEWS_PARQUET_DIR = os.path.join(PARQUET_FILES_DIR, 'reviews')
+METADATA_PARQUET_DIR = os.path.join(PARQUET_FILES_DIR, 'metadata')
+
+REVIEWS_SCHEMA = pa.schema([
+    ('reviewerid', pa.string()),
+    ('asin', pa.string()),
+    ('reviewername', pa.string()),
+    ('helpful', pa.string()),
+    ('reviewtext', pa.string()),
+    ('overall', pa.float64()),
+    ('summary', pa.string()),
+    ('unixreviewtime', pa.int64()),
+    ('reviewtime', pa.string()),
+    ('review_year', pa.int32()),
+    ('review_month', pa.int32()),
+])
+REVIEWS_PARTITIONING = ds.partitioning(
+    pa.schema([('review_year', pa.int32()), ('review_month', pa.int32())]), flavor='hive'
+)
+
+METADATA_SCHEMA = pa.schema([
+    ('metadataid', pa.int64()),
+    ('asin', pa.string()),
+    ('imurl', pa.string()),
+    ('salesrank', pa.string()),
+    ('categories', pa.string()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('price', pa.string()),
+    ('related', pa.string()),
+    ('brand', pa.string()),
+])
+
+FINGERPRINT_FILE = '_source_fingerprint.json'
+CONVERT_CHUNK_SIZE = 100000
+ROWS_PER_GROUP = 64 * 1024
+
+
+def _coerce_to_schema(chunk_df, schema):
+    """Types a raw CSV chunk to the Parquet schema; unparseable numbers become nulls."""
+    for field in schema:
+        if field.name not in chunk_df.columns:
+            chunk_df[field.name] = None
+        column = chunk_df[field.name]
+        if pa.types.is_string(field.type):
+            chunk_df[field.name] = column.where(column.isna(), column.astype(str))
+        elif pa.types.is_integer(field.type):
+            chunk_df[field.name] = pd.to_numeric(column, errors='coerce').astype('Int64')
+        else:
+            chunk_df[field.name] = pd.to_numeric(column, errors='coerce')
+    return pa.Table.from_pandas(chunk_df[schema.names], schema=schema, preserve_index=False)
+
+
+def _reviews_batches(csv_path):
+    for chunk_df in pd.read_csv(csv_path, chunksize=CONVERT_CHUNK_SIZE):
+        review_time = pd.to_datetime(
+            pd.to_numeric(chunk_df['unixreviewtime'], errors='coerce').fillna(0), unit='s'
+        )
+        chunk_df['review_year'] = review_time.dt.year.astype('int32')
+        chunk_df['review_month'] = review_time.dt.month.astype('int32')
+        # Sorting within the chunk keeps unixreviewtime ranges tight per row group.
+        chunk_df = chunk_df.sort_values('unixreviewtime', kind='stable')
+        yield from _coerce_to_schema(chunk_df, REVIEWS_SCHEMA).to_batches()
+
+
+def _metadata_batches(csv_path):
+    for chunk_df in pd.read_csv(csv_path, chunksize=CONVERT_CHUNK_SIZE):
+        yield from _coerce_to_schema(chunk_df, METADATA_SCHEMA).to_batches()
+
+
+def _csv_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def convert_csv_to_parquet(csv_path, dataset_dir, batches, schema, partitioning=None, force=False):
+    """
+    Rewrites dataset_dir from csv_path unless the CSV is unchanged since the last
+    conversion. The new dataset is written next to the old one and swapped in.
+    Returns True if the dataset was (re)written.
+    """
+    fingerprint = _csv_fingerprint(csv_path)
+    fingerprint_path = os.path.join(dataset_dir, FINGERPRINT_FILE)
+    if not force and os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as f:
+            if json.load(f) == fingerprint:
+                print(f"{csv_path} unchanged since last conversion; keeping {dataset_dir}.")
+                return False
+
+    staging_dir = dataset_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    print(f"Converting {csv_path} to Parquet at {dataset_dir}...")
+    ds.write_dataset(
+        batches(csv_path), staging_dir, schema=schema, format='parquet',
+        partitioning=partitioning, existing_data_behavior='error',
+        min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP * 4,
+        basename_template='part-{i}.parquet',
+    )
+    with open(os.path.join(staging_dir, FINGERPRINT_FILE), 'w') as f:
+        json.dump(fingerprint, f)
+
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    os.replace(staging_dir, dataset_dir)
+    print(f"Finished converting {csv_path}.")
+    return True
+
+
+def convert_reviews(force=False):
+    return convert_csv_to_parquet(REVIEWS_CSV_PATH, REVIEWS_PARQUET_DIR, _reviews_batches,
+                                  REVIEWS_SCHEMA, REVIEWS_PARTITIONING, force)
+
+
+def convert_metadata(force=False):
+    return convert_csv_to_parquet(METADATA_CSV_PATH, METADATA_PARQUET_DIR, _metadata_batches,
+                                  METADATA_SCHEMA, None, force)
+
+
+def _year_month(unix_time):
+    moment = datetime.fromtimestamp(unix_time, tz=timezone.utc)
+    return moment.year, moment.month
+
+
+def review_time_filter(min_unixreviewtime=None, max_unixreviewtime=None):
+    """
+    Filter on unixreviewtime plus the matching review_year/review_month partition
+    bounds, so pyarrow prunes whole partitions before checking row-group statistics.
+    """
+    expression = None
+    year, month = ds.field('review_year'), ds.field('review_month')
+    if min_unixreviewtime is not None:
+        low_year, low_month = _year_month(min_unixreviewtime)
+        expression = (
+            ((year > low_year) | ((year == low_year) & (month >= low_month)))
+            & (ds.field('unixreviewtime') >= min_unixreviewtime)
+        )
+    if max_unixreviewtime is not None:
+        high_year, high_month = _year_month(max_unixreviewtime)
+        upper = (
+            ((year < high_year) | ((year == high_year) & (month <= high_month)))
+            & (ds.field('unixreviewtime') <= max_unixreviewtime)
+        )
+        expression = upper if expression is None else expression & upper
+    return expression
+
+
+def _batches_to_frame(batches):
+    frame = pa.Table.from_batches(batches).to_pandas()
+    # Nulls in string columns come back as None; the loaders expect NaN as from read_csv.
+    for col in frame.columns:
+        if frame[col].dtype == object:
+            frame[col] = frame[col].where(frame[col].notna(), np.nan)
+    return frame
+
+
+def read_parquet_chunks(dataset_dir, columns=None, filter_expression=None, chunksize=10000):
+    """
+    Yields DataFrame chunks of the projected columns for the rows matching the filter.
+    Small per-partition record batches are coalesced to about chunksize rows.
+    """
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning='hive', ignore_prefixes=['.', '_'])
+    scanner = dataset.scanner(columns=columns, filter=filter_expression, batch_size=chunksize)
+    pending, pending_rows = [], 0
+    for batch in scanner.to_batches():
+        if not batch.num_rows:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= chunksize:
+            yield _batches_to_frame(pending)
+            pending, pending_rows = [], 0
+    if pending:
+        yield _batches_to_frame(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the raw CSVs in csv_files/ to Parquet.")
+    parser.add_argument('--force', action='store_true', help="Convert even if the CSVs are unchanged.")
+    args = parser.parse_args()
+
+    convert_metadata(force=args.force)
+    convert_reviews(force=args.force)
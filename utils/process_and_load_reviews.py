@@ -1,165 +1,243 @@
-import pandas as pd
-from psycopg2 import sql, extras
-from datetime import datetime
+import argparse
+from collections import deque
+from datetime import datetime, timezone
 import os
-import requests
+
 import numpy as np
+from psycopg2 import sql
 
-from db_conn import get_db_connection, create_processed_reviews_table
+from db_conn import (
+    db_connection, summarize_bulk_load, create_processed_reviews_table, create_ingestion_state_table, SOURCE_FORMAT
+)
+from bulk_loader import load_records
+from ingestion_state import plan_read, plan_dataset_read, read_csv_chunks, save_ingestion_state
+from sentiment_client import SentimentClient, CLIENT_MODE
+from reviews_transform import REVIEWS_TARGET_COLS, TransformStats, stream_review_batches, transform_reviews_chunk
+from instrumentation import metrics
 
 PROCESSED_TABLE_NAME = "processed_reviews_data"
 
 current_script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_script_dir)
-CSV_FILES_DIR = os.path.join(project_root, 'csv_files')
+CSV_FILES_DIR = os.getenv('ARDWH_CSV_DIR', os.path.join(project_root, 'csv_files'))
 
 REVIEWS_CSV_PATH = os.path.join(CSV_FILES_DIR, 'reviews_Clothing_Shoes_and_Jewelry_5.csv')
 
-SENTIMENT_SERVICE_URL = os.getenv('SENTIMENT_API_URL', 'http://127.0.0.1:5001/sentiment')
-
-API_BATCH_SIZE = 500
-
-def get_sentiments_from_service_batched(texts_list):
-    if not texts_list:
-        return []
+# Chunks held at once: one being inserted/parsed while the next ones are being scored.
+PIPELINE_DEPTH = int(os.getenv('REVIEWS_PIPELINE_DEPTH', '2'))
+# Raw rows per chunk. Memory per chunk is the raw chunk plus one copy of its output columns.
+CHUNK_SIZE = int(os.getenv('REVIEWS_CHUNK_SIZE', '10000'))
+
+REVIEWS_CONFLICT_COLS = ['reviewer_id', 'product_id', 'unix_review_timestamp']
+# Look up each batch's keys in processed_reviews_data before scoring, so rows that
+# ON CONFLICT DO NOTHING would discard are never sent to the sentiment service.
+PREFLIGHT_DEDUP = os.getenv('REVIEWS_PREFLIGHT_DEDUP', 'true').lower() == 'true'
+REVIEWS_SOURCE_COLUMNS = ['reviewerid', 'asin', 'reviewername', 'helpful', 'reviewtext', 'overall',
+                          'summary', 'unixreviewtime', 'reviewtime']
+
+def existing_review_positions(cur, batch):
+    """Positions of the batch's rows whose key is already in processed_reviews_data (one indexed join)."""
+    cur.execute(sql.SQL("""
+        SELECT k.ordinality - 1
+        FROM unnest(%s::TEXT[], %s::TEXT[], %s::TIMESTAMP[])
+            WITH ORDINALITY AS k(reviewer_id, product_id, unix_review_timestamp, ordinality)
+        JOIN public.{} t USING (reviewer_id, product_id, unix_review_timestamp);
+    """).format(sql.Identifier(PROCESSED_TABLE_NAME)), [batch.columns[col] for col in REVIEWS_CONFLICT_COLS])
+    return [row[0] for row in cur.fetchall()]
+
+
+def drop_loaded_reviews(cur, batch):
+    """
+    Pre-flight dedup: returns (batch, existing, repeated) with the rows already in
+    processed_reviews_data and the repeats of a key earlier in the batch removed.
+    """
+    keep = np.ones(len(batch), dtype=bool)
+    keep[existing_review_positions(cur, batch)] = False
+    existing = len(batch) - int(keep.sum())
+
+    seen = set()
+    for position, key in enumerate(zip(*(batch.columns[col] for col in REVIEWS_CONFLICT_COLS))):
+        if key in seen:
+            keep[position] = False
+        seen.add(key)
+    repeated = len(batch) - existing - int(keep.sum())
+    return batch.filter(keep), existing, repeated
+
+
+def insert_scored_chunk(cur, batch, pending_sentiments, chunk_size):
+    """Waits for a batch's sentiments, then writes it. Returns the number of rows inserted."""
+    with metrics.timer('stage_seconds', stage='sentiment_wait'):
+        sentiments = pending_sentiments.result()
+    print(f"Sentiment analysis for chunk of {len(batch)} rows completed.")
+
+    data_to_insert = batch.to_records(sentiments)
+    if not data_to_insert:
+        return 0
+    with metrics.timer('stage_seconds', stage='db_write'):
+        inserted = load_records(cur, PROCESSED_TABLE_NAME, REVIEWS_TARGET_COLS, data_to_insert,
+                                conflict_cols=REVIEWS_CONFLICT_COLS, page_size=chunk_size)
+    metrics.inc('rows_written', inserted, table=PROCESSED_TABLE_NAME)
+    return inserted
+
+
+def _timed_transform(chunk_df):
+    with metrics.timer('stage_seconds', stage='transform'):
+        return transform_reviews_chunk(chunk_df)
+
+
+def load_review_chunks(cur, chunks, sentiment_client, chunk_size, min_time=None, max_time=None):
+    """
+    Transforms, scores and writes raw review chunks on cur without committing.
+    Returns (rows_read, rows_processed, max_unixreviewtime).
+    """
+    stats = TransformStats()
+    rows_processed = 0
+    rows_existing = 0
+    rows_repeated = 0
+
+    # Batch k is scored in the background while chunk k+1 is parsed and batch k-1 is
+    # inserted. The bounded deque is the backpressure: reading pauses once
+    # PIPELINE_DEPTH batches are waiting on the sentiment service.
+    pending_batches = deque()
+    chunks = metrics.timed_iter(chunks, 'stage_seconds', stage='read')
+    for batch in stream_review_batches(chunks, min_time, max_time, stats, transform=_timed_transform):
+        if PREFLIGHT_DEDUP:
+            with metrics.timer('stage_seconds', stage='dedup'):
+                batch, existing, repeated = drop_loaded_reviews(cur, batch)
+            rows_existing += existing
+            rows_repeated += repeated
+            if existing or repeated:
+                print(f"  Skipping {existing} rows already loaded and {repeated} repeated keys in this chunk.")
+            if not len(batch):
+                continue
+        if sentiment_client.mode == 'stream':
+            print(f"  Streaming {len(batch)} texts to sentiment service in one request...")
+        else:
+            print(f"  Sending {len(batch)} texts to sentiment service in batches of {sentiment_client.batch_size}...")
+        pending_batches.append((batch, sentiment_client.submit(batch.texts)))
+
+        if len(pending_batches) >= PIPELINE_DEPTH:
+            inserted = insert_scored_chunk(cur, *pending_batches.popleft(), chunk_size)
+            rows_processed += inserted
+            print(f"  Processed and inserted {inserted} rows from chunk. Total: {rows_processed}")
+
+    while pending_batches:
+        inserted = insert_scored_chunk(cur, *pending_batches.popleft(), chunk_size)
+        rows_processed += inserted
+        print(f"  Processed and inserted {inserted} rows from chunk. Total: {rows_processed}")
+    print(f"Reviews transform: {stats.summary()}")
+    if PREFLIGHT_DEDUP:
+        print(f"Pre-flight dedup skipped {rows_existing} rows already in {PROCESSED_TABLE_NAME} "
+              f"and {rows_repeated} repeated keys before scoring.")
+        metrics.inc('rows_skipped', rows_existing, table=PROCESSED_TABLE_NAME, reason='existing')
+        metrics.inc('rows_skipped', rows_repeated, table=PROCESSED_TABLE_NAME, reason='repeated')
+    metrics.inc('rows_read', stats.rows_read, table=PROCESSED_TABLE_NAME)
+    return stats.rows_read, rows_processed, stats.max_unixreviewtime
+
+
+def _date_to_unix(value, end_of_day=False):
+    moment = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) + (86399 if end_of_day else 0)
+
+
+def plan_review_source(cur, source_format, full_reload, chunk_size, since=None, until=None):
+    """
+    Returns (plan, chunks, min_time, max_time): the ingestion plan, an iterator of raw
+    chunks and the unixreviewtime bounds rows must fall in, set only by --since/--until.
+    For Parquet the bounds are pushed down so only matching partitions and row groups
+    are read. A full read is not cut at the last loaded review time, so backfilled rows
+    older than it are loaded too; rows already loaded are dropped by key.
+    """
+    reprocess_range = since is not None or until is not None
+    if source_format == 'parquet':
+        from parquet_landing import REVIEWS_PARQUET_DIR, read_parquet_chunks, review_time_filter
+        plan = plan_dataset_read(cur, REVIEWS_PARQUET_DIR, full_reload=full_reload or reprocess_range)
+    else:
+        plan = plan_read(cur, REVIEWS_CSV_PATH, full_reload=full_reload or reprocess_range)
+
+    min_time = _date_to_unix(since) if since else None
+    max_time = _date_to_unix(until, end_of_day=True) if until else None
+
+    if plan.mode == 'skip':
+        chunks = iter(())
+    elif source_format == 'parquet':
+        chunks = read_parquet_chunks(plan.file_path, REVIEWS_SOURCE_COLUMNS,
+                                     review_time_filter(min_time, max_time), chunk_size)
+    else:
+        chunks = read_csv_chunks(plan, chunk_size)
+    return plan, chunks, min_time, max_time
+
+
+def process_and_load_reviews(full_reload=False, source_format=SOURCE_FORMAT, since=None, until=None,
+                             chunk_size=CHUNK_SIZE, sentiment_mode=CLIENT_MODE):
     try:
-        response = requests.post(
-            SENTIMENT_SERVICE_URL,
-            json={'texts': texts_list},
-            timeout=30
-        )
-        response.raise_for_status()
-        sentiment_data = response.json()
-        return sentiment_data.get('sentiments', [])
-    except requests.exceptions.RequestException as e:
-        print(f"Error connecting to sentiment service for batch. Error: {e}")
-        return [None] * len(texts_list)
-    
-def process_and_load_reviews():
-    conn = None
-    try:
-        conn = get_db_connection()
-        conn.autocommit = False
-        print("Successfully connected to PostgreSQL database.")
-
-        create_processed_reviews_table(conn, PROCESSED_TABLE_NAME)
-
-        print(f"Reading and processing reviews from {REVIEWS_CSV_PATH} in chunks...")
-
-        chunk_size = 10000
-        rows_processed = 0
-
-        with conn.cursor() as cur:
-            for chunk_df in pd.read_csv(REVIEWS_CSV_PATH, chunksize=chunk_size):
-                chunk_df['overall'] = pd.to_numeric(chunk_df['overall'], errors='coerce').fillna(0).round(1)
-                chunk_df['unixreviewtime'] = pd.to_numeric(chunk_df['unixreviewtime'], errors='coerce').fillna(0).astype(int)
-
-                chunk_df.dropna(subset=['reviewerid', 'asin', 'unixreviewtime'], inplace=True)
-
-                for col in ['reviewername', 'helpful', 'reviewtext', 'summary', 'reviewtime']:
-                    if col in chunk_df.columns:
-                        chunk_df[col] = chunk_df[col].astype(str).replace({'nan': None})
-
-                try:
-                    chunk_df['unix_review_timestamp'] = pd.to_datetime(chunk_df['unixreviewtime'], unit='s', errors='coerce')
-                except Exception as e:
-                    print(f"Warning: Could not convert 'unixreviewtime' in chunk. Error: {e}")
-                    chunk_df['unix_review_timestamp'] = pd.NaT
-
-                try:
-                    chunk_df['review_timestamp'] = pd.to_datetime(chunk_df['reviewtime'], format='%m %d, %Y', errors='coerce').dt.date
-                except Exception as e:
-                    print(f"Warning: Could not convert 'reviewtime' in chunk. Error: {e}")
-                    chunk_df['review_timestamp'] = None
-
-                chunk_df['rating'] = pd.to_numeric(chunk_df['overall'], errors='coerce').round(1)
-
-                chunk_df['ingestion_timestamp'] = datetime.now()
-
-                if 'summary' not in chunk_df.columns:
-                    print("Warning: 'summary' column not found, falling back to 'reviewtext' for sentiment.")
-                    chunk_df['summary'] = chunk_df['reviewtext']
-                chunk_df['summary'] = chunk_df['summary'].astype(str).replace({'nan': None})
-                
-                texts_to_analyze = chunk_df['summary'].tolist()
-                
-                all_sentiments_for_chunk = []
-                for i in range(0, len(texts_to_analyze), API_BATCH_SIZE):
-                    batch_texts = texts_to_analyze[i:i + API_BATCH_SIZE]
-                    batch_texts_cleaned = [t if t is not None else "" for t in batch_texts]
-                    
-                    print(f"  Sending batch {int(i/API_BATCH_SIZE) + 1} of {len(texts_to_analyze) // API_BATCH_SIZE + (1 if len(texts_to_analyze) % API_BATCH_SIZE else 0)} to sentiment service...")
-                    sentiments_batch = get_sentiments_from_service_batched(batch_texts_cleaned)
-                    all_sentiments_for_chunk.extend(sentiments_batch)
-                
-                chunk_df['sentiment'] = all_sentiments_for_chunk
-                
-                print("Sentiment analysis for chunk completed.")
-
-                chunk_df['sentiment'] = chunk_df['sentiment'].apply(lambda x: None if (pd.isna(x) or pd.isnull(x) or str(x).lower() == 'none') else x)
-
-                # chunk_df['sentiment'] =  'Positive' # chunk_df['summary'].apply(get_sentiment_label)
-
-                # chunk_df['sentiment'] = chunk_df['sentiment'].astype(str).replace('nan', None)
-
-                processed_chunk_df = chunk_df[[
-                    'reviewerid', 'asin', 'reviewername','overall', 
-                    'summary', 'sentiment', 'unix_review_timestamp', 
-                    'review_timestamp', 'ingestion_timestamp'
-                ]].copy()
-
-                processed_chunk_df.rename(columns={
-                    'reviewerid': 'reviewer_id',
-                    'asin': 'product_id',
-                    'reviewername': 'reviewer_name',
-                    'overall': 'rating',
-                    'summary': 'review_summary'
-                }, inplace=True)
-
-                target_cols = [
-                    'reviewer_id', 'product_id', 'reviewer_name','rating', 
-                    'review_summary', 'sentiment', 'unix_review_timestamp', 
-                    'review_timestamp', 'ingestion_timestamp'
-                ]
-
-                data_to_insert = []
-                for index, row in processed_chunk_df.iterrows():
-                    try:
-                        row_values = [row[col] for col in target_cols]
-                        cleaned_row = [None if pd.isna(x) or pd.isnull(x) else x for x in row_values]
-                        data_to_insert.append(tuple(cleaned_row))
-                    except Exception as e:
-                        print(f"Error preparing row {index} for insertion in chunk: {e}. Row data: {row.to_dict()}")
-                        continue
-
-                if data_to_insert:
-                    insert_sql = sql.SQL("""
-                        INSERT INTO public.{} ({}) VALUES %s
-                        ON CONFLICT (reviewer_id, product_id, unix_review_timestamp) DO NOTHING;
-                    """).format(
-                        sql.Identifier(PROCESSED_TABLE_NAME),
-                        sql.SQL(', ').join(map(sql.Identifier, target_cols))
-                    )
-                    extras.execute_values(cur, insert_sql, data_to_insert, page_size=chunk_size)
-                    rows_processed += len(data_to_insert)
-                    print(f"  Processed and inserted {len(data_to_insert)} rows from chunk. Total: {rows_processed}")
-
-            conn.commit()
-            print(f"Finished processing and loading reviews. Total rows inserted: {rows_processed}")
-
-    except FileNotFoundError:
-        print(f"Error: Reviews CSV file not found at {REVIEWS_CSV_PATH}")
+        with db_connection('bulk_load') as conn:
+            print("Successfully connected to PostgreSQL database.")
+
+            create_processed_reviews_table(conn, PROCESSED_TABLE_NAME)
+            create_ingestion_state_table(conn)
+
+            with conn.cursor() as cur:
+                plan, chunks, min_time, max_time = plan_review_source(cur, source_format, full_reload, chunk_size, since, until)
+                print(f"Ingestion plan for {plan.file_path}: {plan}")
+                if plan.mode == 'skip':
+                    save_ingestion_state(cur, plan, rows_read=0)
+                    conn.commit()
+                    print("Reviews source unchanged since the last load. Nothing to do.")
+                    return
+
+            print(f"Reading and processing reviews from {plan.file_path} in chunks...")
+            metrics.inc('bytes_read', plan.end_offset - plan.start_offset, table=PROCESSED_TABLE_NAME)
+
+            with conn.cursor() as cur, SentimentClient(mode=sentiment_mode) as sentiment_client:
+                rows_read, rows_processed, max_unixreviewtime = load_review_chunks(
+                    cur, chunks, sentiment_client, chunk_size, min_time, max_time
+                )
+                save_ingestion_state(cur, plan, rows_read, max_unixreviewtime)
+                conn.commit()
+                print(f"Finished processing and loading reviews. Rows read: {rows_read}. Total rows inserted: {rows_processed}")
+                if sentiment_client.cache is not None:
+                    cache_stats = sentiment_client.cache_stats()
+                    print(f"Sentiment cache: {cache_stats}")
+                    for key in ('hits', 'disk_hits', 'misses'):
+                        metrics.set_gauge(f'sentiment_cache_{key}', cache_stats[key])
+            summarize_bulk_load(conn, PROCESSED_TABLE_NAME)
+
+    except FileNotFoundError as e:
+        # A CSV file or a Parquet dataset directory, depending on --source-format.
+        print(f"Error: Reviews source not found: {e.filename or e}")
     except Exception as e:
         print(f"An unexpected error occurred during review data processing: {e}")
-        if conn:
-            conn.rollback()
         raise
 
     finally:
-        if conn:
-            conn.close()
-        print("PostgreSQL connection closed.")
+        print("PostgreSQL connection returned to the pool.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process and load the reviews CSV into processed_reviews_data.")
+    parser.add_argument('--full-reload', action='store_true',
+                        help="Ignore the recorded ingestion state and re-read the whole file.")
+    parser.add_argument('--source-format', choices=['csv', 'parquet'], default=SOURCE_FORMAT,
+                        help="Read the raw CSV or the Parquet landing zone (see parquet_landing.py).")
+    parser.add_argument('--since', help="Re-process reviews from this date (YYYY-MM-DD, inclusive).")
+    parser.add_argument('--until', help="Re-process reviews up to this date (YYYY-MM-DD, inclusive).")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Raw rows per chunk.")
+    parser.add_argument('--sentiment-mode', choices=['batch', 'stream'], default=CLIENT_MODE,
+                        help="Post texts in SENTIMENT_API_BATCH_SIZE batches, or stream each chunk "
+                             "through one /sentiment/stream request.")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Load the CSV in this many byte-range shards, one process each (see review_shards.py).")
+    args = parser.parse_args()
+
     print("Starting review data processing and loading...")
-    process_and_load_reviews()
\ No newline at end of file
+    if args.shards > 1:
+        if args.source_format != 'csv' or args.since or args.until:
+            parser.error("--shards only applies to incremental loads of the CSV source")
+        from review_shards import run_sharded_load
+        run_sharded_load(args.shards, full_reload=args.full_reload, sentiment_mode=args.sentiment_mode)
+    else:
+        process_and_load_reviews(full_reload=args.full_reload, source_format=args.source_format,
+                                 since=args.since, until=args.until, chunk_size=args.chunk_size,
+                                 sentiment_mode=args.sentiment_mode)
+    # Last line of output: Airflow's BashOperator pushes it to XCom.
+    metrics.print_summary('process_and_load_reviews')
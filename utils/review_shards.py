@@ -0,0 +1,289 @@
+"""
+Partitioned loading of the reviews CSV. The new bytes of the file (see
+ingestion_state.plan_read) are split into N byte ranges aligned to CSV record
+boundaries; each shard is loaded by its own process with its own connection and
+transaction, and its progress is checkpointed in ingestion_shard_state so a failed
+shard can be retried alone.
+
+Usage:
+  python review_shards.py plan --shards 4 [--full-reload]
+  python review_shards.py load --shard 2
+  python review_shards.py finalize
+  python review_shards.py run --shards 4 [--full-reload]   # all three, locally
+"""
+import argparse
+import io
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+from psycopg2 import sql
+
+from db_conn import (
+    db_connection, close_pool, summarize_bulk_load, create_processed_reviews_table, create_ingestion_state_table,
+    create_ingestion_shard_state_table
+)
+from ingestion_state import (
+    ReadPlan, ByteRangeReader, HASH_BLOCK_SIZE, get_ingestion_state, plan_read, save_ingestion_state
+)
+from process_and_load_reviews import PROCESSED_TABLE_NAME, REVIEWS_CSV_PATH, CHUNK_SIZE, load_review_chunks
+from sentiment_client import SentimentClient, CLIENT_MODE
+from instrumentation import metrics, peak_rss_bytes
+
+SHARD_STATE_TABLE_NAME = "ingestion_shard_state"
+
+SHARD_COLUMNS = [
+    'shard_index', 'shard_count', 'start_offset', 'end_offset', 'plan_mode', 'file_size',
+    'file_mtime', 'content_hash', 'status', 'rows_read',
+    'rows_inserted', 'max_unixreviewtime'
+]
+
+
+def find_record_boundaries(file_path, start_offset, end_offset, num_shards):
+    """
+    Splits [start_offset, end_offset) into num_shards byte ranges that start and end
+    on CSV record boundaries. start_offset must itself be a record boundary. A newline
+    only ends a record if an even number of quote characters precede it (counted from
+    start_offset), so quoted fields with embedded newlines are never split.
+    """
+    span = end_offset - start_offset
+    targets = [start_offset + span * i // num_shards for i in range(1, num_shards)]
+    boundaries = [start_offset]
+
+    with open(file_path, 'rb') as f:
+        f.seek(start_offset)
+        block_start = start_offset
+        quotes = 0
+        while targets and block_start < end_offset:
+            block = f.read(min(HASH_BLOCK_SIZE, end_offset - block_start))
+            if not block:
+                break
+            counted_upto = 0
+            search_from = 0
+            while targets:
+                search_from = max(search_from, targets[0] - block_start)
+                if search_from >= len(block):
+                    break
+                newline = block.find(b'\n', search_from)
+                if newline < 0:
+                    break
+                quotes += block.count(b'"', counted_upto, newline)
+                counted_upto = newline
+                search_from = newline + 1
+                if quotes % 2 == 0:
+                    boundaries.append(block_start + newline + 1)
+                    targets.pop(0)
+            quotes += block.count(b'"', counted_upto)
+            block_start += len(block)
+
+    # Targets past the last record boundary give empty shards.
+    boundaries.extend([end_offset] * (num_shards + 1 - len(boundaries)))
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_shard_chunks(file_path, start_offset, end_offset, chunksize):
+    """Yields DataFrame chunks of the rows in one shard's byte range."""
+    if start_offset >= end_offset:
+        return
+    columns = pd.read_csv(file_path, nrows=0).columns
+    with io.BufferedReader(ByteRangeReader(file_path, start_offset, end_offset)) as f:
+        yield from pd.read_csv(f, header=None, names=columns, chunksize=chunksize)
+
+
+def _data_start(file_path):
+    """Byte offset of the first row after the header line."""
+    with open(file_path, 'rb') as f:
+        f.readline()
+        return f.tell()
+
+
+def get_shards(cur, file_path, lock_index=None):
+    """Returns the recorded shards of file_path; with lock_index, only that shard, locked for this transaction."""
+    query = sql.SQL("SELECT {} FROM public.{} WHERE file_path = %s").format(
+        sql.SQL(', ').join(map(sql.Identifier, SHARD_COLUMNS)), sql.Identifier(SHARD_STATE_TABLE_NAME)
+    )
+    params = [file_path]
+    if lock_index is None:
+        query += sql.SQL(" ORDER BY shard_index;")
+    else:
+        # A second worker on the same shard (e.g. a retry racing a slow attempt) backs off.
+        query += sql.SQL(" AND shard_index = %s FOR UPDATE SKIP LOCKED;")
+        params.append(lock_index)
+    cur.execute(query, params)
+    return [dict(zip(SHARD_COLUMNS, row)) for row in cur.fetchall()]
+
+
+def plan_shards(num_shards, full_reload=False, file_path=REVIEWS_CSV_PATH):
+    """
+    Plans the next load of file_path as num_shards byte ranges. An unfinished plan for
+    the same file contents and shard count is kept, so finished shards are not redone.
+    """
+    with db_connection() as conn:
+        create_processed_reviews_table(conn, PROCESSED_TABLE_NAME)
+        create_ingestion_state_table(conn)
+        create_ingestion_shard_state_table(conn)
+
+        with conn.cursor() as cur:
+            plan = plan_read(cur, file_path, full_reload=full_reload)
+            print(f"Ingestion plan for {plan.file_path}: {plan}")
+            existing = get_shards(cur, file_path)
+            if (existing and not full_reload and existing[0]['content_hash'] == plan.content_hash
+                    and existing[0]['shard_count'] == num_shards):
+                done = sum(1 for shard in existing if shard['status'] == 'done')
+                print(f"Resuming shard plan for {file_path}: {done}/{num_shards} shards already loaded.")
+                return existing
+
+            cur.execute(sql.SQL("DELETE FROM public.{} WHERE file_path = %s;").format(
+                sql.Identifier(SHARD_STATE_TABLE_NAME)), (file_path,))
+            if plan.mode == 'skip':
+                save_ingestion_state(cur, plan, rows_read=0)
+                conn.commit()
+                print("Reviews source unchanged since the last load. Nothing to do.")
+                return []
+
+            start_offset = plan.start_offset if plan.mode == 'append' else _data_start(file_path)
+            ranges = find_record_boundaries(file_path, start_offset, plan.end_offset, num_shards)
+            now = datetime.now()
+            for shard_index, (start, end) in enumerate(ranges):
+                cur.execute(sql.SQL("""
+                    INSERT INTO public.{} (file_path, shard_index, shard_count, start_offset, end_offset,
+                        plan_mode, file_size, file_mtime, content_hash, status, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s);
+                """).format(sql.Identifier(SHARD_STATE_TABLE_NAME)), (
+                    file_path, shard_index, num_shards, start, end, plan.mode, plan.file_size,
+                    plan.file_mtime, plan.content_hash, now
+                ))
+                print(f"  Shard {shard_index}: bytes {start}-{end} ({end - start} bytes)")
+            conn.commit()
+            return get_shards(cur, file_path)
+
+
+def load_shard(shard_index, file_path=REVIEWS_CSV_PATH, chunk_size=CHUNK_SIZE, sentiment_mode=CLIENT_MODE):
+    """
+    Loads one planned shard in its own transaction; the shard is marked done in the same
+    transaction, so a failure leaves it pending for the retry. Returns the shard's row counts.
+    """
+    try:
+        with db_connection('bulk_load') as conn, conn.cursor() as cur:
+            shards = get_shards(cur, file_path, lock_index=shard_index)
+            if not shards:
+                conn.rollback()
+                print(f"Shard {shard_index} of {file_path} is not planned or is being loaded elsewhere. Nothing to do.")
+                return None
+            shard = shards[0]
+            if shard['status'] == 'done':
+                conn.rollback()
+                print(f"Shard {shard_index} already loaded: {shard['rows_inserted']} rows.")
+                return shard
+
+            print(f"Loading shard {shard_index}/{shard['shard_count']} of {file_path}: "
+                  f"bytes {shard['start_offset']}-{shard['end_offset']}")
+            chunks = read_shard_chunks(file_path, shard['start_offset'], shard['end_offset'], chunk_size)
+            metrics.inc('bytes_read', shard['end_offset'] - shard['start_offset'], table=PROCESSED_TABLE_NAME)
+            with SentimentClient(mode=sentiment_mode) as sentiment_client:
+                rows_read, rows_inserted, max_unixreviewtime = load_review_chunks(
+                    cur, chunks, sentiment_client, chunk_size
+                )
+                if sentiment_client.cache is not None:
+                    print(f"Sentiment cache: {sentiment_client.cache_stats()}")
+
+            cur.execute(sql.SQL("""
+                UPDATE public.{} SET status = 'done', rows_read = %s, rows_inserted = %s,
+                    max_unixreviewtime = %s, updated_at = %s
+                WHERE file_path = %s AND shard_index = %s;
+            """).format(sql.Identifier(SHARD_STATE_TABLE_NAME)), (
+                rows_read, rows_inserted, max_unixreviewtime, datetime.now(), file_path, shard_index
+            ))
+            conn.commit()
+            print(f"Finished shard {shard_index}. Rows read: {rows_read}. Rows inserted: {rows_inserted}")
+            shard.update(status='done', rows_read=rows_read, rows_inserted=rows_inserted,
+                         max_unixreviewtime=max_unixreviewtime)
+            return shard
+    except Exception as e:
+        print(f"An unexpected error occurred while loading shard {shard_index}: {e}")
+        raise
+
+
+def finalize_shards(file_path=REVIEWS_CSV_PATH):
+    """
+    Once every shard is done, advances ingestion_state past the sharded range and clears
+    the shard plan. Fails if any shard is still pending.
+    """
+    with db_connection() as conn, conn.cursor() as cur:
+        shards = get_shards(cur, file_path)
+        if not shards:
+            print(f"No shard plan for {file_path}. Nothing to finalize.")
+            return
+        pending = [shard['shard_index'] for shard in shards if shard['status'] != 'done']
+        if pending:
+            raise RuntimeError(f"Shards {pending} of {file_path} are not loaded yet.")
+
+        first = shards[0]
+        plan = ReadPlan(file_path, first['plan_mode'], first['start_offset'], get_ingestion_state(cur, file_path),
+                        first['file_size'], first['file_mtime'], first['content_hash'], shards[-1]['end_offset'])
+        rows_read = sum(shard['rows_read'] for shard in shards)
+        times = [shard['max_unixreviewtime'] for shard in shards if shard['max_unixreviewtime'] is not None]
+        save_ingestion_state(cur, plan, rows_read, max(times) if times else None)
+        cur.execute(sql.SQL("DELETE FROM public.{} WHERE file_path = %s;").format(
+            sql.Identifier(SHARD_STATE_TABLE_NAME)), (file_path,))
+        conn.commit()
+        print(f"Finished sharded load of {file_path}. Rows read: {rows_read}. "
+              f"Total rows inserted: {sum(shard['rows_inserted'] for shard in shards)}")
+        summarize_bulk_load(conn, PROCESSED_TABLE_NAME)
+
+
+def _load_shard_in_worker(shard_index, sentiment_mode=CLIENT_MODE):
+    """
+    load_shard in a pool process. Returns the shard's metrics for the parent's run summary,
+    as the worker's own registry is lost with the process.
+    """
+    metrics.reset()
+    load_shard(shard_index, sentiment_mode=sentiment_mode)
+    metrics.set_gauge('peak_rss_bytes', peak_rss_bytes(), shard=shard_index)
+    return metrics.snapshot()
+
+
+def run_sharded_load(num_shards, full_reload=False, sentiment_mode=CLIENT_MODE):
+    """Plans, loads every shard in its own process, and finalizes."""
+    shards = plan_shards(num_shards, full_reload=full_reload)
+    if not shards:
+        return
+    # The workers are forked; they open their own connections.
+    close_pool()
+    with ProcessPoolExecutor(max_workers=num_shards) as pool:
+        for shard_metrics in pool.map(partial(_load_shard_in_worker, sentiment_mode=sentiment_mode),
+                                      [shard['shard_index'] for shard in shards]):
+            metrics.merge(shard_metrics)
+    finalize_shards()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the reviews CSV in parallel byte-range shards.")
+    parser.add_argument('step', choices=['plan', 'load', 'finalize', 'run'])
+    parser.add_argument('--shards', type=int, help="Number of shards (for the 'plan' and 'run' steps).")
+    parser.add_argument('--shard', type=int, help="Shard index to load (for the 'load' step).")
+    parser.add_argument('--full-reload', action='store_true',
+                        help="Ignore the recorded ingestion state and re-read the whole file.")
+    parser.add_argument('--sentiment-mode', choices=['batch', 'stream'], default=CLIENT_MODE,
+                        help="Sentiment client mode (see process_and_load_reviews.py).")
+    args = parser.parse_args()
+
+    if args.step in ('plan', 'run') and not args.shards:
+        parser.error(f"the '{args.step}' step needs --shards")
+
+    summary = {'shard': args.shard}
+    if args.step == 'plan':
+        shards = plan_shards(args.shards, full_reload=args.full_reload)
+        # The DAG maps one load task over each of these.
+        summary['pending_shards'] = [shard['shard_index'] for shard in shards if shard['status'] != 'done']
+    elif args.step == 'load':
+        if args.shard is None:
+            parser.error("the 'load' step needs --shard")
+        load_shard(args.shard, sentiment_mode=args.sentiment_mode)
+    elif args.step == 'finalize':
+        finalize_shards()
+    else:
+        run_sharded_load(args.shards, full_reload=args.full_reload, sentiment_mode=args.sentiment_mode)
+    # Last line of output: Airflow's BashOperator pushes it to XCom.
+    metrics.print_summary(f'review_shards_{args.step}', **summary)
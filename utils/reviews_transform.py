@@ -0,0 +1,163 @@
+"""
+Streaming transform of raw review chunks into column batches for processed_reviews_data.
+
+Each column is coerced once, straight from the raw chunk into a plain list in the
+REVIEWS_TARGET_COLS layout; rows are only materialized as tuples by
+ReviewBatch.to_records when the batch is written. No intermediate DataFrames are
+built, so memory per chunk is the raw chunk plus one copy of the output columns.
+"""
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import peak_rss_bytes
+
+REVIEWS_TARGET_COLS = [
+    'reviewer_id', 'product_id', 'reviewer_name', 'rating',
+    'review_summary', 'sentiment', 'unix_review_timestamp',
+    'review_timestamp', 'ingestion_timestamp'
+]
+
+
+def _text_values(column):
+    """Strings as astype(str) gives them, with NaN and the string 'nan' as None."""
+    values = column.to_numpy(dtype=object)
+    text = values.astype(str).astype(object)
+    text[pd.isna(values) | (text == 'nan')] = None
+    return text
+
+
+def _none_where_missing(values, missing):
+    values = values.astype(object)
+    values[missing] = None
+    return values
+
+
+def _clean_sentiment(sentiment):
+    if sentiment is None or (isinstance(sentiment, float) and math.isnan(sentiment)):
+        return None
+    return None if str(sentiment).lower() == 'none' else sentiment
+
+
+class ReviewBatch:
+    """
+    One transformed chunk: a list per output column plus the unixreviewtime
+    array used for watermark and date-range filtering.
+    """
+
+    def __init__(self, columns, unixreviewtime):
+        self.columns = columns
+        self.unixreviewtime = unixreviewtime
+
+    def __len__(self):
+        return len(self.unixreviewtime)
+
+    @property
+    def texts(self):
+        """Texts sent for sentiment scoring."""
+        return self.columns['review_summary']
+
+    @property
+    def max_unixreviewtime(self):
+        return int(self.unixreviewtime.max()) if len(self) else None
+
+    def filter(self, mask):
+        """Returns the batch restricted to the rows where the boolean mask is set."""
+        if mask.all():
+            return self
+        return ReviewBatch({name: [value for value, keep in zip(values, mask) if keep]
+                            for name, values in self.columns.items()},
+                           self.unixreviewtime[mask])
+
+    def to_records(self, sentiments):
+        """Rows for REVIEWS_TARGET_COLS with the scored sentiments filled in."""
+        columns = dict(self.columns, sentiment=[_clean_sentiment(sentiment) for sentiment in sentiments])
+        return list(zip(*(columns[col] for col in REVIEWS_TARGET_COLS)))
+
+
+def transform_reviews_chunk(chunk_df, ingestion_timestamp=None):
+    """
+    Transforms a raw reviews chunk (CSV or Parquet columns) into a ReviewBatch with
+    the same values the loader has always written.
+    """
+    keep = (chunk_df['reviewerid'].notna() & chunk_df['asin'].notna()).to_numpy()
+    if not keep.all():
+        chunk_df = chunk_df[keep]
+
+    unixreviewtime = pd.to_numeric(chunk_df['unixreviewtime'], errors='coerce').fillna(0).astype('int64').to_numpy()
+    rating = pd.to_numeric(chunk_df['overall'], errors='coerce').fillna(0).round(1)
+
+    review_time = pd.to_datetime(unixreviewtime, unit='s', errors='coerce')
+    reviewtime_text = _text_values(chunk_df['reviewtime']) if 'reviewtime' in chunk_df.columns else None
+    if reviewtime_text is None:
+        review_date = [None] * len(unixreviewtime)
+    else:
+        parsed = pd.to_datetime(pd.Series(reviewtime_text, dtype=object), format='%m %d, %Y', errors='coerce')
+        review_date = _none_where_missing(np.asarray(parsed.dt.date, dtype=object), parsed.isna().to_numpy()).tolist()
+
+    if 'summary' in chunk_df.columns:
+        summary = _text_values(chunk_df['summary'])
+    else:
+        print("Warning: 'summary' column not found, falling back to 'reviewtext' for sentiment.")
+        summary = _text_values(chunk_df['reviewtext'])
+    # The loader has always stored (and scored) missing summaries as the string 'None'.
+    summary[summary == None] = 'None'  # noqa: E711
+
+    reviewer_name = (_text_values(chunk_df['reviewername']) if 'reviewername' in chunk_df.columns
+                     else np.full(len(unixreviewtime), None, dtype=object))
+
+    columns = {
+        'reviewer_id': chunk_df['reviewerid'].tolist(),
+        'product_id': chunk_df['asin'].tolist(),
+        'reviewer_name': reviewer_name.tolist(),
+        'rating': rating.tolist(),
+        'review_summary': summary.tolist(),
+        'unix_review_timestamp': _none_where_missing(review_time.to_pydatetime(), review_time.isna()).tolist(),
+        'review_timestamp': review_date,
+        'ingestion_timestamp': [ingestion_timestamp or datetime.now()] * len(unixreviewtime),
+    }
+    return ReviewBatch(columns, unixreviewtime)
+
+
+def stream_review_batches(chunks, min_time=None, max_time=None, stats=None, transform=transform_reviews_chunk):
+    """
+    Generator stage between a chunk reader and the writer: transforms each raw chunk
+    and drops rows outside [min_time, max_time]. Yields only non-empty batches.
+    rows_read and max_unixreviewtime cover every row read, filtered or not.
+    """
+    stats = stats if stats is not None else TransformStats()
+    for chunk_df in chunks:
+        stats.rows_read += len(chunk_df)
+        batch = transform(chunk_df)
+        del chunk_df
+        stats.observe_time(batch.max_unixreviewtime)
+        if min_time is not None or max_time is not None:
+            in_range = np.ones(len(batch), dtype=bool)
+            if min_time is not None:
+                in_range &= batch.unixreviewtime >= min_time
+            if max_time is not None:
+                in_range &= batch.unixreviewtime <= max_time
+            batch = batch.filter(in_range)
+        if len(batch):
+            yield batch
+
+
+class TransformStats:
+    """Rows read, newest unixreviewtime and throughput of one streaming run."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.max_unixreviewtime = None
+        self.started = time.perf_counter()
+
+    def observe_time(self, unix_time):
+        if unix_time is not None and (self.max_unixreviewtime is None or unix_time > self.max_unixreviewtime):
+            self.max_unixreviewtime = unix_time
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows_read / elapsed if elapsed else 0
+        return f"{self.rows_read} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec), peak RSS {peak_rss_bytes() / 2 ** 20:,.0f} MB"
@@ -0,0 +1,305 @@
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from sentiment_cache import SentimentCache, split_cached, merge_scored
+from instrumentation import metrics
+
+SENTIMENT_SERVICE_URL = os.getenv('SENTIMENT_API_URL', 'http://127.0.0.1:5001/sentiment')
+
+API_BATCH_SIZE = int(os.getenv('SENTIMENT_API_BATCH_SIZE', '500'))
+# Number of batches posted to the sentiment service concurrently.
+MAX_IN_FLIGHT = int(os.getenv('SENTIMENT_MAX_IN_FLIGHT', '4'))
+REQUEST_TIMEOUT = float(os.getenv('SENTIMENT_REQUEST_TIMEOUT', '30'))
+MAX_RETRIES = int(os.getenv('SENTIMENT_MAX_RETRIES', '3'))
+BACKOFF_SECONDS = float(os.getenv('SENTIMENT_BACKOFF_SECONDS', '0.5'))
+CACHE_ENABLED = os.getenv('SENTIMENT_CACHE_ENABLED', 'true').lower() == 'true'
+# batch: post API_BATCH_SIZE texts per /sentiment request. stream: pipe each chunk through
+# one /sentiment/stream request; REQUEST_TIMEOUT then bounds each read or write, not the request.
+# Stream mode needs a plain http:// URL; with https the client falls back to batch mode.
+CLIENT_MODE = os.getenv('SENTIMENT_CLIENT_MODE', 'batch').lower()
+# Records per chunk of a streamed request body.
+STREAM_SEND_SIZE = int(os.getenv('SENTIMENT_STREAM_SEND_SIZE', '1000'))
+STREAM_READ_SIZE = 256 * 1024
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def create_session(pool_size=MAX_IN_FLIGHT):
+    """Returns a keep-alive requests.Session whose connection pool fits pool_size concurrent batches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def post_batch_with_retry(session, texts, url=SENTIMENT_SERVICE_URL, timeout=REQUEST_TIMEOUT,
+                          max_retries=MAX_RETRIES, backoff_seconds=BACKOFF_SECONDS):
+    """
+    Posts one batch of texts to the sentiment service, retrying connection errors,
+    timeouts and 429/5xx responses with exponential backoff and jitter.
+    Returns [None] * len(texts) only once every attempt has failed.
+    """
+    if not texts:
+        return []
+    for attempt in range(max_retries + 1):
+        try:
+            with metrics.timer('sentiment_request_seconds'):
+                response = session.post(url, json={'texts': texts}, timeout=timeout)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                raise requests.exceptions.HTTPError(f"{response.status_code} from sentiment service", response=response)
+            response.raise_for_status()
+            sentiments = response.json().get('sentiments', [])
+            if len(sentiments) != len(texts):
+                print(f"Warning: sentiment service returned {len(sentiments)} results for {len(texts)} texts.")
+                sentiments = (sentiments + [None] * len(texts))[:len(texts)]
+            metrics.inc('sentiment_texts_scored', len(texts))
+            return sentiments
+        except requests.exceptions.RequestException as e:
+            is_client_error = (
+                isinstance(e, requests.exceptions.HTTPError) and e.response is not None
+                and e.response.status_code not in RETRYABLE_STATUS_CODES
+            )
+            if is_client_error or attempt == max_retries:
+                print(f"Error connecting to sentiment service for batch after {attempt + 1} attempt(s). Error: {e}")
+                metrics.inc('sentiment_failed_texts', len(texts))
+                return [None] * len(texts)
+            metrics.inc('sentiment_retries')
+            delay = backoff_seconds * (2 ** attempt) * (1 + random.random())
+            print(f"  Sentiment batch failed (attempt {attempt + 1}/{max_retries + 1}): {e}. Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+class SentimentStreamError(Exception):
+    """A /sentiment/stream request answered with a non-200 status."""
+
+    def __init__(self, status, reason):
+        super().__init__(f"{status} {reason} from sentiment service")
+        self.status = status
+
+
+def stream_url(url=SENTIMENT_SERVICE_URL):
+    return url.rstrip('/') + '/stream'
+
+
+def _send_records(sock, texts, ids, errors):
+    """Writes texts[ids] as NDJSON records in chunked transfer encoding; runs on its own thread."""
+    try:
+        for start in range(0, len(ids), STREAM_SEND_SIZE):
+            body = ''.join(json.dumps({'id': i, 'text': texts[i]}) + '\n'
+                           for i in ids[start:start + STREAM_SEND_SIZE]).encode('utf-8')
+            sock.sendall(b'%x\r\n%s\r\n' % (len(body), body))
+        sock.sendall(b'0\r\n\r\n')
+    except Exception as e:
+        errors.append(e)
+
+
+def stream_once(texts, ids, results, url, timeout=REQUEST_TIMEOUT):
+    """
+    Sends texts[ids] through one /sentiment/stream request and stores each result in
+    results[id] as it arrives, so a broken stream keeps what was already scored. The
+    body is sent from a second thread while this one reads results; reading only after
+    sending everything would deadlock once the service's unread output fills the socket.
+    Returns the number of records the service rejected. Only http:// URLs are supported:
+    the sender writes through a dup() of the socket, which TLS sockets do not allow.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise ValueError(f"Sentiment streaming needs an http:// URL, got {url!r}")
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    errors = []
+    rejected = 0
+    body_socket = None
+    try:
+        conn.putrequest('POST', parts.path or '/')
+        conn.putheader('Content-Type', 'application/x-ndjson')
+        conn.putheader('Transfer-Encoding', 'chunked')
+        conn.endheaders()
+        # The sender gets its own handle on the socket: getresponse() detaches conn from
+        # it when the service answers with Connection: close (e.g. Flask's dev server).
+        body_socket = conn.sock.dup()
+        sender = threading.Thread(target=_send_records, args=(body_socket, texts, ids, errors),
+                                  name='sentiment-stream-send', daemon=True)
+        sender.start()
+        response = conn.getresponse()
+        if response.status != 200:
+            raise SentimentStreamError(response.status, response.reason)
+        pending = b''
+        while True:
+            block = response.read1(STREAM_READ_SIZE)
+            if not block:
+                break
+            lines, _, pending = (pending + block).rpartition(b'\n')
+            if not lines:
+                continue
+            # Decode every complete line of the block at once rather than line by line.
+            for record in json.loads(b'[' + lines.replace(b'\n', b',') + b']'):
+                if record.get('error'):
+                    rejected += 1
+                    print(f"Warning: sentiment service rejected record {record.get('id')}: {record['error']}")
+                else:
+                    results[record['id']] = record['sentiment']
+        sender.join()
+    finally:
+        if body_socket is not None:
+            body_socket.close()
+        conn.close()
+    if errors:
+        raise errors[0]
+    return rejected
+
+
+def stream_with_retry(texts, url=None, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                      backoff_seconds=BACKOFF_SECONDS):
+    """
+    Scores texts through /sentiment/stream. Failed attempts are retried like batch posts,
+    resending only the texts without a result yet. Returns None for texts that could not
+    be scored; raises SentimentStreamError on 404/405, i.e. a service without the route,
+    and ValueError for a URL that is not http://.
+    """
+    if not texts:
+        return []
+    url = url or stream_url()
+    if urlsplit(url).scheme != 'http':
+        raise ValueError(f"Sentiment streaming needs an http:// URL, got {url!r}")
+    results = {}
+    pending = list(range(len(texts)))
+    for attempt in range(max_retries + 1):
+        error, retryable = None, True
+        try:
+            with metrics.timer('sentiment_stream_seconds'):
+                rejected = stream_once(texts, pending, results, url, timeout)
+        except SentimentStreamError as e:
+            if e.status in (404, 405):
+                raise
+            error, retryable = e, e.status in RETRYABLE_STATUS_CODES
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            error = e
+        pending = [i for i in pending if i not in results]
+        if not pending:
+            break
+        if error is None:
+            print(f"Warning: sentiment service returned no result for {len(pending)} texts ({rejected} rejected).")
+            break
+        if not retryable or attempt == max_retries:
+            print(f"Error streaming {len(pending)} texts to sentiment service after {attempt + 1} attempt(s). Error: {error}")
+            break
+        metrics.inc('sentiment_retries')
+        delay = backoff_seconds * (2 ** attempt) * (1 + random.random())
+        print(f"  Sentiment stream failed (attempt {attempt + 1}/{max_retries + 1}) with {len(pending)} texts left: "
+              f"{error}. Retrying in {delay:.1f}s...")
+        time.sleep(delay)
+    metrics.inc('sentiment_texts_scored', len(texts) - len(pending))
+    if pending:
+        metrics.inc('sentiment_failed_texts', len(pending))
+    return [results.get(i) for i in range(len(texts))]
+
+
+def fetch_scorer_version(session, url=SENTIMENT_SERVICE_URL, timeout=REQUEST_TIMEOUT):
+    """Asks the service's /health route which scorer it runs; None if it cannot be determined."""
+    health_url = url.rsplit('/', 1)[0] + '/health'
+    try:
+        response = session.get(health_url, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get('scorer')
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Warning: could not read scorer version from {health_url}, sentiment cache disabled. Error: {e}")
+        return None
+
+
+class PendingSentiments:
+    """Sentiment batches of one chunk that are being scored in the background."""
+
+    def __init__(self, futures, sentiments=None, misses=None, cache=None):
+        self._futures = futures
+        self._sentiments = sentiments
+        self._misses = misses
+        self._cache = cache
+
+    def result(self):
+        """Blocks until every batch of the chunk is scored and returns the flattened sentiments."""
+        scored = []
+        for future in self._futures:
+            scored.extend(future.result())
+        if self._cache is None:
+            return scored
+        return merge_scored(self._sentiments, self._misses, scored, self._cache)
+
+
+class SentimentClient:
+    """
+    Concurrent client for the sentiment service. Batches are posted from a thread pool
+    over a shared keep-alive session so up to max_in_flight requests run at once,
+    while the caller keeps parsing and inserting other chunks. In 'stream' mode each
+    submitted chunk goes through one /sentiment/stream request instead. Texts already
+    in the sentiment cache (keyed on the service's scorer version) are not sent at all.
+    """
+
+    def __init__(self, url=SENTIMENT_SERVICE_URL, batch_size=API_BATCH_SIZE, max_in_flight=MAX_IN_FLIGHT,
+                 use_cache=CACHE_ENABLED, mode=CLIENT_MODE):
+        if mode not in ('batch', 'stream'):
+            raise ValueError(f"Unknown sentiment client mode: {mode!r}")
+        if mode == 'stream' and urlsplit(url).scheme != 'http':
+            print(f"Sentiment streaming needs an http:// URL, not {url}; using batch requests.")
+            mode = 'batch'
+        self.url = url
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.mode = mode
+        self.session = create_session(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='sentiment')
+        self.cache = None
+        if use_cache:
+            scorer_version = fetch_scorer_version(self.session, url)
+            if scorer_version:
+                self.cache = SentimentCache(scorer_version)
+
+    def _stream(self, texts):
+        if self.mode == 'stream':
+            try:
+                return stream_with_retry(texts, stream_url(self.url))
+            except SentimentStreamError as e:
+                print(f"Sentiment service has no stream endpoint ({e}); falling back to batch requests.")
+                self.mode = 'batch'
+        results = []
+        for i in range(0, len(texts), self.batch_size):
+            results.extend(post_batch_with_retry(self.session, texts[i:i + self.batch_size], self.url))
+        return results
+
+    def _submit_batches(self, texts):
+        if self.mode == 'stream':
+            return [self.executor.submit(self._stream, texts)]
+        return [
+            self.executor.submit(post_batch_with_retry, self.session, texts[i:i + self.batch_size], self.url)
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+    def submit(self, texts):
+        """Queues texts for scoring in batch_size batches and returns a PendingSentiments handle."""
+        texts = [t if t is not None else "" for t in texts]
+        if self.cache is None:
+            return PendingSentiments(self._submit_batches(texts))
+        sentiments, misses = split_cached(texts, self.cache)
+        return PendingSentiments(self._submit_batches(list(misses)), sentiments, misses, self.cache)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()